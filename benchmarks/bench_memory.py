@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import sys
+import os
+import ipaddress
+import tracemalloc
+import argparse
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.TPLinkTypes import TPLinkString, TPLinkBool, TPLinkIPv4, TPLinkMAC
+
+def create_datagram(sequence_number):
+	switch_mac = MACAddress(bytes.fromhex("60 a4 b7 00 00 00")[:4] + sequence_number.to_bytes(length = 2, byteorder = "big"))
+	payload = PacketFields()
+	payload.append_all([
+		PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")),
+		PacketField(FieldTag.DeviceDescription, TPLinkString("Simulated Switch")),
+		PacketField(FieldTag.MAC, TPLinkMAC(switch_mac)),
+		PacketField(FieldTag.FirmwareVersion, TPLinkString("1.0.1 Build 20230712 Rel.73926")),
+		PacketField(FieldTag.HardwareVersion, TPLinkString("TL-SG1016PE 5.20")),
+		PacketField(FieldTag.DHCP, TPLinkBool(False)),
+		PacketField(FieldTag.IPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.32"))),
+		PacketField(FieldTag.SubnetMask, TPLinkIPv4(ipaddress.ip_address("255.255.255.0"))),
+		PacketField(FieldTag.GatewayIPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.254"))),
+		PacketField(FieldTag.DeviceSupportsEncryption, TPLinkBool(True)),
+	])
+	packet = RC4Packet(version = 1, opcode = Opcode.ResponseData, switch_mac = switch_mac, host_mac = MACAddress(bytes.fromhex("00 11 22 33 44 55")), sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = payload)
+	return packet.serialize()
+
+def decode(datagram, full_decode):
+	packet = RC4Packet.deserialize(datagram)
+	if full_decode:
+		for field in packet.payload:
+			field.value
+	return packet
+
+parser = argparse.ArgumentParser(description = "Measure the memory that is retained per decoded RC4Packet.")
+parser.add_argument("-n", "--packet-count", metavar = "count", type = int, default = 20000, help = "Number of packets to decode. Defaults to %(default)d.")
+parser.add_argument("--header-only", action = "store_true", help = "Do not touch the payload after decoding, i.e., keep it in its raw form.")
+args = parser.parse_args(sys.argv[1:])
+
+datagrams = [ create_datagram(i % 65536) for i in range(args.packet_count) ]
+tracemalloc.start()
+(before, _) = tracemalloc.get_traced_memory()
+packets = [ decode(datagram, full_decode = not args.header_only) for datagram in datagrams ]
+(after, _) = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+
+print(f"{len(packets)} packets decoded ({'header only' if args.header_only else 'fully'}), {len(datagrams[0])} bytes per datagram")
+print(f"Retained memory: {(after - before) / len(packets):.0f} bytes per decoded packet")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import sys
+import os
+import time
+import socket
+import asyncio
+import argparse
+import multiprocessing
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.TPLinkTypes import TPLinkString, TPLinkMAC
+from tplink_cli.TPLinkInterface import TPLinkInterface
+from tplink_cli.BatchedSocketIO import BatchedSocketIO
+
+# The interface binds its receiving socket to the wildcard address and its
+# sending socket to 127.0.0.1, so the simulator addresses 127.0.0.2 to reach
+# the receiving socket.
+_TARGET_ADDRESS = "127.0.0.2"
+
+def create_datagram(sequence_number):
+	switch_mac = MACAddress(bytes.fromhex("60 a4 b7 00") + sequence_number.to_bytes(length = 2, byteorder = "big"))
+	payload = PacketFields()
+	payload.append_all([
+		PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")),
+		PacketField(FieldTag.MAC, TPLinkMAC(switch_mac)),
+		PacketField(FieldTag.FirmwareVersion, TPLinkString("1.0.1 Build 20230712 Rel.73926")),
+	])
+	packet = RC4Packet(version = 1, opcode = Opcode.ResponseData, switch_mac = switch_mac, host_mac = MACAddress(bytes(6)), sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = payload)
+	return packet.serialize()
+
+def simulator(packet_count, port, burst_size, ready):
+	# Sends responses in bursts so that the receiver has a chance to keep up
+	sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	datagrams = [ create_datagram(i % 65536) for i in range(burst_size) ]
+	ready.wait()
+	for offset in range(0, packet_count, burst_size):
+		for datagram in datagrams[ : packet_count - offset]:
+			sock.sendto(datagram, (_TARGET_ADDRESS, port))
+		time.sleep(0.001)
+
+async def measure_rx(args, batched_io):
+	ready = multiprocessing.Event()
+	async with TPLinkInterface("lo", batched_io = batched_io, rx_queue_size = args.packet_count) as conn:
+		process = multiprocessing.Process(target = simulator, args = (args.packet_count, conn.local_port, args.burst_size, ready))
+		process.start()
+		ready.set()
+		received = 0
+		cpu_time = 0
+		while received < args.packet_count:
+			t0 = time.process_time()
+			rx_pkts = await conn.recv_many(1024, timeout = 0.5)
+			if len(rx_pkts) == 0:
+				break
+			received += len(rx_pkts)
+			cpu_time += time.process_time() - t0
+		process.join()
+	return (received, cpu_time)
+
+async def measure_tx(args, batched_io):
+	sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+	sink.bind((_TARGET_ADDRESS, 0))
+	datagrams = [ create_datagram(i % 65536) for i in range(args.burst_size) ]
+	async with TPLinkInterface("lo", batched_io = batched_io, batched_tx = batched_io) as conn:
+		t0 = time.process_time()
+		for offset in range(0, args.packet_count, args.burst_size):
+			for datagram in datagrams[ : args.packet_count - offset]:
+				conn.send(datagram, _TARGET_ADDRESS, sink.getsockname()[1])
+			await asyncio.sleep(0)
+		t1 = time.process_time()
+	sink.close()
+	return t1 - t0
+
+parser = argparse.ArgumentParser(description = "Measure packets per second per core of the TPLinkInterface receive and send paths on loopback, with and without recvmmsg/sendmmsg.")
+parser.add_argument("-n", "--packet-count", metavar = "count", type = int, default = 50000, help = "Number of datagrams to receive and to send. Defaults to %(default)d.")
+parser.add_argument("-b", "--burst-size", metavar = "count", type = int, default = 64, help = "Number of datagrams that the simulator sends back-to-back. Defaults to %(default)d.")
+args = parser.parse_args(sys.argv[1:])
+
+modes = [ False ]
+if BatchedSocketIO.available():
+	modes.append(True)
+else:
+	print("recvmmsg/sendmmsg not available on this platform, only measuring the portable path.")
+for batched_io in modes:
+	name = "recvmmsg/sendmmsg" if batched_io else "portable"
+	(received, rx_cpu_time) = asyncio.run(measure_rx(args, batched_io))
+	tx_cpu_time = asyncio.run(measure_tx(args, batched_io))
+	print(f"{name:<18s} RX: {received} of {args.packet_count} received, {received / rx_cpu_time:10.0f} packets/sec/core")
+	print(f"{name:<18s} TX: {args.packet_count / tx_cpu_time:10.0f} packets/sec/core")
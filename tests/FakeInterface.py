@@ -0,0 +1,62 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import asyncio
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketFields
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.TPLinkInterface import TPLinkProtocol
+
+def response_to(request: RC4Packet, opcode: "Opcode", switch_mac: MACAddress | None = None, fields: "list[PacketField]" = (), error_code: int = 0):
+	payload = PacketFields()
+	payload.append_all(fields)
+	return RC4Packet(version = request.version, opcode = opcode, switch_mac = switch_mac if (switch_mac is not None) else request.switch_mac, host_mac = request.host_mac, sequence_number = request.sequence_number, error_code = error_code, length = None, fragmentation_offset = 0, flags = 0, token_id = request.token_id, checksum = 0, payload = payload)
+
+class FakeInterface():
+	# In-process stand-in for a TPLinkInterface. Every datagram that is sent
+	# is passed to the responder, which returns a list of (delay, datagram)
+	# tuples that are then received after the respective delay.
+	interface = "fake0"
+	remote_port = 29808
+
+	def __init__(self, responder: "callable", host_mac: MACAddress = MACAddress(b"\x02\x00\x00\x00\x00\x01")):
+		self._responder = responder
+		self.host_mac = host_mac
+		self.sent = [ ]
+		self._rx_queue = asyncio.Queue()
+
+	def send(self, data: bytes, host: str, port: int, on_error: "callable | None" = None):
+		request = RC4Packet.deserialize(data)
+		self.sent.append(request)
+		loop = asyncio.get_running_loop()
+		for (delay, datagram) in self._responder(request):
+			if isinstance(datagram, RC4Packet):
+				datagram = datagram.serialize()
+			loop.call_later(delay, self.receive, datagram)
+
+	def receive(self, data: bytes):
+		self._rx_queue.put_nowait(TPLinkProtocol.RXMsg(data = data, host = "192.0.2.1", port = 29809, timestamp = 0.0))
+
+	async def recv_many(self, max_count: int, timeout: float | None = None):
+		rxmsgs = [ await self._rx_queue.get() ]
+		while (len(rxmsgs) < max_count) and (not self._rx_queue.empty()):
+			rxmsgs.append(self._rx_queue.get_nowait())
+		return rxmsgs
@@ -0,0 +1,57 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import io
+import unittest
+import unittest.mock
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.PacketFilter import PacketFilter
+from tplink_cli.PacketWriter import PacketWriter
+from tplink_cli.CaptureDecoder import CaptureDecoder
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.TPLinkTypes import TPLinkString
+
+class CaptureDecoderTests(unittest.TestCase):
+	def _datagram(self):
+		fields = PacketFields()
+		fields.append(PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")))
+		rc4_pkt = RC4Packet(version = 1, opcode = Opcode.ResponseData, switch_mac = MACAddress(b"\x11" * 6), host_mac = MACAddress(b"\x22" * 6), sequence_number = 1, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = fields)
+		return rc4_pkt.serialize()
+
+	def _decode(self, datagram: bytes):
+		f = io.BytesIO()
+		decoder = CaptureDecoder(PacketFilter(), validate_serialization = True)
+		self.assertTrue(decoder.decode(datagram, PacketWriter.create("text", f)))
+		return f.getvalue().decode()
+
+	def test_validate_serialization_clean(self):
+		self.assertNotIn("WARNING", self._decode(self._datagram()))
+
+	def test_validate_serialization_broken_encoder(self):
+		datagram = self._datagram()
+		with unittest.mock.patch.object(TPLinkString, "__bytes__", lambda value: b"broken"):
+			output = self._decode(datagram)
+		self.assertIn("WARNING: Packet reserialization mismatch.", output)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,110 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import struct
+import unittest
+from tplink_cli.CapturePrefilter import CapturePrefilter
+
+class CapturePrefilterTests(unittest.TestCase):
+	_PAYLOAD = b"tplink payload"
+
+	def _ipv4(self, payload: bytes = _PAYLOAD, source_port: int = 29809, destination_port: int = 29808, ihl: int = 5, flags_fragment: int = 0, protocol: int = 17):
+		udp = struct.pack(">HHHH", source_port, destination_port, 8 + len(payload), 0) + payload
+		options = b"\x01" * ((ihl - 5) * 4)
+		return struct.pack(">BBHHHBBH4s4s", 0x40 | ihl, 0, (ihl * 4) + len(udp), 0, flags_fragment, 64, protocol, 0, bytes([ 192, 168, 0, 1 ]), bytes([ 255, 255, 255, 255 ])) + options + udp
+
+	def _ethernet(self, ip_packet: bytes, vlan_ethertypes: "tuple[int]" = ()):
+		frame = (b"\xff" * 6) + (b"\x02" * 6)
+		for (vlan_id, ethertype) in enumerate(vlan_ethertypes, 1):
+			frame += struct.pack(">HH", ethertype, vlan_id)
+		return frame + b"\x08\x00" + ip_packet
+
+	def _linux_sll(self, ip_packet: bytes, protocol: int = 0x0800):
+		return struct.pack(">HHH8sH", 0, 1, 6, b"\x02" * 6, protocol) + ip_packet
+
+	def _extract(self, linktype: int, frame: bytes, prefilter: CapturePrefilter | None = None):
+		prefilter = prefilter if (prefilter is not None) else CapturePrefilter()
+		payload = prefilter.extract_payload(linktype, frame)
+		return bytes(payload) if (payload is not None) else None
+
+	def test_ethernet(self):
+		self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4())), self._PAYLOAD)
+
+	def test_vlan(self):
+		for vlan_ethertypes in [ (0x8100, ), (0x88a8, 0x8100), (0x9100, 0x8100) ]:
+			with self.subTest(vlan_ethertypes = vlan_ethertypes):
+				self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(), vlan_ethertypes)), self._PAYLOAD)
+
+	def test_ip_options(self):
+		for ihl in [ 6, 15 ]:
+			with self.subTest(ihl = ihl):
+				self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(ihl = ihl))), self._PAYLOAD)
+
+	def test_linux_sll(self):
+		self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_LINUX_SLL, self._linux_sll(self._ipv4())), self._PAYLOAD)
+		self.assertIsNone(self._extract(CapturePrefilter.LINKTYPE_LINUX_SLL, self._linux_sll(self._ipv4(), protocol = 0x86dd)))
+
+	def test_raw(self):
+		for linktype in [ CapturePrefilter.LINKTYPE_RAW, CapturePrefilter.LINKTYPE_IPV4 ]:
+			with self.subTest(linktype = linktype):
+				self.assertEqual(self._extract(linktype, self._ipv4()), self._PAYLOAD)
+
+	def test_unknown_linktype(self):
+		self.assertIsNone(self._extract(12345, self._ipv4()))
+
+	def test_ports(self):
+		for (source_port, destination_port, passes) in [ (29809, 29808, True), (29808, 29809, True), (12345, 29808, True), (29809, 12345, True), (53, 53, False) ]:
+			with self.subTest(source_port = source_port, destination_port = destination_port):
+				payload = self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(source_port = source_port, destination_port = destination_port)))
+				self.assertEqual(payload, self._PAYLOAD if passes else None)
+		prefilter = CapturePrefilter(ports = (53, ))
+		self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(source_port = 53, destination_port = 53)), prefilter), self._PAYLOAD)
+
+	def test_not_udp(self):
+		self.assertIsNone(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(protocol = 6))))
+
+	def test_truncated(self):
+		frame = self._ethernet(self._ipv4())
+		for length in [ 10, 14 + 19, len(frame) - 1 ]:
+			with self.subTest(length = length):
+				self.assertIsNone(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, frame[ : length]))
+
+	def test_ip_fragments(self):
+		prefilter = CapturePrefilter()
+		frames = [
+			# First fragment of a TP-Link datagram
+			self._ethernet(self._ipv4(flags_fragment = 0x2000)),
+			# Any later fragment
+			self._ethernet(self._ipv4(flags_fragment = 0x0010)),
+			self._ethernet(self._ipv4(flags_fragment = 0x2010)),
+			# First fragment of some other datagram
+			self._ethernet(self._ipv4(source_port = 53, destination_port = 53, flags_fragment = 0x2000)),
+		]
+		for frame in frames:
+			self.assertIsNone(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, frame, prefilter))
+		self.assertEqual(prefilter.ip_fragments, 1)
+
+		# Don't fragment flag
+		self.assertEqual(self._extract(CapturePrefilter.LINKTYPE_ETHERNET, self._ethernet(self._ipv4(flags_fragment = 0x4000)), prefilter), self._PAYLOAD)
+		self.assertEqual(prefilter.ip_fragments, 1)
+
+if __name__ == "__main__":
+	unittest.main()
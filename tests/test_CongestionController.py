@@ -0,0 +1,100 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import asyncio
+import unittest
+from tplink_cli.CongestionController import CongestionController
+from tplink_cli.TPLinkClient import TPLinkClient
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode
+from tplink_cli.Exceptions import ReceiveTimeoutException
+from FakeInterface import FakeInterface, response_to
+
+class CongestionControllerTests(unittest.IsolatedAsyncioTestCase):
+	_SWITCH_MAC = MACAddress(b"\x02\xfc\x00\x00\x00\x01")
+
+	async def _complete(self, controller: CongestionController, acknowledged: bool | None, count: int = 1):
+		for _ in range(count):
+			await controller.acquire(self._SWITCH_MAC)
+			controller.release(self._SWITCH_MAC, acknowledged)
+
+	async def test_window_grows_on_acknowledgements(self):
+		controller = CongestionController()
+		await self._complete(controller, True)
+		self.assertEqual(controller.state(self._SWITCH_MAC).window, 2)
+		await self._complete(controller, True)
+		self.assertEqual(controller.state(self._SWITCH_MAC).window, 2.5)
+		self.assertEqual(controller.state(self._SWITCH_MAC).acknowledged, 2)
+
+	async def test_window_shrinks_on_loss(self):
+		controller = CongestionController(initial_window = 8)
+		await self._complete(controller, False)
+		self.assertEqual(controller.state(self._SWITCH_MAC).window, 4)
+		self.assertEqual(controller.state(self._SWITCH_MAC).losses, 1)
+
+	async def test_cancellation_keeps_window(self):
+		controller = CongestionController(initial_window = 8)
+		await self._complete(controller, None)
+		self.assertEqual(controller.state(self._SWITCH_MAC), CongestionController.WindowState(window = 8, in_flight = 0, queued = 0, acknowledged = 0, losses = 0))
+
+	async def test_window_bounds(self):
+		controller = CongestionController(initial_window = 2, min_window = 2, max_window = 4)
+		await self._complete(controller, True, count = 100)
+		self.assertEqual(controller.state(self._SWITCH_MAC).window, 4)
+		await self._complete(controller, False, count = 10)
+		self.assertEqual(controller.state(self._SWITCH_MAC).window, 2)
+
+	async def test_window_limits_requests_in_flight(self):
+		controller = CongestionController(initial_window = 2)
+		await controller.acquire(self._SWITCH_MAC)
+		await controller.acquire(self._SWITCH_MAC)
+		waiter = asyncio.create_task(controller.acquire(self._SWITCH_MAC))
+		await asyncio.sleep(0)
+		self.assertFalse(waiter.done())
+		self.assertEqual(controller.state(self._SWITCH_MAC).queued, 1)
+
+		controller.release(self._SWITCH_MAC, True)
+		await waiter
+		self.assertEqual(controller.state(self._SWITCH_MAC).in_flight, 2)
+
+	async def _request(self, responder: "callable"):
+		controller = CongestionController(initial_window = 4)
+		async with TPLinkClient(FakeInterface(responder), timeout = 0.05, congestion_controller = controller) as client:
+			try:
+				await client.request(Opcode.SetData, switch_mac = self._SWITCH_MAC)
+			except ReceiveTimeoutException:
+				pass
+		return controller.state(self._SWITCH_MAC)
+
+	async def test_client_acknowledgement(self):
+		state = await self._request(lambda request: [ (0, response_to(request, Opcode.AcknowledgeSetData)) ])
+		self.assertEqual((state.window, state.in_flight, state.acknowledged, state.losses), (4.25, 0, 1, 0))
+
+	async def test_client_error_code(self):
+		state = await self._request(lambda request: [ (0, response_to(request, Opcode.AcknowledgeSetData, error_code = 1)) ])
+		self.assertEqual((state.window, state.in_flight, state.acknowledged, state.losses), (2, 0, 0, 1))
+
+	async def test_client_timeout(self):
+		state = await self._request(lambda request: [ ])
+		self.assertEqual((state.window, state.in_flight, state.acknowledged, state.losses), (2, 0, 0, 1))
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,105 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import time
+import unittest
+import unittest.mock
+import ipaddress
+from tplink_cli.DiscoveryScanner import DiscoveryScanner
+from tplink_cli.TPLinkClient import TPLinkClient
+from tplink_cli.PacketField import PacketField
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.TPLinkTypes import TPLinkString, TPLinkMAC, TPLinkIPv4, codec_registry
+from FakeInterface import FakeInterface, response_to
+
+class DiscoveryScannerTests(unittest.IsolatedAsyncioTestCase):
+	_IDENTITY_TAGS = set([ FieldTag.SwitchName, FieldTag.MAC, FieldTag.IPAddress, FieldTag.FirmwareVersion, FieldTag.HardwareVersion ])
+
+	@staticmethod
+	def _switch_mac(switch_index: int):
+		return MACAddress(bytes.fromhex("02fc000000") + bytes([ switch_index ]))
+
+	def _responder(self, switch_count: int, repeat: int = 1, gap: float = 0.001):
+		def responder(request):
+			responses = [ ]
+			for switch_index in range(switch_count):
+				switch_mac = self._switch_mac(switch_index)
+				response = response_to(request, Opcode.ResponseData, switch_mac = switch_mac, fields = [
+					PacketField(FieldTag.SwitchName, TPLinkString(f"switch{switch_index}")),
+					PacketField(FieldTag.DeviceDescription, TPLinkString("Simulated Switch")),
+					PacketField(FieldTag.MAC, TPLinkMAC(switch_mac)),
+					PacketField(FieldTag.FirmwareVersion, TPLinkString("1.0.1")),
+					PacketField(FieldTag.HardwareVersion, TPLinkString("TL-SG1016PE 5.20")),
+					# Malformed, but never looked at by the scanner
+					PacketField.from_raw(FieldTag.DHCP, b"\x01\x02\x03"),
+					PacketField(FieldTag.IPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.32") + switch_index)),
+				])
+				for _ in range(repeat):
+					responses.append((gap * len(responses), response))
+			return responses
+		return responder
+
+	async def _scan(self, responder: "callable", timeout: float = 5.0):
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			scanner = DiscoveryScanner(client, timeout = timeout, min_quiet = 0.05)
+			identities = await scanner.scan()
+			self.assertEqual(client.statistics.in_flight, 0)
+		return (scanner, identities)
+
+	async def test_identities(self):
+		(scanner, identities) = await self._scan(self._responder(3))
+		self.assertEqual(list(identities), [ self._switch_mac(switch_index) for switch_index in range(3) ])
+		identity = identities[self._switch_mac(2)]
+		self.assertEqual(identity.name, "switch2")
+		self.assertEqual(identity.mac, self._switch_mac(2))
+		self.assertEqual(identity.ip_address, ipaddress.ip_address("192.168.123.34"))
+		self.assertEqual(identity.firmware_version, "1.0.1")
+		self.assertEqual(identity.hardware_version, "TL-SG1016PE 5.20")
+		self.assertEqual(identity.interface, "fake0")
+		self.assertEqual((scanner.duplicates, scanner.invalid), (0, 0))
+
+	async def test_duplicates(self):
+		(scanner, identities) = await self._scan(self._responder(4, repeat = 3))
+		self.assertEqual(len(identities), 4)
+		self.assertEqual(scanner.duplicates, 8)
+
+	async def test_only_identity_fields_decoded(self):
+		with unittest.mock.patch.object(codec_registry, "decode", wraps = codec_registry.decode) as decode:
+			(scanner, identities) = await self._scan(self._responder(2))
+		self.assertEqual(len(identities), 2)
+		self.assertEqual(scanner.invalid, 0)
+		self.assertEqual(set(call.args[0] for call in decode.call_args_list), self._IDENTITY_TAGS)
+
+	async def test_quiet_period_ends_scan(self):
+		t0 = time.monotonic()
+		(scanner, identities) = await self._scan(self._responder(10), timeout = 5.0)
+		self.assertEqual(len(identities), 10)
+		self.assertLess(time.monotonic() - t0, 1.0)
+
+	async def test_timeout_without_responses(self):
+		t0 = time.monotonic()
+		(scanner, identities) = await self._scan(lambda request: [ ], timeout = 0.1)
+		self.assertEqual(identities, { })
+		self.assertGreaterEqual(time.monotonic() - t0, 0.1)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,125 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import unittest
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.TPLinkTypes import TPLinkRawData
+
+class FragmentReassemblerTests(unittest.TestCase):
+	_HEADER = RC4Packet._HEADER_DEFINITION
+
+	def _message(self, sequence_number: int = 1, field_count: int = 4):
+		fields = PacketFields()
+		for index in range(field_count):
+			fields.append(PacketField(FieldTag.MulticastIPTable, TPLinkRawData(bytes([ index ]) * 100)))
+		rc4_pkt = RC4Packet(version = 1, opcode = Opcode.ResponseData, switch_mac = MACAddress(b"\x11" * 6), host_mac = MACAddress(b"\x22" * 6), sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = fields)
+		return rc4_pkt.serialize_plaintext()
+
+	def _fragments(self, plaintext: bytes, fragment_size: int = 128):
+		header = self._HEADER.unpack_from(plaintext)
+		payload = plaintext[self._HEADER.size : ]
+		return [ self._HEADER.pack(header._replace(fragmentation_offset = offset)._asdict()) + payload[offset : offset + fragment_size] for offset in range(0, len(payload), fragment_size) ]
+
+	def _add_all(self, reassembler: "FragmentReassembler", fragments: list[bytes], timestamp: float = 0):
+		results = [ reassembler.add(fragment, timestamp) for fragment in fragments ]
+		return [ result for result in results if result is not None ]
+
+	def test_in_order(self):
+		reassembler = RC4Packet.reassembler()
+		message = self._message()
+		self.assertEqual(self._add_all(reassembler, self._fragments(message)), [ message ])
+		self.assertEqual(reassembler.statistics, reassembler.Statistics(reassembled = 1, duplicates = 0, expired = 0, evicted = 0, oversized = 0, pending = 0, memory_used = 0))
+
+	def test_out_of_order(self):
+		reassembler = RC4Packet.reassembler()
+		message = self._message()
+		fragments = self._fragments(message)
+		fragments = fragments[1 : : 2] + fragments[ : : 2][ : : -1]
+		results = [ reassembler.add(fragment, 0) for fragment in fragments ]
+		self.assertEqual(results[ : -1], [ None ] * (len(fragments) - 1))
+		self.assertEqual(results[-1], message)
+		self.assertEqual(RC4Packet.deserialize_plaintext(results[-1]).payload.get(FieldTag.MulticastIPTable).value.value, bytes(100))
+
+	def test_interleaved_messages(self):
+		reassembler = RC4Packet.reassembler()
+		(message1, message2) = (self._message(1), self._message(2, field_count = 6))
+		(fragments1, fragments2) = (self._fragments(message1), self._fragments(message2))
+		fragments = [ fragment for pair in zip(fragments1, fragments2) for fragment in pair ] + fragments2[len(fragments1) : ]
+		self.assertEqual(self._add_all(reassembler, fragments), [ message1, message2 ])
+
+	def test_duplicates(self):
+		reassembler = RC4Packet.reassembler()
+		message = self._message()
+		fragments = self._fragments(message)
+		self.assertIsNone(reassembler.add(fragments[0], 0))
+		self.assertIsNone(reassembler.add(fragments[0], 0))
+		self.assertEqual(self._add_all(reassembler, fragments[1 : ] + fragments[ : 1]), [ message ])
+		self.assertEqual(reassembler.statistics.duplicates, 1)
+		self.assertEqual(reassembler.statistics.reassembled, 1)
+
+	def test_gap_never_completes(self):
+		reassembler = RC4Packet.reassembler()
+		fragments = self._fragments(self._message())
+		del fragments[1]
+		self.assertEqual(self._add_all(reassembler, fragments), [ ])
+		self.assertEqual(reassembler.statistics.pending, 1)
+		self.assertEqual(reassembler.statistics.reassembled, 0)
+
+	def test_timeout(self):
+		reassembler = RC4Packet.reassembler(timeout = 2.0)
+		fragments = self._fragments(self._message(1))
+		self._add_all(reassembler, fragments[ : -1], timestamp = 10)
+		reassembler.expire(12)
+		self.assertEqual(reassembler.statistics.pending, 1)
+		reassembler.expire(12.5)
+		self.assertEqual(reassembler.statistics.pending, 0)
+		self.assertEqual(reassembler.statistics.expired, 1)
+		self.assertEqual(reassembler.statistics.memory_used, 0)
+
+		# The remaining fragment starts a new message that cannot complete
+		self.assertIsNone(reassembler.add(fragments[-1], 13))
+		self.assertEqual(reassembler.statistics.pending, 1)
+
+	def test_memory_budget(self):
+		message = self._message()
+		reassembler = RC4Packet.reassembler(memory_budget = 2 * len(message))
+		for sequence_number in range(1, 4):
+			self.assertEqual(self._add_all(reassembler, self._fragments(self._message(sequence_number))[ : -1]), [ ])
+		self.assertEqual(reassembler.statistics.evicted, 1)
+		self.assertEqual(reassembler.statistics.pending, 2)
+		self.assertEqual(reassembler.statistics.memory_used, 2 * len(message))
+
+		# The oldest message was evicted, the newer ones still complete
+		self.assertEqual(self._add_all(reassembler, self._fragments(self._message(1))[-1 : ]), [ ])
+		self.assertEqual(self._add_all(reassembler, self._fragments(self._message(3))[-1 : ]), [ self._message(3) ])
+
+	def test_oversized(self):
+		message = self._message()
+		reassembler = RC4Packet.reassembler(memory_budget = len(message) - 1)
+		self.assertEqual(self._add_all(reassembler, self._fragments(message)), [ ])
+		self.assertEqual(reassembler.statistics.oversized, len(self._fragments(message)))
+		self.assertEqual(reassembler.statistics.memory_used, 0)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,138 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import struct
+import tempfile
+import unittest
+from tplink_cli.PCAPNGReader import PCAPNGReader
+from tplink_cli.Exceptions import CaptureFormatException
+
+class PCAPNGReaderTests(unittest.TestCase):
+	_FRAMES = [ b"\x01" * 60, b"\x02" * 61, b"\x03" * 62, b"\x04" * 63 ]
+
+	def setUp(self):
+		(fd, self._filename) = tempfile.mkstemp(suffix = ".pcapng")
+		os.close(fd)
+
+	def tearDown(self):
+		os.unlink(self._filename)
+
+	@staticmethod
+	def _block(endian: str, block_type: int, body: bytes):
+		body += bytes(-len(body) % 4)
+		return struct.pack(endian + "II", block_type, 12 + len(body)) + body + struct.pack(endian + "I", 12 + len(body))
+
+	def _section_header(self, endian: str):
+		return self._block(endian, 0x0a0d0d0a, struct.pack(endian + "IHHq", 0x1a2b3c4d, 1, 0, -1))
+
+	def _interface_description(self, endian: str, tsresol: int | None = None, linktype: int = 1):
+		options = b""
+		if tsresol is not None:
+			options = struct.pack(endian + "HH", 9, 1) + bytes([ tsresol, 0, 0, 0 ]) + struct.pack(endian + "HH", 0, 0)
+		return self._block(endian, 1, struct.pack(endian + "HHI", linktype, 0, 65535) + options)
+
+	def _enhanced_packet(self, endian: str, frame: bytes, timestamp: int, interface_id: int = 0):
+		return self._block(endian, 6, struct.pack(endian + "IIIII", interface_id, timestamp >> 32, timestamp & 0xffffffff, len(frame), len(frame)) + frame)
+
+	def _simple_packet(self, endian: str, frame: bytes):
+		return self._block(endian, 3, struct.pack(endian + "I", len(frame)) + frame)
+
+	def _read(self, content: bytes):
+		with open(self._filename, "wb") as f:
+			f.write(content)
+		with PCAPNGReader(self._filename) as reader:
+			return [ packet._replace(data = bytes(packet.data)) for packet in reader ]
+
+	def _capture(self, endian: str, tsresol: int | None = None, timestamps: "list[int]" = (1700000000000000, 1700000000000001)):
+		content = self._section_header(endian) + self._interface_description(endian, tsresol = tsresol)
+		for (frame, timestamp) in zip(self._FRAMES, timestamps):
+			content += self._enhanced_packet(endian, frame, timestamp)
+		return content
+
+	def test_byte_order(self):
+		for endian in [ "<", ">" ]:
+			with self.subTest(endian = endian):
+				packets = self._read(self._capture(endian))
+				self.assertEqual([ packet.data for packet in packets ], self._FRAMES[ : 2])
+				self.assertEqual([ packet.linktype for packet in packets ], [ 1, 1 ])
+				self.assertAlmostEqual(packets[0].timestamp, 1700000000.0)
+				self.assertAlmostEqual(packets[1].timestamp, 1700000000.000001)
+
+	def test_decimal_timestamp_resolution(self):
+		packets = self._read(self._capture(">", tsresol = 9, timestamps = [ 1700000000123456789 ]))
+		self.assertAlmostEqual(packets[0].timestamp, 1700000000.123456789, delta = 1e-6)
+
+	def test_binary_timestamp_resolution(self):
+		packets = self._read(self._capture("<", tsresol = 0x80 | 10, timestamps = [ (1700000000 << 10) | 512 ]))
+		self.assertEqual(packets[0].timestamp, 1700000000.5)
+
+	def test_simple_and_enhanced_packets(self):
+		endian = "<"
+		content = self._section_header(endian) + self._interface_description(endian, linktype = 101)
+		content += self._simple_packet(endian, self._FRAMES[0])
+		content += self._enhanced_packet(endian, self._FRAMES[1], 1700000000000000)
+		packets = self._read(content)
+		self.assertEqual([ packet.data for packet in packets ], self._FRAMES[ : 2])
+		self.assertEqual([ packet.linktype for packet in packets ], [ 101, 101 ])
+		self.assertIsNone(packets[0].timestamp)
+		self.assertAlmostEqual(packets[1].timestamp, 1700000000.0)
+		self.assertEqual([ content[packet.data_offset : packet.data_offset + len(packet.data)] for packet in packets ], self._FRAMES[ : 2])
+
+	def test_sections(self):
+		content = self._capture("<") + self._section_header(">") + self._interface_description(">", linktype = 113) + self._enhanced_packet(">", self._FRAMES[2], 0)
+		packets = self._read(content)
+		self.assertEqual([ packet.data for packet in packets ], self._FRAMES[ : 3])
+		self.assertEqual([ packet.linktype for packet in packets ], [ 1, 1, 113 ])
+
+	def test_truncated_trailing_block(self):
+		content = self._capture("<")
+		for truncation in [ 1, 20 ]:
+			with self.subTest(truncation = truncation):
+				with open(self._filename, "wb") as f:
+					f.write(content[ : -truncation])
+				packets = [ ]
+				with PCAPNGReader(self._filename) as reader, self.assertRaises(CaptureFormatException):
+					for packet in reader:
+						packets.append(bytes(packet.data))
+				self.assertEqual(packets, self._FRAMES[ : 1])
+
+	def test_undefined_interface(self):
+		content = self._section_header("<") + self._interface_description("<") + self._enhanced_packet("<", self._FRAMES[0], 0, interface_id = 1)
+		with self.assertRaises(CaptureFormatException):
+			self._read(content)
+
+	def test_not_pcapng(self):
+		with self.assertRaises(CaptureFormatException):
+			self._read(self._interface_description("<"))
+
+	def test_chunks(self):
+		content = self._capture("<", timestamps = range(4))
+		with open(self._filename, "wb") as f:
+			f.write(content)
+		with PCAPNGReader(self._filename) as reader:
+			chunks = list(reader.chunks(1))
+			packets = [ bytes(packet.data) for chunk in chunks for packet in reader.chunk_packets(chunk) ]
+		self.assertEqual(len(chunks), 6)
+		self.assertEqual(packets, self._FRAMES)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,168 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import io
+import math
+import collections
+import unittest
+from tplink_cli.PacketCorrelator import PacketCorrelator, LatencyHistogram
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode
+
+Header = collections.namedtuple("Header", [ "opcode", "switch_mac", "host_mac", "sequence_number", "error_code" ])
+
+class LatencyHistogramTests(unittest.TestCase):
+	def test_empty(self):
+		histogram = LatencyHistogram()
+		self.assertIsNone(histogram.percentile(50))
+		self.assertEqual((histogram.count, histogram.max), (0, 0))
+
+	def test_percentiles(self):
+		histogram = LatencyHistogram()
+		for i in range(1, 1001):
+			histogram.add(i / 1000)
+		self.assertEqual(histogram.count, 1000)
+		self.assertEqual(histogram.max, 1)
+		self.assertTrue(0.5 <= histogram.percentile(50) <= 0.5 * (2 ** (1 / 8)))
+		self.assertTrue(0.99 <= histogram.percentile(99) <= 0.99 * (2 ** (1 / 8)))
+		self.assertEqual(histogram.percentile(100), 1)
+
+	def test_buckets(self):
+		histogram = LatencyHistogram()
+		for latency in [ 0.001, 0.00101, 0.002 ]:
+			histogram.add(latency)
+		# The first two samples share a bucket, the third one is an octave up
+		self.assertEqual(histogram.percentile(33), histogram.percentile(66))
+		self.assertLess(histogram.percentile(66), 0.002)
+		self.assertTrue(0.00101 <= histogram.percentile(66) <= 0.001 * (2 ** (1 / 8)))
+		self.assertEqual(histogram.percentile(100), 0.002)
+
+	def test_minimum_latency(self):
+		histogram = LatencyHistogram()
+		histogram.add(0)
+		histogram.add(-1)
+		self.assertEqual(histogram.percentile(100), 1e-6)
+
+class PacketCorrelatorTests(unittest.TestCase):
+	_HOST_MAC = MACAddress(b"\x22" * 6)
+	_ANY_SWITCH = MACAddress(bytes(6))
+	_SWITCH_MACS = [ MACAddress(bytes([ 0x02, 0xfc, 0, 0, 0, index ])) for index in range(1, 4) ]
+
+	def _observe(self, correlator: PacketCorrelator, timestamp: float, opcode: Opcode, switch_mac: MACAddress, sequence_number: int = 1, error_code: int = 0):
+		correlator.observe(Header(opcode = opcode, switch_mac = switch_mac, host_mac = self._HOST_MAC, sequence_number = sequence_number, error_code = error_code), timestamp)
+
+	def test_matched(self):
+		correlator = PacketCorrelator()
+		switch_mac = self._SWITCH_MACS[0]
+		self._observe(correlator, 10.0, Opcode.SetData, switch_mac)
+		self._observe(correlator, 10.5, Opcode.AcknowledgeSetData, switch_mac, error_code = 3)
+		stats = correlator.switches[switch_mac]
+		self.assertEqual((stats.requests, stats.responses, stats.timeouts, stats.retransmits, stats.unmatched_responses), (1, 1, 0, 0, 0))
+		self.assertEqual(stats.latency.percentile(100), 0.5)
+		self.assertEqual(stats.error_codes, { 3: 1 })
+		self.assertEqual(correlator.pending, 0)
+
+	def test_same_sequence_number_to_different_switches(self):
+		correlator = PacketCorrelator(timeout = 30)
+		for (index, switch_mac) in enumerate(self._SWITCH_MACS):
+			self._observe(correlator, 10.0 + index, Opcode.RequestData, switch_mac)
+		for switch_mac in self._SWITCH_MACS:
+			self._observe(correlator, 20.0, Opcode.ResponseData, switch_mac)
+		self.assertEqual([ correlator.switches[switch_mac].latency.percentile(100) for switch_mac in self._SWITCH_MACS ], [ 10, 9, 8 ])
+
+	def test_unmatched(self):
+		correlator = PacketCorrelator()
+		switch_mac = self._SWITCH_MACS[0]
+		self._observe(correlator, 10.0, Opcode.ResponseData, switch_mac)
+		# Wrong response opcode for the request
+		self._observe(correlator, 11.0, Opcode.SetData, switch_mac, sequence_number = 2)
+		self._observe(correlator, 11.1, Opcode.ResponseData, switch_mac, sequence_number = 2)
+		stats = correlator.switches[switch_mac]
+		self.assertEqual((stats.requests, stats.responses, stats.unmatched_responses, stats.latency.count), (1, 2, 2, 0))
+		self.assertEqual(correlator.pending, 1)
+
+	def test_duplicate_response(self):
+		correlator = PacketCorrelator()
+		switch_mac = self._SWITCH_MACS[0]
+		self._observe(correlator, 10.0, Opcode.RequestData, switch_mac)
+		self._observe(correlator, 10.1, Opcode.ResponseData, switch_mac)
+		self._observe(correlator, 10.2, Opcode.ResponseData, switch_mac)
+		stats = correlator.switches[switch_mac]
+		self.assertEqual((stats.responses, stats.unmatched_responses, stats.latency.count), (2, 1, 1))
+
+	def test_retransmit(self):
+		correlator = PacketCorrelator()
+		switch_mac = self._SWITCH_MACS[0]
+		self._observe(correlator, 10.0, Opcode.RequestData, switch_mac)
+		self._observe(correlator, 10.5, Opcode.RequestData, switch_mac)
+		self._observe(correlator, 10.6, Opcode.ResponseData, switch_mac)
+		stats = correlator.switches[switch_mac]
+		self.assertEqual((stats.requests, stats.retransmits, stats.responses, stats.unmatched_responses), (2, 1, 1, 0))
+		# Ambiguous latency sample
+		self.assertEqual(stats.latency.count, 0)
+
+	def test_broadcast(self):
+		correlator = PacketCorrelator(timeout = 5)
+		self._observe(correlator, 10.0, Opcode.Discovery, self._ANY_SWITCH)
+		for (index, switch_mac) in enumerate(self._SWITCH_MACS):
+			self._observe(correlator, 10.1 + index, Opcode.ResponseData, switch_mac)
+		for (index, switch_mac) in enumerate(self._SWITCH_MACS):
+			stats = correlator.switches[switch_mac]
+			self.assertEqual((stats.responses, stats.unmatched_responses), (1, 0))
+			self.assertAlmostEqual(stats.latency.percentile(100), 0.1 + index)
+		self.assertEqual(correlator.pending, 0)
+
+		# An answered broadcast does not time out
+		correlator.expire(math.inf)
+		self.assertEqual(correlator.switches[self._ANY_SWITCH].timeouts, 0)
+
+	def test_timeout(self):
+		correlator = PacketCorrelator(timeout = 1.0)
+		switch_mac = self._SWITCH_MACS[0]
+		self._observe(correlator, 10.0, Opcode.SetData, switch_mac)
+		self._observe(correlator, 11.0, Opcode.SetData, switch_mac, sequence_number = 2)
+		self.assertEqual(correlator.switches[switch_mac].timeouts, 0)
+		self._observe(correlator, 11.5, Opcode.AcknowledgeSetData, switch_mac)
+		self.assertEqual(correlator.switches[switch_mac].timeouts, 1)
+		self.assertEqual(correlator.switches[switch_mac].unmatched_responses, 1)
+		correlator.expire(math.inf)
+		self.assertEqual(correlator.switches[switch_mac].timeouts, 2)
+		self.assertEqual(correlator.pending, 0)
+
+	def test_missing_timestamp(self):
+		correlator = PacketCorrelator()
+		self._observe(correlator, None, Opcode.SetData, self._SWITCH_MACS[0])
+		self._observe(correlator, math.nan, Opcode.SetData, self._SWITCH_MACS[0])
+		self.assertEqual(len(correlator.switches), 0)
+		f = io.StringIO()
+		correlator.report(file = f)
+		self.assertIn("2 packets without timestamp skipped", f.getvalue())
+
+	def test_max_inflight(self):
+		correlator = PacketCorrelator(max_inflight = 2)
+		for sequence_number in range(3):
+			self._observe(correlator, 10.0, Opcode.SetData, self._SWITCH_MACS[0], sequence_number = sequence_number)
+		self._observe(correlator, 10.1, Opcode.AcknowledgeSetData, self._SWITCH_MACS[0], sequence_number = 0)
+		self.assertEqual(correlator.switches[self._SWITCH_MACS[0]].unmatched_responses, 1)
+		self.assertEqual(correlator.pending, 2)
+
+if __name__ == "__main__":
+	unittest.main()
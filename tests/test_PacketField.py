@@ -0,0 +1,107 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import unittest
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.Enums import FieldTag
+from tplink_cli.TPLinkTypes import TPLinkString, TPLinkRawData
+from tplink_cli.Exceptions import DeserializationException
+
+class PacketFieldsTests(unittest.TestCase):
+	_UNKNOWN_TAG = 0x4321
+
+	def _fields(self):
+		return [
+			PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")),
+			PacketField(FieldTag.MulticastIPTable, TPLinkRawData(b"\x01")),
+			PacketField(self._UNKNOWN_TAG, TPLinkRawData(b"\xaa\xbb")),
+			PacketField(FieldTag.MulticastIPTable, TPLinkRawData(b"\x02")),
+			PacketField(FieldTag.MulticastIPTable, TPLinkRawData(b"\x03")),
+		]
+
+	def _appended(self):
+		packet_fields = PacketFields()
+		packet_fields.append_all(self._fields())
+		return packet_fields
+
+	def _variants(self):
+		serialized = bytes(self._appended())
+		return {
+			"appended":		self._appended(),
+			"from_raw":		PacketFields.from_raw(memoryview(serialized)),
+			"deserialize":	PacketFields.deserialize(serialized),
+		}
+
+	def test_single(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				self.assertIn(FieldTag.SwitchName, packet_fields)
+				self.assertEqual(packet_fields.get(FieldTag.SwitchName).value.value, "TL-SG1016PE")
+				self.assertEqual(packet_fields.get(int(FieldTag.SwitchName)).tag, FieldTag.SwitchName)
+				self.assertEqual([ field.value.value for field in packet_fields.get_all(FieldTag.SwitchName) ], [ "TL-SG1016PE" ])
+				self.assertEqual(packet_fields.get(self._UNKNOWN_TAG).value.value, b"\xaa\xbb")
+
+	def test_repeated(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				self.assertIn(FieldTag.MulticastIPTable, packet_fields)
+				self.assertEqual(packet_fields.get(FieldTag.MulticastIPTable).value.value, b"\x01")
+				self.assertEqual([ field.value.value for field in packet_fields.get_all(FieldTag.MulticastIPTable) ], [ b"\x01", b"\x02", b"\x03" ])
+
+	def test_missing(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				self.assertNotIn(FieldTag.IPAddress, packet_fields)
+				self.assertIsNone(packet_fields.get(FieldTag.IPAddress))
+				self.assertEqual(packet_fields.get(FieldTag.IPAddress, default = "missing"), "missing")
+				self.assertEqual(packet_fields.get_all(FieldTag.IPAddress), [ ])
+
+	def test_append_to_parsed(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				packet_fields.append(PacketField(FieldTag.SwitchName, TPLinkString("second")))
+				packet_fields.append(PacketField(FieldTag.IPAddress, TPLinkRawData(bytes(4))))
+				self.assertEqual(len(packet_fields), 7)
+				self.assertEqual([ field.value.value for field in packet_fields.get_all(FieldTag.SwitchName) ], [ "TL-SG1016PE", "second" ])
+				self.assertIn(FieldTag.IPAddress, packet_fields)
+				self.assertEqual(len(packet_fields.get_all(FieldTag.MulticastIPTable)), 3)
+
+	def test_order_and_serialization(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				self.assertEqual([ int(field.tag) for field in packet_fields ], [ int(field.tag) for field in self._fields() ])
+				self.assertEqual(bytes(packet_fields), bytes(self._appended()))
+
+	def test_clear(self):
+		for (name, packet_fields) in self._variants().items():
+			with self.subTest(name = name):
+				packet_fields.clear()
+				self.assertEqual(len(packet_fields), 0)
+				self.assertNotIn(FieldTag.SwitchName, packet_fields)
+
+	def test_malformed_raw_payload(self):
+		packet_fields = PacketFields.from_raw(memoryview(bytes.fromhex("0001 0010 41")))
+		for _ in range(2):
+			with self.assertRaises(DeserializationException):
+				packet_fields.get(FieldTag.SwitchName)
+
+if __name__ == "__main__":
+	unittest.main()
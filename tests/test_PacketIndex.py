@@ -0,0 +1,112 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import struct
+import tempfile
+import unittest
+from tplink_cli.PacketIndex import PacketIndex
+from tplink_cli.PacketFilter import PacketFilter
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketFields
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode
+from tplink_cli.Exceptions import CaptureFormatException
+
+class PacketIndexTests(unittest.TestCase):
+	def setUp(self):
+		self._tempdir = tempfile.TemporaryDirectory()
+		self._filename = os.path.join(self._tempdir.name, "capture.pcapng")
+
+	def tearDown(self):
+		self._tempdir.cleanup()
+
+	@staticmethod
+	def _block(block_type: int, body: bytes):
+		body += bytes(-len(body) % 4)
+		return struct.pack("<II", block_type, 12 + len(body)) + body + struct.pack("<I", 12 + len(body))
+
+	@staticmethod
+	def _frame(sequence_number: int, opcode: Opcode):
+		rc4_pkt = RC4Packet(version = 1, opcode = opcode, switch_mac = MACAddress(b"\x11" * 6), host_mac = MACAddress(b"\x22" * 6), sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = PacketFields())
+		payload = rc4_pkt.serialize()
+		udp = struct.pack(">HHHH", 29809, 29808, 8 + len(payload), 0) + payload
+		ip = struct.pack(">BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), 0, 0, 64, 17, 0, bytes([ 192, 168, 0, 1 ]), bytes([ 255, 255, 255, 255 ])) + udp
+		return (b"\xff" * 6) + (b"\x02" * 6) + b"\x08\x00" + ip
+
+	def _write_capture(self, packet_count: int):
+		content = self._block(0x0a0d0d0a, struct.pack("<IHHq", 0x1a2b3c4d, 1, 0, -1))
+		content += self._block(1, struct.pack("<HHI", 1, 0, 65535))
+		for sequence_number in range(packet_count):
+			frame = self._frame(sequence_number, Opcode.Discovery if (sequence_number % 2 == 0) else Opcode.ResponseData)
+			content += self._block(6, struct.pack("<IIIII", 0, 0, sequence_number, len(frame), len(frame)) + frame)
+		with open(self._filename, "wb") as f:
+			f.write(content)
+		return content
+
+	def test_build_and_query(self):
+		self._write_capture(10)
+		self.assertEqual(PacketIndex.build(self._filename), 10)
+		with PacketIndex.load(self._filename) as index:
+			self.assertEqual(len(index), 10)
+			records = list(index.query(PacketFilter(opcodes = [ Opcode.ResponseData ])))
+		self.assertEqual([ record.sequence_number for record in records ], [ 1, 3, 5, 7, 9 ])
+		self.assertEqual([ round(record.timestamp * 1e6) for record in records ], [ 1, 3, 5, 7, 9 ])
+
+	def test_missing_index(self):
+		self._write_capture(1)
+		self.assertIsNone(PacketIndex.load(self._filename))
+
+	def test_modified_capture(self):
+		self._write_capture(4)
+		PacketIndex.build(self._filename)
+		stat = os.stat(self._filename)
+
+		# Same size, different modification time
+		os.utime(self._filename, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+		self.assertIsNone(PacketIndex.load(self._filename))
+
+		# Different size, same modification time
+		self._write_capture(5)
+		os.utime(self._filename, ns = (stat.st_atime_ns, stat.st_mtime_ns))
+		self.assertIsNone(PacketIndex.load(self._filename))
+
+		self.assertEqual(PacketIndex.build(self._filename), 5)
+		with PacketIndex.load(self._filename) as index:
+			self.assertEqual(len(index), 5)
+
+	def test_truncated_index(self):
+		self._write_capture(4)
+		PacketIndex.build(self._filename)
+		index_filename = PacketIndex.index_filename(self._filename)
+		os.truncate(index_filename, os.stat(index_filename).st_size - 1)
+		self.assertIsNone(PacketIndex.load(self._filename))
+
+	def test_failed_build_leaves_no_files(self):
+		content = self._write_capture(4)
+		with open(self._filename, "wb") as f:
+			f.write(content[ : -1])
+		with self.assertRaises(CaptureFormatException):
+			PacketIndex.build(self._filename)
+		self.assertEqual(os.listdir(self._tempdir.name), [ "capture.pcapng" ])
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,69 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import unittest
+from tplink_cli.RC4Packet import RC4Packet
+from tplink_cli.PacketField import PacketField, PacketFields
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.TPLinkTypes import TPLinkString
+
+class RC4PacketBatchTests(unittest.TestCase):
+	_SWITCH_MACS = [ MACAddress(bytes([ 0x02, 0xfc, 0, 0, 0, index ])) for index in range(1, 3) ]
+
+	def _datagram(self, sequence_number: int, opcode: Opcode, switch_mac: MACAddress):
+		fields = PacketFields()
+		fields.append(PacketField(FieldTag.SwitchName, TPLinkString(f"switch{sequence_number}")))
+		rc4_pkt = RC4Packet(version = 1, opcode = opcode, switch_mac = switch_mac, host_mac = MACAddress(b"\x22" * 6), sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = 0, checksum = 0, payload = fields)
+		return rc4_pkt.serialize()
+
+	def _batch(self):
+		datagrams = [ self._datagram(sequence_number, Opcode.ResponseData if (sequence_number % 2) else Opcode.Discovery, self._SWITCH_MACS[sequence_number % 2]) for sequence_number in range(6) ]
+		return RC4Packet.deserialize_many(datagrams + [ b"too short", bytes(100) ])
+
+	def test_deserialize_many(self):
+		batch = self._batch()
+		self.assertEqual((len(batch), batch.skipped_count), (6, 2))
+		self.assertEqual(list(batch.column("sequence_number")), list(range(6)))
+		self.assertEqual(batch.mac("switch_mac", 3), self._SWITCH_MACS[1])
+		self.assertEqual(batch.payload_fields(4).get(FieldTag.SwitchName).value.value, "switch4")
+
+	def test_payload_outlives_append(self):
+		batch = self._batch()
+		payload = batch.payload(0)
+		fields = batch.payload_fields(1)
+		header = RC4Packet._HEADER_DEFINITION.unpack(bytes(RC4Packet._HEADER_DEFINITION.size))
+		batch.append(header, b"\x00" * 1000)
+		self.assertEqual(len(batch), 7)
+		self.assertEqual(PacketFields.from_raw(payload).get(FieldTag.SwitchName).value.value, "switch0")
+		self.assertEqual(fields.get(FieldTag.SwitchName).value.value, "switch1")
+
+	def test_filter_and_select(self):
+		batch = self._batch()
+		indices = batch.filter(opcode = Opcode.ResponseData, switch_mac = [ self._SWITCH_MACS[1] ])
+		self.assertEqual(list(indices), [ 1, 3, 5 ])
+		subset = batch.select(indices)
+		self.assertEqual(len(subset), 3)
+		self.assertEqual([ subset.payload_fields(index).get(FieldTag.SwitchName).value.value for index in range(3) ], [ "switch1", "switch3", "switch5" ])
+		self.assertEqual(batch.count_by("opcode"), { int(Opcode.Discovery): 3, int(Opcode.ResponseData): 3 })
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,127 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import time
+import asyncio
+import unittest
+from tplink_cli.TPLinkClient import TPLinkClient
+from tplink_cli.PacketField import PacketField
+from tplink_cli.MACAddress import MACAddress
+from tplink_cli.Enums import Opcode, FieldTag
+from tplink_cli.TPLinkTypes import TPLinkString
+from tplink_cli.Exceptions import ReceiveTimeoutException, TPLinkCLIException
+from FakeInterface import FakeInterface, response_to
+
+class TPLinkClientTests(unittest.IsolatedAsyncioTestCase):
+	_SWITCH_MACS = [ MACAddress(bytes([ 0x02, 0xfc, 0, 0, 0, index ])) for index in range(1, 5) ]
+
+	@staticmethod
+	def _echo_name(request: "RC4Packet", opcode: Opcode = Opcode.ResponseData, switch_mac: MACAddress | None = None, sequence_number: int | None = None):
+		# Answers with the switch name given in the request
+		response = response_to(request, opcode, switch_mac = switch_mac, fields = [ PacketField(FieldTag.SwitchName, TPLinkString(request.payload.get(FieldTag.SwitchName).value.value)) ])
+		if sequence_number is not None:
+			response.sequence_number = sequence_number
+		return response
+
+	async def test_routing_by_sequence_number(self):
+		# Responses arrive in reverse order of the requests
+		responder = lambda request: [ (0.01 * (5 - int(request.payload.get(FieldTag.SwitchName).value.value)), self._echo_name(request)) ]
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			futures = [ client.submit(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = [ PacketField(FieldTag.SwitchName, TPLinkString(str(index))) ]) for index in range(5) ]
+			sequence_numbers = [ request.sequence_number for request in client.conn.sent ]
+			responses = await asyncio.gather(*futures)
+			self.assertEqual(client.statistics, TPLinkClient.Statistics(sent = 5, completed = 5, timeouts = 0, unsolicited = 0, callback_errors = 0, in_flight = 0))
+		self.assertEqual(len(set(sequence_numbers)), 5)
+		self.assertEqual([ response.sequence_number for response in responses ], sequence_numbers)
+		self.assertEqual([ response.payload.get(FieldTag.SwitchName).value.value for response in responses ], [ "0", "1", "2", "3", "4" ])
+
+	async def test_unsolicited(self):
+		responder = lambda request: [
+			# Wrong switch, wrong opcode, unknown sequence number
+			(0, self._echo_name(request, switch_mac = self._SWITCH_MACS[1])),
+			(0, self._echo_name(request, opcode = Opcode.AcknowledgeSetData)),
+			(0, self._echo_name(request, sequence_number = (request.sequence_number + 1) & 0xffff)),
+			(0.01, self._echo_name(request)),
+		]
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			response = await client.request(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ])
+			self.assertEqual(response.switch_mac, self._SWITCH_MACS[0])
+			self.assertEqual(client.statistics.unsolicited, 3)
+
+	async def test_timeout(self):
+		# Only the request to the second switch is answered
+		responder = lambda request: [ (0, self._echo_name(request)) ] if (request.switch_mac == self._SWITCH_MACS[1]) else [ ]
+		async with TPLinkClient(FakeInterface(responder), timeout = 0.2) as client:
+			fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ]
+			t0 = time.monotonic()
+			slow = asyncio.ensure_future(client.request(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = fields))
+			fast = asyncio.ensure_future(client.request(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = fields, timeout = 0.05))
+			answered = asyncio.ensure_future(client.request(Opcode.RequestData, switch_mac = self._SWITCH_MACS[1], fields = fields))
+
+			await answered
+			with self.assertRaises(ReceiveTimeoutException):
+				await fast
+			self.assertLess(time.monotonic() - t0, 0.15)
+			self.assertFalse(slow.done())
+			with self.assertRaises(ReceiveTimeoutException):
+				await slow
+			self.assertGreaterEqual(time.monotonic() - t0, 0.2)
+			self.assertEqual(client.statistics.timeouts, 2)
+			self.assertEqual(client.statistics.in_flight, 0)
+
+	async def test_multiple_responses(self):
+		responder = lambda request: [ (0.001 * index, self._echo_name(request, switch_mac = switch_mac)) for (index, switch_mac) in enumerate(self._SWITCH_MACS) ]
+		responses = [ ]
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			result = await client.submit(Opcode.Discovery, fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ], timeout = 0.1, on_response = responses.append)
+			self.assertIsNone(result)
+			self.assertEqual(client.statistics.completed, len(self._SWITCH_MACS))
+			self.assertEqual(client.statistics.timeouts, 0)
+		self.assertEqual([ response.switch_mac for response in responses ], self._SWITCH_MACS)
+
+	async def test_complete(self):
+		responder = lambda request: [ (0, self._echo_name(request, switch_mac = switch_mac)) for switch_mac in self._SWITCH_MACS ]
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			future = None
+			def on_response(rc4_pkt):
+				client.complete(future)
+			t0 = time.monotonic()
+			future = client.submit(Opcode.Discovery, fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ], timeout = 5, on_response = on_response)
+			self.assertIsNone(await future)
+			self.assertLess(time.monotonic() - t0, 1)
+			await asyncio.sleep(0)
+			self.assertEqual(client.statistics.in_flight, 0)
+
+			with self.assertRaises(TPLinkCLIException):
+				client.complete(client.submit(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ]))
+
+	async def test_failing_callback(self):
+		responder = lambda request: [ (0, self._echo_name(request, switch_mac = switch_mac)) for switch_mac in self._SWITCH_MACS ]
+		def on_response(rc4_pkt):
+			raise ValueError()
+		async with TPLinkClient(FakeInterface(responder)) as client:
+			await client.submit(Opcode.Discovery, fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ], timeout = 0.05, on_response = on_response)
+			response = await client.request(Opcode.RequestData, switch_mac = self._SWITCH_MACS[0], fields = [ PacketField(FieldTag.SwitchName, TPLinkString("x")) ])
+			self.assertEqual(response.switch_mac, self._SWITCH_MACS[0])
+			self.assertEqual(client.statistics.callback_errors, len(self._SWITCH_MACS))
+
+if __name__ == "__main__":
+	unittest.main()
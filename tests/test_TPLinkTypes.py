@@ -0,0 +1,34 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import unittest
+from tplink_cli.Enums import FieldTag
+from tplink_cli.Exceptions import DeserializationException
+from tplink_cli.TPLinkTypes import codec_registry
+
+class TPLinkTypesTests(unittest.TestCase):
+	def test_malformed_values_raise_deserialization_exception(self):
+		for (tag, payload) in ((FieldTag.IPAddress, bytes(3)), (FieldTag.SwitchName, b"\xff\xfe"), (FieldTag.MAC, bytes(5))):
+			with self.subTest(tag = tag), self.assertRaises(DeserializationException):
+				codec_registry.decode(tag, payload)
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,250 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import sys
+import errno
+import struct
+import socket
+import ctypes
+import ctypes.util
+
+class _IOVec(ctypes.Structure):
+	_fields_ = [
+		("iov_base", ctypes.c_void_p),
+		("iov_len", ctypes.c_size_t),
+	]
+
+class _SockAddrIn(ctypes.Structure):
+	_fields_ = [
+		("sin_family", ctypes.c_ushort),
+		("sin_port", ctypes.c_uint16),
+		("sin_addr", ctypes.c_uint8 * 4),
+		("sin_zero", ctypes.c_uint8 * 8),
+	]
+
+class _MsgHdr(ctypes.Structure):
+	_fields_ = [
+		("msg_name", ctypes.c_void_p),
+		("msg_namelen", ctypes.c_uint32),
+		("msg_iov", ctypes.POINTER(_IOVec)),
+		("msg_iovlen", ctypes.c_size_t),
+		("msg_control", ctypes.c_void_p),
+		("msg_controllen", ctypes.c_size_t),
+		("msg_flags", ctypes.c_int),
+	]
+
+class _MMsgHdr(ctypes.Structure):
+	_fields_ = [
+		("msg_hdr", _MsgHdr),
+		("msg_len", ctypes.c_uint),
+	]
+
+class BatchedSocketIO():
+	# Linux only: receives and sends a whole batch of IPv4 UDP datagrams with
+	# a single recvmmsg(2) or sendmmsg(2) system call. Buffers for received
+	# datagrams are allocated on first use and reused for every batch.
+	_MSG_DONTWAIT = 0x40
+	_MSG_TRUNC = 0x20
+	_MAX_DATAGRAM_SIZE = 65507
+	_CMSG_HEADER = struct.Struct("@Nii")
+	_CMSG_ALIGNMENT = ctypes.sizeof(ctypes.c_size_t)
+	_TIMESPEC = struct.Struct("@ll")
+	_libc = None
+	SO_TIMESTAMPNS = 35
+	SO_RXQ_OVFL = 40
+
+	def __init__(self, sock: socket.socket, batch_size: int = 32):
+		self._sock = sock
+		self._batch_size = batch_size
+		self._libc = self._load_libc()
+		self._rx_buffers = None
+		self._rx_iovecs = None
+		self._rx_addrs = None
+		self._rx_msgs = None
+		self._rx_control = None
+		self._rx_control_size = socket.CMSG_SPACE(4) + socket.CMSG_SPACE(self._TIMESPEC.size)
+		self._rxq_overflow = 0
+		self._tx_iovecs = None
+		self._tx_addrs = None
+		self._tx_msgs = None
+		self._tx_slot_addrs = None
+		self._tx_sockaddrs = { }
+
+	def _allocate_rx_buffers(self):
+		batch_size = self._batch_size
+		self._rx_buffers = (ctypes.c_char * (self._MAX_DATAGRAM_SIZE * batch_size))()
+		self._rx_iovecs = (_IOVec * batch_size)()
+		self._rx_addrs = (_SockAddrIn * batch_size)()
+		self._rx_msgs = (_MMsgHdr * batch_size)()
+		self._rx_control = (ctypes.c_char * (self._rx_control_size * batch_size))()
+		for i in range(batch_size):
+			self._rx_iovecs[i].iov_base = ctypes.addressof(self._rx_buffers) + (i * self._MAX_DATAGRAM_SIZE)
+			self._rx_iovecs[i].iov_len = self._MAX_DATAGRAM_SIZE
+			self._rx_msgs[i].msg_hdr.msg_name = ctypes.addressof(self._rx_addrs[i])
+			self._rx_msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._rx_iovecs[i])
+			self._rx_msgs[i].msg_hdr.msg_iovlen = 1
+			self._rx_msgs[i].msg_hdr.msg_control = ctypes.addressof(self._rx_control) + (i * self._rx_control_size)
+
+	@classmethod
+	def _load_libc(cls):
+		if cls._libc is None:
+			libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno = True)
+			libc.recvmmsg.argtypes = [ ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p ]
+			libc.recvmmsg.restype = ctypes.c_int
+			libc.sendmmsg.argtypes = [ ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int ]
+			libc.sendmmsg.restype = ctypes.c_int
+			cls._libc = libc
+		return cls._libc
+
+	@classmethod
+	def available(cls):
+		if not sys.platform.startswith("linux"):
+			return False
+		try:
+			cls._load_libc()
+		except (OSError, AttributeError):
+			return False
+		return True
+
+	@property
+	def batch_size(self):
+		return self._batch_size
+
+	@property
+	def rxq_overflow(self):
+		# Number of datagrams the kernel dropped on the receiving socket as
+		# of the last received one; only known when SO_RXQ_OVFL is enabled
+		return self._rxq_overflow
+
+	@staticmethod
+	def _raise_errno():
+		error = ctypes.get_errno()
+		raise OSError(error, os.strerror(error))
+
+	def recv_many(self, max_count: int | None = None):
+		# Returns a list of at most max_count (data, (host, port), timestamp)
+		# tuples, which is empty when no datagram is pending. The timestamp is
+		# the kernel's receive time if SO_TIMESTAMPNS is enabled, None
+		# otherwise.
+		if self._rx_msgs is None:
+			self._allocate_rx_buffers()
+		max_count = self._batch_size if (max_count is None) else min(max_count, self._batch_size)
+		for i in range(max_count):
+			self._rx_msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+			self._rx_msgs[i].msg_hdr.msg_controllen = self._rx_control_size
+		count = self._libc.recvmmsg(self._sock.fileno(), self._rx_msgs, max_count, self._MSG_DONTWAIT, None)
+		if count < 0:
+			if ctypes.get_errno() in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+				return [ ]
+			self._raise_errno()
+
+		datagrams = [ ]
+		base_address = ctypes.addressof(self._rx_buffers)
+		for i in range(count):
+			msg = self._rx_msgs[i]
+			if msg.msg_hdr.msg_flags & self._MSG_TRUNC:
+				continue
+			addr = self._rx_addrs[i]
+			data = ctypes.string_at(base_address + (i * self._MAX_DATAGRAM_SIZE), msg.msg_len)
+			timestamp = self._parse_control(msg.msg_hdr) if (msg.msg_hdr.msg_controllen > 0) else None
+			datagrams.append((data, (socket.inet_ntoa(bytes(addr.sin_addr)), socket.ntohs(addr.sin_port)), timestamp))
+		return datagrams
+
+	def _parse_control(self, msg_hdr: _MsgHdr):
+		# Returns the receive timestamp and updates the cumulative drop
+		# counter, which the kernel only attaches once anything was dropped.
+		control = ctypes.string_at(msg_hdr.msg_control, msg_hdr.msg_controllen)
+		data_offset = socket.CMSG_LEN(0)
+		timestamp = None
+		offset = 0
+		while offset + data_offset <= len(control):
+			(cmsg_len, cmsg_level, cmsg_type) = self._CMSG_HEADER.unpack_from(control, offset)
+			if cmsg_len < data_offset:
+				break
+			if cmsg_level == socket.SOL_SOCKET:
+				if cmsg_type == self.SO_RXQ_OVFL:
+					self._rxq_overflow = int.from_bytes(control[offset + data_offset : offset + data_offset + 4], sys.byteorder)
+				elif cmsg_type == self.SO_TIMESTAMPNS:
+					(seconds, nanoseconds) = self._TIMESPEC.unpack_from(control, offset + data_offset)
+					timestamp = seconds + (nanoseconds / 1e9)
+			offset += (cmsg_len + self._CMSG_ALIGNMENT - 1) & ~(self._CMSG_ALIGNMENT - 1)
+		return timestamp
+
+	def send_many(self, datagrams: "list[tuple[bytes, tuple[str, int]]]"):
+		# Returns a list of (index, OSError) tuples for the datagrams that
+		# could not be sent; all others are sent regardless.
+		errors = [ ]
+		for offset in range(0, len(datagrams), self._batch_size):
+			errors += [ (offset + index, error) for (index, error) in self._send_batch(datagrams[offset : offset + self._batch_size]) ]
+		return errors
+
+	def _allocate_tx_buffers(self):
+		batch_size = self._batch_size
+		self._tx_iovecs = (_IOVec * batch_size)()
+		self._tx_addrs = (_SockAddrIn * batch_size)()
+		self._tx_msgs = (_MMsgHdr * batch_size)()
+		self._tx_slot_addrs = [ None ] * batch_size
+		for i in range(batch_size):
+			self._tx_msgs[i].msg_hdr.msg_name = ctypes.addressof(self._tx_addrs[i])
+			self._tx_msgs[i].msg_hdr.msg_namelen = ctypes.sizeof(_SockAddrIn)
+			self._tx_msgs[i].msg_hdr.msg_iov = ctypes.pointer(self._tx_iovecs[i])
+			self._tx_msgs[i].msg_hdr.msg_iovlen = 1
+
+	def _sockaddr(self, addr: "tuple[str, int]"):
+		sockaddr = self._tx_sockaddrs.get(addr)
+		if sockaddr is None:
+			(host, port) = addr
+			sockaddr = _SockAddrIn(sin_family = socket.AF_INET, sin_port = socket.htons(port))
+			sockaddr.sin_addr[:] = socket.inet_aton(socket.gethostbyname(host))
+			self._tx_sockaddrs[addr] = sockaddr
+		return sockaddr
+
+	def _send_batch(self, datagrams: "list[tuple[bytes, tuple[str, int]]]"):
+		if self._tx_msgs is None:
+			self._allocate_tx_buffers()
+		count = len(datagrams)
+		# The iovecs point directly into the bytes objects, which are kept
+		# alive by the datagrams list for the duration of the call
+		(iovecs, addrs, slot_addrs) = (self._tx_iovecs, self._tx_addrs, self._tx_slot_addrs)
+		for (i, (data, addr)) in enumerate(datagrams):
+			iovec = iovecs[i]
+			iovec.iov_base = ctypes.cast(data, ctypes.c_void_p)
+			iovec.iov_len = len(data)
+			if slot_addrs[i] != addr:
+				addrs[i] = self._sockaddr(addr)
+				slot_addrs[i] = addr
+
+		# sendmmsg() stops at the first message that fails; it is reported
+		# by the next call, skipped, and the remaining ones are sent
+		errors = [ ]
+		sent = 0
+		while sent < count:
+			result = self._libc.sendmmsg(self._sock.fileno(), ctypes.byref(self._tx_msgs[sent]), count - sent, 0)
+			if result < 0:
+				error = ctypes.get_errno()
+				if error == errno.EINTR:
+					continue
+				errors.append((sent, OSError(error, os.strerror(error))))
+				sent += 1
+			else:
+				sent += result
+		return errors
@@ -0,0 +1,71 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import random
+import asyncio
+import collections
+from .Enums import Opcode, FieldTag
+from .PacketField import PacketField
+from .TPLinkTypes import TPLinkString
+from .Exceptions import ReceiveTimeoutException
+
+ApplyResult = collections.namedtuple("ApplyResult", [ "switch_mac", "success", "error_code", "attempts", "elapsed" ])
+
+class BulkApply():
+	# Sends the same SetData request to many switches. There is no global
+	# limit, the requests to every switch are paced by the congestion window
+	# of the client's CongestionController. Requests that time out are
+	# retried with exponential backoff and full jitter; a response with an
+	# error code is final.
+	def __init__(self, client: "TPLinkClient", fields: "list[PacketField]", username: str | None = None, password: str | None = None, retries: int = 3, backoff: float = 0.1, max_backoff: float = 2.0):
+		self._client = client
+		self._fields = [ ]
+		if username is not None:
+			self._fields.append(PacketField(FieldTag.LoginUsername, TPLinkString(username)))
+		if password is not None:
+			self._fields.append(PacketField(FieldTag.LoginPassword, TPLinkString(password)))
+		self._fields += fields
+		self._retries = retries
+		self._backoff = backoff
+		self._max_backoff = max_backoff
+
+	def _backoff_delay(self, attempt: int):
+		return random.uniform(0, min(self._max_backoff, self._backoff * (2 ** attempt)))
+
+	async def _apply_one(self, switch_mac: "MACAddress"):
+		loop = asyncio.get_running_loop()
+		t0 = loop.time()
+		attempt = 0
+		while True:
+			attempt += 1
+			try:
+				response = await self._client.request(Opcode.SetData, switch_mac = switch_mac, fields = self._fields)
+			except (ReceiveTimeoutException, OSError):
+				# A datagram that could not be sent is retried like a lost one
+				response = None
+			if response is not None:
+				return ApplyResult(switch_mac = switch_mac, success = (response.error_code == 0), error_code = response.error_code, attempts = attempt, elapsed = loop.time() - t0)
+			if attempt > self._retries:
+				return ApplyResult(switch_mac = switch_mac, success = False, error_code = None, attempts = attempt, elapsed = loop.time() - t0)
+			await asyncio.sleep(self._backoff_delay(attempt - 1))
+
+	async def run(self, switch_macs: "list[MACAddress]"):
+		return await asyncio.gather(*[ self._apply_one(switch_mac) for switch_mac in switch_macs ])
@@ -0,0 +1,96 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import contextlib
+from .RC4Packet import RC4Packet
+from .Exceptions import DeserializationException
+from .TPLinkObfuscation import TPLinkObfuscation
+from .CapturePrefilter import CapturePrefilter
+
+class CaptureDecoder():
+	def __init__(self, packet_filter: "PacketFilter", validate_serialization: bool = False, correlator: "PacketCorrelator | None" = None):
+		self._prefilter = CapturePrefilter()
+		self._packet_filter = packet_filter
+		self._validate_serialization = validate_serialization
+		self._correlator = correlator
+		self._reassembler = RC4Packet.reassembler()
+
+	@property
+	def correlator(self):
+		return self._correlator
+
+	@property
+	def ip_fragments(self):
+		return self._prefilter.ip_fragments
+
+	def _check_serialization(self, rc4_pkt: RC4Packet, plaintext: bytes):
+		# Fields that were never decoded would be re-serialized from their
+		# original raw bytes, decode all of them so that every encoder runs
+		for field in rc4_pkt.payload:
+			field.value
+		reserialized = rc4_pkt.serialize_plaintext()
+		if reserialized == plaintext:
+			return ()
+		return ("WARNING: Packet reserialization mismatch.", f"Original packet: {bytes(plaintext)}", f"Reserialized   : {reserialized}")
+
+	def _write(self, rc4_pkt: RC4Packet, plaintext: bytes, writer: "PacketWriter", timestamp: float | None):
+		warnings = self._check_serialization(rc4_pkt, plaintext) if self._validate_serialization else ()
+		writer.write(rc4_pkt, plaintext, timestamp = timestamp, warnings = warnings)
+
+	def decode(self, payload: bytes, writer: "PacketWriter", timestamp: float | None = None):
+		with contextlib.suppress(DeserializationException):
+			header = RC4Packet.deserialize_header(payload, allow_fragment = True)
+			if not self._packet_filter.matches(header):
+				return False
+			plaintext = TPLinkObfuscation.deobfuscate(payload)
+			if RC4Packet.is_fragment(header, len(payload)):
+				plaintext = self._reassembler.add(plaintext, timestamp)
+				if plaintext is None:
+					return False
+				plaintext = bytes(plaintext)
+			if self._correlator is not None:
+				self._correlator.observe(header, timestamp)
+			rc4_pkt = RC4Packet.deserialize_plaintext(plaintext)
+			self._write(rc4_pkt, plaintext, writer, timestamp)
+			return True
+		return False
+
+	def decode_record(self, record: "BinaryPacketReader.PacketRecord", writer: "PacketWriter"):
+		# Records of the binary output format are already decrypted
+		if not self._packet_filter.matches_timestamp(record.timestamp):
+			return False
+		with contextlib.suppress(DeserializationException):
+			rc4_pkt = RC4Packet.deserialize_plaintext(record.plaintext)
+			if not self._packet_filter.matches(rc4_pkt):
+				return False
+			if self._correlator is not None:
+				self._correlator.observe(rc4_pkt, record.timestamp)
+			self._write(rc4_pkt, record.plaintext, writer, record.timestamp)
+			return True
+		return False
+
+	def process(self, packet: "PCAPNGReader.PCAPNGPacket", writer: "PacketWriter"):
+		if not self._packet_filter.matches_timestamp(packet.timestamp):
+			return False
+		payload = self._prefilter.extract_payload(packet.linktype, packet.data)
+		if payload is None:
+			return False
+		return self.decode(payload, writer, timestamp = packet.timestamp)
@@ -0,0 +1,119 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import struct
+from .TPLinkInterface import TPLinkInterface
+
+class CapturePrefilter():
+	# Cheap L2-L4 filter that is applied to captured frames before anything
+	# is decrypted; only UDP payloads to or from the TP-Link ports pass.
+	LINKTYPE_ETHERNET = 1
+	LINKTYPE_RAW = 101
+	LINKTYPE_LINUX_SLL = 113
+	LINKTYPE_IPV4 = 228
+
+	_ETHERTYPE_IPV4 = 0x0800
+	_ETHERTYPES_VLAN = frozenset([ 0x8100, 0x88a8, 0x9100 ])
+	_IP_PROTOCOL_UDP = 17
+	_ETHERTYPE = struct.Struct(">H")
+	_IPV4_HEADER = struct.Struct(">BxHHHxB")
+	_UDP_HEADER = struct.Struct(">HHH")
+
+	def __init__(self, ports: "tuple[int]" = (TPLinkInterface._HOST_PORT, TPLinkInterface._SWITCH_PORT)):
+		self._ports = frozenset(ports)
+		self._ip_fragments = 0
+
+	@property
+	def ip_fragments(self):
+		# Number of TP-Link datagrams skipped because they were IP fragmented
+		return self._ip_fragments
+
+	def _ethernet_ip_offset(self, frame: memoryview):
+		offset = 12
+		while True:
+			if offset + 2 > len(frame):
+				return None
+			(ethertype, ) = self._ETHERTYPE.unpack_from(frame, offset)
+			if ethertype not in self._ETHERTYPES_VLAN:
+				break
+			# 802.1Q or stacked QinQ tag
+			offset += 4
+		if ethertype != self._ETHERTYPE_IPV4:
+			return None
+		return offset + 2
+
+	def _linux_sll_ip_offset(self, frame: memoryview):
+		if len(frame) < 16:
+			return None
+		(protocol, ) = self._ETHERTYPE.unpack_from(frame, 14)
+		if protocol != self._ETHERTYPE_IPV4:
+			return None
+		return 16
+
+	def _udp_payload_range(self, frame: memoryview, ip_offset: int):
+		if len(frame) < ip_offset + 20:
+			return None
+		(version_ihl, total_length, identification, flags_fragment, protocol) = self._IPV4_HEADER.unpack_from(frame, ip_offset)
+		if (version_ihl >> 4) != 4:
+			return None
+		if protocol != self._IP_PROTOCOL_UDP:
+			return None
+		header_length = (version_ihl & 0xf) * 4
+		if (header_length < 20) or (total_length < header_length + 8) or (ip_offset + total_length > len(frame)):
+			# Malformed or truncated by the capture length
+			return None
+		if (flags_fragment & 0x1fff) != 0:
+			# Nonzero fragment offset, there is no UDP header to look at
+			return None
+		udp_offset = ip_offset + header_length
+		(source_port, destination_port, udp_length) = self._UDP_HEADER.unpack_from(frame, udp_offset)
+		if (source_port not in self._ports) and (destination_port not in self._ports):
+			return None
+		if (flags_fragment & 0x2000) != 0:
+			# First fragment of a TP-Link datagram that is not contained in
+			# this frame in its entirety; IP reassembly is not supported.
+			self._ip_fragments += 1
+			return None
+		if (udp_length < 8) or (header_length + udp_length > total_length):
+			return None
+		return (udp_offset + 8, udp_offset + udp_length)
+
+	def locate_payload(self, linktype: int, frame: bytes):
+		# Returns the (start, end) offsets of the TP-Link UDP payload within
+		# the frame or None if the frame should be discarded.
+		if linktype == self.LINKTYPE_ETHERNET:
+			ip_offset = self._ethernet_ip_offset(frame)
+		elif linktype in (self.LINKTYPE_RAW, self.LINKTYPE_IPV4):
+			ip_offset = 0
+		elif linktype == self.LINKTYPE_LINUX_SLL:
+			ip_offset = self._linux_sll_ip_offset(frame)
+		else:
+			return None
+		if ip_offset is None:
+			return None
+		return self._udp_payload_range(frame, ip_offset)
+
+	def extract_payload(self, linktype: int, frame: bytes):
+		frame = memoryview(frame)
+		payload_range = self.locate_payload(linktype, frame)
+		if payload_range is None:
+			return None
+		return frame[payload_range[0] : payload_range[1]]
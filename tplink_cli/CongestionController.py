@@ -0,0 +1,94 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import asyncio
+import collections
+import dataclasses
+
+@dataclasses.dataclass(slots = True)
+class SwitchWindow():
+	window: float
+	in_flight: int = 0
+	acknowledged: int = 0
+	losses: int = 0
+	waiters: collections.deque = dataclasses.field(default_factory = collections.deque)
+
+class CongestionController():
+	# AIMD window of outstanding requests per switch: the window grows by one
+	# request per window worth of clean acknowledgements and is multiplied by
+	# the decrease factor on a timeout or an error response.
+	WindowState = collections.namedtuple("WindowState", [ "window", "in_flight", "queued", "acknowledged", "losses" ])
+
+	def __init__(self, initial_window: float = 1, min_window: float = 1, max_window: float = 16, decrease: float = 0.5):
+		self._initial_window = initial_window
+		self._min_window = min_window
+		self._max_window = max_window
+		self._decrease = decrease
+		self._switches = { }
+
+	def _get(self, switch_mac: "MACAddress"):
+		switch = self._switches.get(switch_mac)
+		if switch is None:
+			switch = SwitchWindow(window = self._initial_window)
+			self._switches[switch_mac] = switch
+		return switch
+
+	def state(self, switch_mac: "MACAddress"):
+		switch = self._get(switch_mac)
+		return self.WindowState(window = switch.window, in_flight = switch.in_flight, queued = len(switch.waiters), acknowledged = switch.acknowledged, losses = switch.losses)
+
+	def states(self):
+		return { switch_mac: self.state(switch_mac) for switch_mac in self._switches }
+
+	def _wake(self, switch: SwitchWindow):
+		while (len(switch.waiters) > 0) and (switch.in_flight < int(switch.window)):
+			waiter = switch.waiters.popleft()
+			if not waiter.done():
+				switch.in_flight += 1
+				waiter.set_result(None)
+
+	async def acquire(self, switch_mac: "MACAddress"):
+		switch = self._get(switch_mac)
+		if (len(switch.waiters) == 0) and (switch.in_flight < int(switch.window)):
+			switch.in_flight += 1
+			return
+		waiter = asyncio.get_running_loop().create_future()
+		switch.waiters.append(waiter)
+		try:
+			await waiter
+		except asyncio.CancelledError:
+			if waiter.done() and (not waiter.cancelled()):
+				# Slot was granted, but the caller went away
+				self.release(switch_mac, None)
+			raise
+
+	def release(self, switch_mac: "MACAddress", acknowledged: bool | None):
+		# None releases the slot without any indication of congestion, e.g.,
+		# when the request was cancelled.
+		switch = self._get(switch_mac)
+		switch.in_flight -= 1
+		if acknowledged is True:
+			switch.acknowledged += 1
+			switch.window = min(self._max_window, switch.window + 1 / switch.window)
+		elif acknowledged is False:
+			switch.losses += 1
+			switch.window = max(self._min_window, switch.window * self._decrease)
+		self._wake(switch)
@@ -0,0 +1,111 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import asyncio
+import collections
+from .Enums import Opcode, FieldTag
+from .Exceptions import DeserializationException
+
+SwitchIdentity = collections.namedtuple("SwitchIdentity", [ "switch_mac", "name", "mac", "ip_address", "firmware_version", "hardware_version", "interface", "response_time" ])
+
+class DiscoveryScanner():
+	# Broadcasts a single discovery request and collects the responses. The
+	# scan ends once responses stop arriving: the quiet period after the last
+	# response adapts to the observed inter-arrival time of responses, but the
+	# scan never takes longer than the timeout.
+	_EWMA_WEIGHT = 0.2
+
+	def __init__(self, client: "TPLinkClient", timeout: float = 1.0, min_quiet: float = 0.1, quiet_factor: float = 8):
+		self._client = client
+		self._timeout = timeout
+		self._min_quiet = min_quiet
+		self._quiet_factor = quiet_factor
+		self._identities = { }
+		self._duplicates = 0
+		self._invalid = 0
+		self._loop = None
+		self._future = None
+		self._start = None
+		self._last_response = None
+		self._mean_gap = None
+		self._quiet_timer = None
+
+	@property
+	def identities(self):
+		return self._identities
+
+	@property
+	def duplicates(self):
+		return self._duplicates
+
+	@property
+	def invalid(self):
+		return self._invalid
+
+	@staticmethod
+	def _field_value(payload: "PacketFields", tag: FieldTag):
+		field = payload.get(tag)
+		return field.value.value if (field is not None) else None
+
+	def _quiet_period(self):
+		if self._mean_gap is None:
+			# Only a single response so far, use its round trip time
+			estimate = self._last_response - self._start
+		else:
+			estimate = self._mean_gap
+		return max(self._min_quiet, self._quiet_factor * estimate)
+
+	def _check_quiet(self):
+		deadline = self._last_response + self._quiet_period()
+		if self._loop.time() >= deadline:
+			self._client.complete(self._future)
+		else:
+			self._quiet_timer = self._loop.call_at(deadline, self._check_quiet)
+
+	def _on_response(self, rc4_pkt: "RC4Packet"):
+		now = self._loop.time()
+		if self._last_response is not None:
+			gap = now - self._last_response
+			self._mean_gap = gap if (self._mean_gap is None) else ((1 - self._EWMA_WEIGHT) * self._mean_gap + self._EWMA_WEIGHT * gap)
+		self._last_response = now
+		if self._quiet_timer is None:
+			self._check_quiet()
+
+		if rc4_pkt.switch_mac in self._identities:
+			self._duplicates += 1
+			return
+		# Only the identity fields are decoded, all others stay raw
+		payload = rc4_pkt.payload
+		try:
+			self._identities[rc4_pkt.switch_mac] = SwitchIdentity(switch_mac = rc4_pkt.switch_mac, name = self._field_value(payload, FieldTag.SwitchName), mac = self._field_value(payload, FieldTag.MAC), ip_address = self._field_value(payload, FieldTag.IPAddress), firmware_version = self._field_value(payload, FieldTag.FirmwareVersion), hardware_version = self._field_value(payload, FieldTag.HardwareVersion), interface = self._client.conn.interface, response_time = now - self._start)
+		except DeserializationException:
+			self._invalid += 1
+
+	async def scan(self):
+		self._loop = asyncio.get_running_loop()
+		self._start = self._loop.time()
+		self._future = self._client.submit(Opcode.Discovery, timeout = self._timeout, on_response = self._on_response)
+		try:
+			await self._future
+		finally:
+			if self._quiet_timer is not None:
+				self._quiet_timer.cancel()
+		return self._identities
@@ -89,3 +89,8 @@ class FieldTag(enum.IntEnum):
 	MTUVLANSetting = 8192
 
 	EndOfFields = 0xffff
+
+class OverflowPolicy(enum.Enum):
+	DropOldest = "drop-oldest"
+	DropNewest = "drop-newest"
+	Backpressure = "backpressure"
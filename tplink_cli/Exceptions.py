@@ -22,3 +22,4 @@
 class TPLinkCLIException(Exception): pass
 class DeserializationException(TPLinkCLIException): pass
 class ReceiveTimeoutException(TPLinkCLIException): pass
+class CaptureFormatException(TPLinkCLIException): pass
@@ -0,0 +1,135 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import math
+import bisect
+import collections
+import dataclasses
+
+@dataclasses.dataclass(slots = True)
+class PendingMessage():
+	timestamp: float
+	header: tuple
+	buffer: bytearray
+	# Sorted, disjoint and non-adjacent (start, end) ranges of the payload
+	# that have been received so far
+	covered: list = dataclasses.field(default_factory = list)
+
+	def cover(self, start: int, end: int):
+		# Adds a range and returns False if it was already covered entirely
+		index = bisect.bisect_left(self.covered, (start, ))
+		if (index > 0) and (self.covered[index - 1][1] >= start):
+			index -= 1
+		if (index < len(self.covered)) and (self.covered[index][0] <= start) and (self.covered[index][1] >= end):
+			return False
+		merged_end = index
+		while (merged_end < len(self.covered)) and (self.covered[merged_end][0] <= end):
+			start = min(start, self.covered[merged_end][0])
+			end = max(end, self.covered[merged_end][1])
+			merged_end += 1
+		self.covered[index : merged_end] = [ (start, end) ]
+		return True
+
+	def complete(self, payload_length: int):
+		return (len(self.covered) == 1) and (self.covered[0] == (0, payload_length))
+
+class FragmentReassembler():
+	# Fragments each carry a full header whose length field indicates the
+	# length of the complete message and whose fragmentation offset is the
+	# position of the fragment within the message payload. Fragments are
+	# copied into a buffer preallocated to the full message length.
+	Statistics = collections.namedtuple("Statistics", [ "reassembled", "duplicates", "expired", "evicted", "oversized", "pending", "memory_used" ])
+
+	def __init__(self, header_definition: "NamedStruct", timeout: float = 2.0, memory_budget: int = 4 * 1024 * 1024):
+		self._header_definition = header_definition
+		self._timeout = timeout
+		self._memory_budget = memory_budget
+		self._pending = collections.OrderedDict()
+		self._memory_used = 0
+		self._reassembled = 0
+		self._duplicates = 0
+		self._expired = 0
+		self._evicted = 0
+		self._oversized = 0
+
+	@property
+	def statistics(self):
+		return self.Statistics(reassembled = self._reassembled, duplicates = self._duplicates, expired = self._expired, evicted = self._evicted, oversized = self._oversized, pending = len(self._pending), memory_used = self._memory_used)
+
+	def _remove_oldest(self):
+		(key, message) = self._pending.popitem(last = False)
+		self._memory_used -= len(message.buffer)
+		return message
+
+	def expire(self, now: float | None):
+		if (now is None) or math.isnan(now):
+			return
+		while (len(self._pending) > 0) and (next(iter(self._pending.values())).timestamp + self._timeout < now):
+			self._remove_oldest()
+			self._expired += 1
+
+	def _start_message(self, key: tuple, header: tuple, timestamp: float | None):
+		if header.length > self._memory_budget:
+			self._oversized += 1
+			return None
+		while self._memory_used + header.length > self._memory_budget:
+			self._remove_oldest()
+			self._evicted += 1
+		message = PendingMessage(timestamp = timestamp if (timestamp is not None) else math.nan, header = header, buffer = bytearray(header.length))
+		self._pending[key] = message
+		self._memory_used += header.length
+		return message
+
+	def add(self, plaintext: bytes, timestamp: float | None = None):
+		# Takes a decrypted fragment whose header has already been validated
+		# and returns the complete plaintext message once all fragments have
+		# been received, None otherwise.
+		self.expire(timestamp)
+		header_size = self._header_definition.size
+		header = self._header_definition.unpack_from(plaintext)
+		key = (header.switch_mac, header.host_mac, header.sequence_number)
+		message = self._pending.get(key)
+		if (message is not None) and (len(message.buffer) != header.length):
+			# Same key, but different message; the old one cannot be completed
+			del self._pending[key]
+			self._memory_used -= len(message.buffer)
+			self._evicted += 1
+			message = None
+		if message is None:
+			message = self._start_message(key, header, timestamp)
+			if message is None:
+				return None
+
+		fragment_length = len(plaintext) - header_size
+		if not message.cover(header.fragmentation_offset, header.fragmentation_offset + fragment_length):
+			self._duplicates += 1
+			return None
+		start = header_size + header.fragmentation_offset
+		message.buffer[start : start + fragment_length] = plaintext[header_size : ]
+		if not message.complete(header.length - header_size):
+			return None
+
+		del self._pending[key]
+		self._memory_used -= len(message.buffer)
+		self._reassembled += 1
+		# The reassembled message is described by an unfragmented header
+		self._header_definition.pack_into(message.buffer, 0, message.header._replace(fragmentation_offset = 0))
+		return message.buffer
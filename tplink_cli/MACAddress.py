@@ -20,11 +20,24 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 class MACAddress():
+	__slots__ = ("_mac", )
+
 	def __init__(self, mac: bytes):
 		assert(isinstance(mac, bytes))
 		assert(len(mac) == 6)
 		self._mac = mac
 
+	@classmethod
+	def parse(cls, text: str):
+		hexstr = text.replace(":", "").replace("-", "")
+		try:
+			mac = bytes.fromhex(hexstr)
+		except ValueError as e:
+			raise ValueError(f"Not a valid MAC address: {text}") from e
+		if len(mac) != 6:
+			raise ValueError(f"Not a valid MAC address: {text}")
+		return cls(mac)
+
 	def __lt__(self, other):
 		return bytes(self) < bytes(other)
 
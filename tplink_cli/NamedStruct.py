@@ -29,9 +29,14 @@ import struct
 class NamedStruct():
 	def __init__(self, fields, struct_extra = "<"):
 		struct_format = struct_extra + ("".join(fieldtype for (fieldtype, fieldname) in fields))
+		self._fields = tuple(fields)
 		self._struct = struct.Struct(struct_format)
 		self._collection = collections.namedtuple("Fields", [ fieldname for (fieldtype, fieldname) in fields ])
 
+	@property
+	def fields(self):
+		return self._fields
+
 	@property
 	def size(self):
 		return self._struct.size
@@ -40,11 +45,22 @@ class NamedStruct():
 		fields = self._collection(**data)
 		return self._struct.pack(*fields)
 
+	def pack_into(self, buffer, offset, data):
+		# Data may also be given as a sequence of values in field order, which
+		# avoids constructing an intermediate dictionary.
+		if isinstance(data, dict):
+			data = self._collection(**data)
+		self._struct.pack_into(buffer, offset, *data)
+
 	def unpack(self, data):
 		values = self._struct.unpack(data)
 		fields = self._collection(*values)
 		return fields
 
+	def unpack_from(self, buffer, offset = 0):
+		values = self._struct.unpack_from(buffer, offset)
+		return self._collection(*values)
+
 	def unpack_head(self, data, offset = 0):
 		return self.unpack(data[offset : offset + self._struct.size])
 
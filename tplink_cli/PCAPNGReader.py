@@ -0,0 +1,250 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import mmap
+import time
+import struct
+import collections
+from .Exceptions import CaptureFormatException
+
+# Defined on module level so that chunks can be pickled and handed to worker
+# processes.
+PCAPNGInterface = collections.namedtuple("PCAPNGInterface", [ "linktype", "ts_resolution", "ts_offset" ])
+PCAPNGChunk = collections.namedtuple("PCAPNGChunk", [ "start", "end", "endian", "interfaces" ])
+
+class PCAPNGReader():
+	PCAPNGPacket = collections.namedtuple("PCAPNGPacket", [ "offset", "data_offset", "interface_id", "linktype", "timestamp", "data" ])
+	Interface = PCAPNGInterface
+	Chunk = PCAPNGChunk
+
+	_BLOCK_SECTION_HEADER = 0x0a0d0d0a
+	_BLOCK_INTERFACE_DESCRIPTION = 0x00000001
+	_BLOCK_SIMPLE_PACKET = 0x00000003
+	_BLOCK_ENHANCED_PACKET = 0x00000006
+	_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+
+	_OPTION_END = 0
+	_OPTION_IF_TSRESOL = 9
+	_OPTION_IF_TSOFFSET = 14
+
+	def __init__(self, filename: str):
+		self._f = open(filename, "rb")
+		self._mmap = None
+		self._data = memoryview(b"")
+		self._endian = None
+		self._interfaces = [ ]
+		self._map()
+
+	def _map(self):
+		if self._f.seek(0, 2) > 0:
+			self._mmap = mmap.mmap(self._f.fileno(), 0, access = mmap.ACCESS_READ)
+			self._data = memoryview(self._mmap)
+
+	def _remap(self):
+		# Maps the file again if it has grown. The previous mapping is not
+		# closed explicitly since packet data may still refer to it.
+		file_size = os.fstat(self._f.fileno()).st_size
+		if file_size < len(self._data):
+			raise CaptureFormatException(f"Followed file was truncated from {len(self._data)} to {file_size} bytes.")
+		elif file_size == len(self._data):
+			return False
+		self._mmap = mmap.mmap(self._f.fileno(), 0, access = mmap.ACCESS_READ)
+		self._data = memoryview(self._mmap)
+		return True
+
+	@property
+	def interfaces(self):
+		return self._interfaces
+
+	def _unpack(self, fmt: str, offset: int):
+		return struct.unpack_from(self._endian + fmt, self._data, offset)
+
+	def _parse_options(self, offset: int, end: int):
+		options = { }
+		while offset + 4 <= end:
+			(code, length) = self._unpack("HH", offset)
+			if code == self._OPTION_END:
+				break
+			options[code] = self._data[offset + 4 : offset + 4 + length]
+			offset += 4 + ((length + 3) & ~3)
+		return options
+
+	def _parse_section_header(self, offset: int):
+		magic = self._data[offset + 8 : offset + 12]
+		if magic == b"\x4d\x3c\x2b\x1a":
+			self._endian = "<"
+		elif magic == b"\x1a\x2b\x3c\x4d":
+			self._endian = ">"
+		else:
+			raise CaptureFormatException(f"Invalid byte order magic in pcapng section header at offset {offset}.")
+		(major_version, minor_version) = self._unpack("HH", offset + 12)
+		if major_version != 1:
+			raise CaptureFormatException(f"Unsupported pcapng major version {major_version} in section header at offset {offset}.")
+		# Interface IDs are scoped to their section
+		self._interfaces = [ ]
+
+	def _parse_interface_description(self, offset: int, block_length: int):
+		(linktype, reserved, snaplen) = self._unpack("HHI", offset + 8)
+		options = self._parse_options(offset + 16, offset + block_length - 4)
+
+		ts_resolution = 1e-6
+		if self._OPTION_IF_TSRESOL in options:
+			tsresol = options[self._OPTION_IF_TSRESOL][0]
+			if tsresol & 0x80:
+				ts_resolution = 2 ** -(tsresol & 0x7f)
+			else:
+				ts_resolution = 10 ** -tsresol
+		ts_offset = 0
+		if self._OPTION_IF_TSOFFSET in options:
+			(ts_offset, ) = struct.unpack(self._endian + "q", options[self._OPTION_IF_TSOFFSET])
+		self._interfaces.append(self.Interface(linktype = linktype, ts_resolution = ts_resolution, ts_offset = ts_offset))
+
+	def _parse_enhanced_packet(self, offset: int, block_length: int):
+		(interface_id, ts_high, ts_low, captured_length, original_length) = self._unpack("IIIII", offset + 8)
+		if interface_id >= len(self._interfaces):
+			raise CaptureFormatException(f"Enhanced packet block at offset {offset} references undefined interface {interface_id}.")
+		if 28 + captured_length > block_length - 4:
+			raise CaptureFormatException(f"Enhanced packet block at offset {offset} indicates {captured_length} bytes of packet data, but block is only {block_length} bytes long.")
+		interface = self._interfaces[interface_id]
+		timestamp = interface.ts_offset + ((ts_high << 32) | ts_low) * interface.ts_resolution
+		data = self._data[offset + 28 : offset + 28 + captured_length]
+		return self.PCAPNGPacket(offset = offset, data_offset = offset + 28, interface_id = interface_id, linktype = interface.linktype, timestamp = timestamp, data = data)
+
+	def _parse_simple_packet(self, offset: int, block_length: int):
+		if len(self._interfaces) == 0:
+			raise CaptureFormatException(f"Simple packet block at offset {offset} without any interface definition.")
+		(original_length, ) = self._unpack("I", offset + 8)
+		captured_length = min(original_length, block_length - 16)
+		data = self._data[offset + 12 : offset + 12 + captured_length]
+		return self.PCAPNGPacket(offset = offset, data_offset = offset + 12, interface_id = 0, linktype = self._interfaces[0].linktype, timestamp = None, data = data)
+
+	def _read_block_header(self, offset: int):
+		if offset + 12 > len(self._data):
+			raise CaptureFormatException(f"Truncated pcapng block header at offset {offset}.")
+		(block_type, ) = struct.unpack_from("<I", self._data, offset)
+		if block_type == self._BLOCK_SECTION_HEADER:
+			self._parse_section_header(offset)
+		elif self._endian is None:
+			raise CaptureFormatException("File does not start with a pcapng section header block.")
+		(block_type, block_length) = self._unpack("II", offset)
+		if (block_length < 12) or (block_length % 4 != 0) or (offset + block_length > len(self._data)):
+			raise CaptureFormatException(f"Invalid or truncated pcapng block of length {block_length} at offset {offset}.")
+		return (block_type, block_length)
+
+	def _parse_block(self, offset: int):
+		# Returns the length of the block and the contained packet, if any.
+		(block_type, block_length) = self._read_block_header(offset)
+		if block_type == self._BLOCK_ENHANCED_PACKET:
+			return (block_length, self._parse_enhanced_packet(offset, block_length))
+		elif block_type == self._BLOCK_SIMPLE_PACKET:
+			return (block_length, self._parse_simple_packet(offset, block_length))
+		elif block_type == self._BLOCK_INTERFACE_DESCRIPTION:
+			self._parse_interface_description(offset, block_length)
+		return (block_length, None)
+
+	def _iter_packets(self, offset: int, end: int):
+		while offset < end:
+			(block_length, packet) = self._parse_block(offset)
+			if packet is not None:
+				yield packet
+			offset += block_length
+
+	def __iter__(self):
+		return self._iter_packets(0, len(self._data))
+
+	def _complete_block_available(self, offset: int):
+		if offset + 12 > len(self._data):
+			return False
+		(block_type, ) = struct.unpack_from("<I", self._data, offset)
+		if block_type == self._BLOCK_SECTION_HEADER:
+			endian = "<" if (self._data[offset + 8 : offset + 12] == b"\x4d\x3c\x2b\x1a") else ">"
+		elif self._endian is None:
+			# Let the parser report the error
+			return True
+		else:
+			endian = self._endian
+		(block_length, ) = struct.unpack_from(endian + "I", self._data, offset + 4)
+		return offset + block_length <= len(self._data)
+
+	def follow(self, min_poll_interval: float = 0.001, max_poll_interval: float = 0.1):
+		# Like iteration, but never finishes: when the end of the file is
+		# reached (or the last block has only been written partially), wait for
+		# the file to grow and continue at the same offset.
+		offset = 0
+		poll_interval = min_poll_interval
+		while True:
+			if self._complete_block_available(offset):
+				(block_length, packet) = self._parse_block(offset)
+				if packet is not None:
+					yield packet
+				offset += block_length
+				poll_interval = min_poll_interval
+			elif not self._remap():
+				time.sleep(poll_interval)
+				poll_interval = min(2 * poll_interval, max_poll_interval)
+
+	def chunks(self, chunk_size: int):
+		# Splits the file into block-aligned chunks of roughly chunk_size
+		# bytes, each carrying the parser state that is valid at its start.
+		# Only block headers, section headers and interface descriptions are
+		# parsed for this.
+		(offset, start) = (0, 0)
+		(self._endian, self._interfaces) = (None, [ ])
+		state = (self._endian, tuple(self._interfaces))
+		while offset < len(self._data):
+			if offset - start >= chunk_size:
+				yield self.Chunk(start, offset, *state)
+				start = offset
+				state = (self._endian, tuple(self._interfaces))
+			(block_type, block_length) = self._read_block_header(offset)
+			if block_type == self._BLOCK_INTERFACE_DESCRIPTION:
+				self._parse_interface_description(offset, block_length)
+			offset += block_length
+		if start < offset:
+			yield self.Chunk(start, offset, *state)
+
+	def chunk_packets(self, chunk: Chunk):
+		self._endian = chunk.endian
+		self._interfaces = list(chunk.interfaces)
+		return self._iter_packets(chunk.start, chunk.end)
+
+	def read_at(self, offset: int, length: int):
+		if offset + length > len(self._data):
+			raise CaptureFormatException(f"Cannot read {length} bytes at offset {offset}, file is only {len(self._data)} bytes long.")
+		return self._data[offset : offset + length]
+
+	def close(self):
+		self._data.release()
+		if self._mmap is not None:
+			try:
+				self._mmap.close()
+			except BufferError:
+				# Packet data is still referenced, the file is unmapped once
+				# the last reference is gone.
+				pass
+		self._f.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
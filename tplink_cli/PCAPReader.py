@@ -0,0 +1,83 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import sys
+import struct
+import collections
+from .Exceptions import CaptureFormatException
+
+class PCAPReader():
+	# Streaming reader for classic libpcap files; records are read one at a
+	# time so that it also works on pipes.
+	PCAPPacket = collections.namedtuple("PCAPPacket", [ "linktype", "timestamp", "data" ])
+
+	_MAGICS = {
+		b"\xd4\xc3\xb2\xa1":	("<", 1e-6),
+		b"\xa1\xb2\xc3\xd4":	(">", 1e-6),
+		b"\x4d\x3c\xb2\xa1":	("<", 1e-9),
+		b"\xa1\xb2\x3c\x4d":	(">", 1e-9),
+	}
+
+	def __init__(self, filename: str):
+		if filename == "-":
+			(self._f, self._close) = (sys.stdin.buffer, False)
+		else:
+			(self._f, self._close) = (open(filename, "rb"), True)
+		header = self._f.read(24)
+		if len(header) != 24:
+			raise CaptureFormatException("File too short for pcap global header.")
+		if header[ : 4] not in self._MAGICS:
+			raise CaptureFormatException(f"Not a pcap file, invalid magic number {header[ : 4].hex()}.")
+		(endian, self._ts_resolution) = self._MAGICS[header[ : 4]]
+		(major_version, minor_version, thiszone, sigfigs, snaplen, self._linktype) = struct.unpack(endian + "HHiIII", header[4 : ])
+		self._linktype &= 0xffff
+		self._record_header = struct.Struct(endian + "IIII")
+
+	@classmethod
+	def is_pcap(cls, magic: bytes):
+		return magic[ : 4] in cls._MAGICS
+
+	@property
+	def linktype(self):
+		return self._linktype
+
+	def __iter__(self):
+		while True:
+			record_header = self._f.read(self._record_header.size)
+			if len(record_header) == 0:
+				break
+			if len(record_header) != self._record_header.size:
+				raise CaptureFormatException("Truncated pcap record header.")
+			(ts_sec, ts_frac, captured_length, original_length) = self._record_header.unpack(record_header)
+			data = self._f.read(captured_length)
+			if len(data) != captured_length:
+				raise CaptureFormatException(f"Truncated pcap record, expected {captured_length} bytes but got {len(data)}.")
+			yield self.PCAPPacket(linktype = self._linktype, timestamp = ts_sec + ts_frac * self._ts_resolution, data = data)
+
+	def close(self):
+		if self._close:
+			self._f.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
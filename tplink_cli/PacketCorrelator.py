@@ -0,0 +1,189 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import math
+import collections
+import dataclasses
+from .Enums import Opcode
+from .MACAddress import MACAddress
+
+class LatencyHistogram():
+	# Logarithmic buckets, i.e., constant memory and a relative error of at
+	# most 2^(1/8) - 1 (about 9%) for the reported percentiles.
+	_BUCKETS_PER_OCTAVE = 8
+	_MIN_LATENCY = 1e-6
+
+	def __init__(self):
+		self._buckets = collections.Counter()
+		self._count = 0
+		self._max = 0
+
+	@property
+	def count(self):
+		return self._count
+
+	@property
+	def max(self):
+		return self._max
+
+	def add(self, latency: float):
+		latency = max(latency, self._MIN_LATENCY)
+		index = math.ceil(math.log2(latency / self._MIN_LATENCY) * self._BUCKETS_PER_OCTAVE)
+		self._buckets[index] += 1
+		self._count += 1
+		self._max = max(self._max, latency)
+
+	def percentile(self, percentile: float):
+		if self._count == 0:
+			return None
+		rank = max(1, math.ceil(percentile / 100 * self._count))
+		seen = 0
+		for index in sorted(self._buckets):
+			seen += self._buckets[index]
+			if seen >= rank:
+				return min(self._MIN_LATENCY * (2 ** (index / self._BUCKETS_PER_OCTAVE)), self._max)
+
+@dataclasses.dataclass(slots = True)
+class SwitchStatistics():
+	requests: int = 0
+	responses: int = 0
+	timeouts: int = 0
+	retransmits: int = 0
+	unmatched_responses: int = 0
+	latency: LatencyHistogram = dataclasses.field(default_factory = LatencyHistogram)
+	error_codes: collections.Counter = dataclasses.field(default_factory = collections.Counter)
+
+@dataclasses.dataclass(slots = True)
+class InFlightRequest():
+	timestamp: float
+	opcode: Opcode
+	switch_mac: "MACAddress"
+	retransmitted: bool = False
+	answered: bool = False
+
+class PacketCorrelator():
+	_ANY_SWITCH = MACAddress(bytes(6))
+	_EXPECTED_RESPONSE = {
+		Opcode.Discovery:	Opcode.ResponseData,
+		Opcode.RequestData:	Opcode.ResponseData,
+		Opcode.SetData:		Opcode.AcknowledgeSetData,
+	}
+
+	def __init__(self, timeout: float = 1.0, max_inflight: int = 65536):
+		self._timeout = timeout
+		self._max_inflight = max_inflight
+		# Requests are inserted in order of their timestamp, the oldest one
+		# is therefore always at the front.
+		self._inflight = collections.OrderedDict()
+		self._switches = collections.defaultdict(SwitchStatistics)
+		self._evicted = 0
+		self._skipped = 0
+
+	@property
+	def switches(self):
+		return self._switches
+
+	@property
+	def pending(self):
+		return sum(1 for request in self._inflight.values() if not request.answered)
+
+	def expire(self, now: float):
+		while len(self._inflight) > 0:
+			request = next(iter(self._inflight.values()))
+			if request.timestamp + self._timeout >= now:
+				break
+			self._inflight.popitem(last = False)
+			if not request.answered:
+				self._switches[request.switch_mac].timeouts += 1
+
+	def _observe_request(self, header, timestamp: float):
+		# Hosts may reuse a sequence number for requests to different switches
+		key = (header.host_mac, header.sequence_number, header.switch_mac)
+		self._switches[header.switch_mac].requests += 1
+		request = self._inflight.get(key)
+		if (request is not None) and (request.opcode == header.opcode):
+			# Latency samples of retransmitted requests are ambiguous and are
+			# not used (Karn's algorithm).
+			request.retransmitted = True
+			self._switches[header.switch_mac].retransmits += 1
+			return
+		if len(self._inflight) >= self._max_inflight:
+			self._inflight.popitem(last = False)
+			self._evicted += 1
+		self._inflight[key] = InFlightRequest(timestamp = timestamp, opcode = header.opcode, switch_mac = header.switch_mac)
+
+	def _observe_response(self, header, timestamp: float):
+		key = (header.host_mac, header.sequence_number, header.switch_mac)
+		stats = self._switches[header.switch_mac]
+		stats.responses += 1
+		stats.error_codes[header.error_code] += 1
+		request = self._inflight.get(key)
+		if request is None:
+			# Broadcast requests are answered by any switch
+			key = (header.host_mac, header.sequence_number, self._ANY_SWITCH)
+			request = self._inflight.get(key)
+		if (request is None) or (self._EXPECTED_RESPONSE[request.opcode] != header.opcode):
+			stats.unmatched_responses += 1
+			return
+		if request.opcode == Opcode.Discovery:
+			# Broadcast, i.e., every switch answers the same request
+			request.answered = True
+		else:
+			del self._inflight[key]
+		if not request.retransmitted:
+			stats.latency.add(timestamp - request.timestamp)
+
+	def observe(self, header, timestamp: float | None):
+		if (timestamp is None) or math.isnan(timestamp):
+			self._skipped += 1
+			return
+		self.expire(timestamp)
+		if header.opcode in self._EXPECTED_RESPONSE:
+			self._observe_request(header, timestamp)
+		else:
+			self._observe_response(header, timestamp)
+
+	@staticmethod
+	def _format_latency(latency: float | None):
+		if latency is None:
+			return "-"
+		return f"{latency * 1000:.3f}ms"
+
+	@staticmethod
+	def _format_error_codes(error_codes: collections.Counter):
+		return ",".join(f"{error_code:#x}:{count}" for (error_code, count) in sorted(error_codes.items()) if error_code != 0) or "-"
+
+	def report(self, file = None):
+		print(f"{'switch':<17s} {'requests':>8s} {'responses':>9s} {'timeouts':>8s} {'retransmits':>11s} {'unmatched':>9s} {'p50':>10s} {'p99':>10s} {'max':>10s}  errors", file = file)
+		for (switch_mac, stats) in sorted(self._switches.items()):
+			p50 = self._format_latency(stats.latency.percentile(50))
+			p99 = self._format_latency(stats.latency.percentile(99))
+			latency_max = self._format_latency(stats.latency.max if (stats.latency.count > 0) else None)
+			print(f"{str(switch_mac):<17s} {stats.requests:8d} {stats.responses:9d} {stats.timeouts:8d} {stats.retransmits:11d} {stats.unmatched_responses:9d} {p50:>10s} {p99:>10s} {latency_max:>10s}  {self._format_error_codes(stats.error_codes)}", file = file)
+		print(f"{self.pending} requests still pending, {self._evicted} evicted from full in-flight table, {self._skipped} packets without timestamp skipped", file = file)
+
+if __name__ == "__main__":
+	histogram = LatencyHistogram()
+	for i in range(1, 1001):
+		histogram.add(i / 1000)
+	assert(0.5 <= histogram.percentile(50) <= 0.5 * 1.1)
+	assert(0.99 <= histogram.percentile(99) <= 0.99 * 1.1)
+	assert(histogram.percentile(100) == 1)
@@ -19,15 +19,44 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
-import contextlib
+import struct
+import collections
 from .Enums import FieldTag
 from .Exceptions import DeserializationException
-from .TPLinkTypes import get_handler_class
+from .TPLinkTypes import codec_registry
+
+_FIELD_TAGS = { int(tag): tag for tag in FieldTag }
 
 class PacketField():
+	__slots__ = ("_tag", "_value", "_raw_value")
+
 	def __init__(self, tag: "FieldTag | int", value: "TPLinkRawData"):
 		self._tag = tag
 		self._value = value
+		self._raw_value = None
+
+	@classmethod
+	def parse(cls, text: str):
+		# Parses "Tag=value" where the tag is either the name or the number
+		if "=" not in text:
+			raise ValueError(f"Field must be given as 'Tag=value': {text}")
+		(tag_text, value_text) = text.split("=", maxsplit = 1)
+		if tag_text in FieldTag.__members__:
+			tag = FieldTag[tag_text]
+		else:
+			try:
+				tag = int(tag_text, 0)
+			except ValueError as e:
+				raise ValueError(f"Not a valid field tag: {tag_text}") from e
+			tag = _FIELD_TAGS.get(tag, tag)
+		return cls(tag, codec_registry.lookup(tag).handler_class.parse(value_text))
+
+	@classmethod
+	def from_raw(cls, tag: "FieldTag | int", raw_value: memoryview):
+		# The value is only decoded when it is first accessed
+		field = cls(tag, None)
+		field._raw_value = raw_value
+		return field
 
 	@property
 	def tag(self):
@@ -42,14 +71,31 @@ class PacketField():
 
 	@property
 	def value(self):
+		if self._value is None:
+			self._value = codec_registry.decode(self.tag, bytes(self._raw_value))
+			self._raw_value = None
 		return self._value
 
-	def dump(self, prefix = ""):
-		print(f"{prefix}{str(self)}")
+	@property
+	def encoded_value(self):
+		if self._value is None:
+			return self._raw_value
+		else:
+			return bytes(self._value)
+
+	def format(self, prefix = ""):
+		return f"{prefix}{str(self)}"
+
+	def dump(self, prefix = "", file = None):
+		print(self.format(prefix = prefix), file = file)
+
+	def to_json(self):
+		value = self.value
+		return { "tag": self.tag_str, "type": type(value).__name__, "value": value.json_value() }
 
 	def __bytes__(self):
 		tag_bytes = int(self.tag).to_bytes(length = 2, byteorder = "big")
-		value = bytes(self.value)
+		value = bytes(self.encoded_value)
 		length_bytes = len(value).to_bytes(length = 2, byteorder = "big")
 		return tag_bytes + length_bytes + value
 
@@ -57,54 +103,150 @@ class PacketField():
 		return f"{self.tag_str} = {self.value}"
 
 class PacketFields():
+	__slots__ = ("_fields", "_index", "_raw_payload")
+	_TLV_HEADER = struct.Struct(">HH")
+	EncodedFields = collections.namedtuple("EncodedFields", [ "length", "raw_payload", "fields" ])
+
 	def __init__(self):
 		self._fields = [ ]
+		self._index = { }
+		self._raw_payload = None
+
+	@classmethod
+	def from_raw(cls, payload: memoryview):
+		# The TLV structure is only parsed when the fields are first accessed
+		fields = cls()
+		fields._raw_payload = payload
+		return fields
+
+	def _materialize(self):
+		# Only replaces the raw payload once it parsed successfully, so that a
+		# malformed payload raises on every access
+		if self._raw_payload is not None:
+			(self._fields, self._index) = self._parse(self._raw_payload)
+			self._raw_payload = None
 
 	def clear(self):
+		self._raw_payload = None
 		self._fields = [ ]
+		self._index = { }
 
 	def append(self, field: PacketField):
+		self._materialize()
+		self._index_add(self._index, int(field.tag), len(self._fields))
 		self._fields.append(field)
 
 	def append_all(self, fields: list[PacketField]):
 		for field in fields:
 			self.append(field)
 
+	def get(self, tag: "FieldTag | int", default = None):
+		self._materialize()
+		positions = self._index.get(tag)
+		if positions is None:
+			return default
+		elif isinstance(positions, int):
+			return self._fields[positions]
+		else:
+			return self._fields[positions[0]]
+
+	def get_all(self, tag: "FieldTag | int"):
+		self._materialize()
+		positions = self._index.get(tag)
+		if positions is None:
+			return [ ]
+		elif isinstance(positions, int):
+			return [ self._fields[positions] ]
+		else:
+			return [ self._fields[position] for position in positions ]
+
+	@staticmethod
+	def _index_add(index, tag, position):
+		# Most tags occur only once per packet, store a plain position for
+		# those and only use a list for repeated tags.
+		positions = index.get(tag)
+		if positions is None:
+			index[tag] = position
+		elif isinstance(positions, int):
+			index[tag] = [ positions, position ]
+		else:
+			positions.append(position)
+
 	@classmethod
 	def deserialize(cls, payload):
-		fields = cls()
+		packet_fields = cls()
+		(packet_fields._fields, packet_fields._index) = cls._parse(payload)
+		return packet_fields
 
+	@classmethod
+	def _parse(cls, payload):
+		# Walks the TLV structure without copying; every field value is a
+		# memoryview slice into the original payload.
+		payload = memoryview(payload)
+		payload_length = len(payload)
+		unpack_tlv_header = cls._TLV_HEADER.unpack_from
+		(fields, index, index_add) = ([ ], { }, cls._index_add)
 		offset = 0
 		while True:
-			tag = (payload[offset + 0] << 8) | payload[offset + 1]
+			if offset + 4 > payload_length:
+				raise DeserializationException(f"TLV packet truncated, length {payload_length} bytes but expected TLV header at offset {offset}.")
+			(tag, length) = unpack_tlv_header(payload, offset)
 			if tag == FieldTag.EndOfFields:
 				# Exit
 				break
 
-			with contextlib.suppress(ValueError):
-				tag = FieldTag(tag)
-
-			length = (payload[offset + 2] << 8) | payload[offset + 3]
+			if offset + 4 + length > payload_length:
+				raise DeserializationException(f"TLV packet indicated length of {length} bytes, but only {payload_length - offset - 4} bytes available in packet.")
 			value = payload[offset + 4 : offset + 4 + length]
-			if len(value) != length:
-				raise DeserializationException(f"TLV packet indicated length of {length} bytes, but only {len(value)} bytes available in packet.")
 			offset += 4 + length
 
-			handler_class = get_handler_class(tag)
-			field = PacketField(tag, handler_class.deserialize(value))
-			fields.append(field)
-
-		if offset + 4 != len(payload):
-			raise DeserializationException(f"TLV packet has trailing garbage data, length {len(payload)} bytes but finished at offset {offset}.")
-		return fields
+			index_add(index, tag, len(fields))
+			fields.append(PacketField.from_raw(_FIELD_TAGS.get(tag, tag), value))
+
+		if offset + 4 != payload_length:
+			raise DeserializationException(f"TLV packet has trailing garbage data, length {payload_length} bytes but finished at offset {offset}.")
+		return (fields, index)
+
+	def encode(self):
+		# Determines the serialized length and encodes all field values once
+		# so that they can subsequently be written by pack_into().
+		if self._raw_payload is not None:
+			# Untouched payload, reuse original serialization
+			return self.EncodedFields(length = len(self._raw_payload), raw_payload = self._raw_payload, fields = None)
+		fields = [ (int(field.tag), field.encoded_value) for field in self._fields ]
+		length = sum(4 + len(value) for (tag, value) in fields) + 4
+		return self.EncodedFields(length = length, raw_payload = None, fields = fields)
+
+	def pack_into(self, buffer, offset, encoded_fields = None):
+		if encoded_fields is None:
+			encoded_fields = self.encode()
+		if encoded_fields.raw_payload is not None:
+			buffer[offset : offset + encoded_fields.length] = encoded_fields.raw_payload
+			return
+		pack_tlv_header = self._TLV_HEADER.pack_into
+		for (tag, value) in encoded_fields.fields:
+			length = len(value)
+			pack_tlv_header(buffer, offset, tag, length)
+			buffer[offset + 4 : offset + 4 + length] = value
+			offset += 4 + length
+		pack_tlv_header(buffer, offset, FieldTag.EndOfFields, 0)
 
 	def __bytes__(self):
-		return b"".join(bytes(field) for field in self._fields) + bytes.fromhex("ffff 0000")
+		encoded_fields = self.encode()
+		buffer = bytearray(encoded_fields.length)
+		self.pack_into(buffer, 0, encoded_fields)
+		return bytes(buffer)
+
+	def __contains__(self, tag: "FieldTag | int"):
+		self._materialize()
+		return tag in self._index
 
 	def __iter__(self):
+		self._materialize()
 		return iter(self._fields)
 
 	def __len__(self):
+		self._materialize()
 		return len(self._fields)
 
 	def __repr__(self):
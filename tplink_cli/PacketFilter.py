@@ -0,0 +1,75 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import datetime
+from .Enums import Opcode
+from .MACAddress import MACAddress
+
+class PacketFilter():
+	def __init__(self, opcodes: "list[Opcode] | None" = None, switch_macs: "list[MACAddress] | None" = None, time_range: "tuple[float | None, float | None] | None" = None):
+		self._opcodes = set(opcodes) if (opcodes is not None) else None
+		self._switch_macs = set(switch_macs) if (switch_macs is not None) else None
+		self._time_range = time_range
+
+	@classmethod
+	def from_args(cls, args):
+		opcodes = [ Opcode[name] for name in args.opcode ] if (args.opcode is not None) else None
+		return cls(opcodes = opcodes, switch_macs = args.switch_mac, time_range = getattr(args, "time_range", None))
+
+	@staticmethod
+	def _parse_timestamp(text: str):
+		if text == "":
+			return None
+		try:
+			return float(text)
+		except ValueError:
+			return datetime.datetime.fromisoformat(text).timestamp()
+
+	@classmethod
+	def parse_time_range(cls, text: str):
+		if "," not in text:
+			raise ValueError(f"Time range must be given as 'start,end': {text}")
+		(start, end) = text.split(",", maxsplit = 1)
+		return (cls._parse_timestamp(start), cls._parse_timestamp(end))
+
+	@property
+	def active(self):
+		return (self._opcodes is not None) or (self._switch_macs is not None) or (self._time_range is not None)
+
+	def matches_timestamp(self, timestamp: float | None):
+		if self._time_range is None:
+			return True
+		if timestamp is None:
+			return False
+		# Written so that NaN, i.e., an unknown timestamp, never matches
+		(start, end) = self._time_range
+		if (start is not None) and (not (timestamp >= start)):
+			return False
+		if (end is not None) and (not (timestamp <= end)):
+			return False
+		return True
+
+	def matches(self, header):
+		if (self._opcodes is not None) and (header.opcode not in self._opcodes):
+			return False
+		if (self._switch_macs is not None) and (header.switch_mac not in self._switch_macs):
+			return False
+		return True
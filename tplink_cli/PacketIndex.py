@@ -0,0 +1,136 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import mmap
+import contextlib
+from .NamedStruct import NamedStruct
+from .PCAPNGReader import PCAPNGReader
+from .CapturePrefilter import CapturePrefilter
+from .RC4Packet import RC4Packet
+from .Exceptions import DeserializationException
+
+class PacketIndex():
+	# Sidecar file next to a pcapng capture that holds one fixed-width record
+	# per TP-Link packet. It is tied to the capture by file size and mtime.
+	_MAGIC = b"TPLIDX01"
+	_HEADER = NamedStruct((
+		("8s", "magic"),
+		("Q", "file_size"),
+		("Q", "mtime_ns"),
+		("Q", "record_count"),
+	))
+	_RECORD = NamedStruct((
+		("Q", "block_offset"),
+		("Q", "payload_offset"),
+		("H", "payload_length"),
+		("d", "timestamp"),
+		("B", "opcode"),
+		("6s", "switch_mac"),
+		("6s", "host_mac"),
+		("H", "sequence_number"),
+		("I", "error_code"),
+	))
+
+	def __init__(self, capture_filename: str, data: bytes, record_count: int):
+		self._capture_filename = capture_filename
+		self._data = data
+		self._record_count = record_count
+
+	@staticmethod
+	def index_filename(capture_filename: str):
+		return capture_filename + ".tplidx"
+
+	@classmethod
+	def _capture_identity(cls, capture_filename: str):
+		stat = os.stat(capture_filename)
+		return (stat.st_size, stat.st_mtime_ns)
+
+	@classmethod
+	def build(cls, capture_filename: str):
+		(file_size, mtime_ns) = cls._capture_identity(capture_filename)
+		prefilter = CapturePrefilter()
+		index_filename = cls.index_filename(capture_filename)
+		record = bytearray(cls._RECORD.size)
+		record_count = 0
+		try:
+			with PCAPNGReader(capture_filename) as reader, open(index_filename + ".tmp", "wb") as f:
+				f.write(bytes(cls._HEADER.size))
+				for packet in reader:
+					payload_range = prefilter.locate_payload(packet.linktype, packet.data)
+					if payload_range is None:
+						continue
+					payload = packet.data[payload_range[0] : payload_range[1]]
+					try:
+						header = RC4Packet.deserialize_header(payload, allow_fragment = True)
+					except DeserializationException:
+						continue
+					timestamp = packet.timestamp if (packet.timestamp is not None) else float("nan")
+					cls._RECORD.pack_into(record, 0, (packet.offset, packet.data_offset + payload_range[0], len(payload), timestamp, header.opcode, bytes(header.switch_mac), bytes(header.host_mac), header.sequence_number, header.error_code))
+					f.write(record)
+					record_count += 1
+				f.seek(0)
+				f.write(cls._HEADER.pack({ "magic": cls._MAGIC, "file_size": file_size, "mtime_ns": mtime_ns, "record_count": record_count }))
+		except BaseException:
+			# Do not leave an incomplete index behind
+			with contextlib.suppress(FileNotFoundError):
+				os.unlink(index_filename + ".tmp")
+			raise
+		os.replace(index_filename + ".tmp", index_filename)
+		return record_count
+
+	@classmethod
+	def load(cls, capture_filename: str):
+		# Returns None if there is no index or if it is stale.
+		index_filename = cls.index_filename(capture_filename)
+		if not os.path.isfile(index_filename):
+			return None
+		with open(index_filename, "rb") as f:
+			header = cls._HEADER.unpack_from_file(f)
+			if (header.magic != cls._MAGIC) or ((header.file_size, header.mtime_ns) != cls._capture_identity(capture_filename)):
+				return None
+			if os.fstat(f.fileno()).st_size != cls._HEADER.size + (header.record_count * cls._RECORD.size):
+				return None
+			data = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+		return cls(capture_filename, data, header.record_count)
+
+	def close(self):
+		self._data.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __len__(self):
+		return self._record_count
+
+	def __iter__(self):
+		for record_no in range(self._record_count):
+			yield self._RECORD.unpack_from(self._data, self._HEADER.size + (record_no * self._RECORD.size))
+
+	def query(self, packet_filter: "PacketFilter"):
+		# Records carry raw header values, which compare equal to the Opcode and
+		# MACAddress objects held by the filter.
+		for record in self:
+			if packet_filter.matches_timestamp(record.timestamp) and packet_filter.matches(record):
+				yield record
@@ -0,0 +1,176 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import io
+import sys
+import csv
+import json
+import math
+import collections
+from .NamedStruct import NamedStruct
+from .Exceptions import CaptureFormatException
+
+class PacketWriter():
+	# Every packet is rendered into a single bytes object first so that each
+	# packet results in exactly one write to the (buffered) output stream.
+	human_readable = False
+
+	def __init__(self, f):
+		self._f = f
+
+	@classmethod
+	def create(cls, output_format: str, f):
+		return _WRITER_CLASSES[output_format](f)
+
+	@classmethod
+	def formats(cls):
+		return tuple(_WRITER_CLASSES)
+
+	@staticmethod
+	def _json_timestamp(timestamp: float | None):
+		if (timestamp is None) or math.isnan(timestamp):
+			return None
+		return timestamp
+
+	def preamble(self):
+		return b""
+
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		raise NotImplementedError(__class__.__name__)
+
+	def write_preamble(self):
+		self._f.write(self.preamble())
+
+	def write(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		self._f.write(self.encode(rc4_pkt, plaintext, timestamp = timestamp, warnings = warnings))
+
+	def write_raw(self, data: bytes):
+		self._f.write(data)
+
+	def flush(self):
+		self._f.flush()
+
+	def report_file(self):
+		# Reports that are printed alongside the packets must not end up in
+		# between machine-readable output
+		return sys.stdout if self.human_readable else sys.stderr
+
+class NullPacketWriter(PacketWriter):
+	human_readable = True
+
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		for warning in warnings:
+			print(warning, file = sys.stderr)
+		return b""
+
+class TextPacketWriter(PacketWriter):
+	human_readable = True
+
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		lines = [ rc4_pkt.format() ]
+		lines += warnings
+		lines.append("\n")
+		return "\n".join(lines).encode()
+
+class JSONLPacketWriter(PacketWriter):
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		for warning in warnings:
+			print(warning, file = sys.stderr)
+		record = { "timestamp": self._json_timestamp(timestamp) }
+		record.update(rc4_pkt.to_json())
+		return (json.dumps(record, separators = (",", ":")) + "\n").encode()
+
+class CSVPacketWriter(PacketWriter):
+	_COLUMNS = ("timestamp", "version", "opcode", "switch_mac", "host_mac", "sequence_number", "error_code", "length", "fragmentation_offset", "flags", "token_id", "checksum", "fields")
+
+	def _encode_row(self, row):
+		output = io.StringIO()
+		csv.writer(output).writerow(row)
+		return output.getvalue().encode()
+
+	def preamble(self):
+		return self._encode_row(self._COLUMNS)
+
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		for warning in warnings:
+			print(warning, file = sys.stderr)
+		record = rc4_pkt.to_json()
+		record["timestamp"] = self._json_timestamp(timestamp)
+		record["fields"] = json.dumps(record["fields"], separators = (",", ":"))
+		return self._encode_row(record[column] for column in self._COLUMNS)
+
+class BinaryPacketWriter(PacketWriter):
+	# Stream of the plaintext packets, each prefixed by its length and
+	# capture timestamp (NaN if unknown); reading it back does not require
+	# decryption.
+	_MAGIC = b"TPLREC01"
+	_RECORD_HEADER = NamedStruct((
+		("I", "length"),
+		("d", "timestamp"),
+	), struct_extra = ">")
+
+	def preamble(self):
+		return self._MAGIC
+
+	def encode(self, rc4_pkt: "RC4Packet", plaintext: bytes, timestamp: float | None = None, warnings: "tuple[str]" = ()):
+		for warning in warnings:
+			print(warning, file = sys.stderr)
+		if timestamp is None:
+			timestamp = math.nan
+		buffer = bytearray(self._RECORD_HEADER.size + len(plaintext))
+		self._RECORD_HEADER.pack_into(buffer, 0, (len(plaintext), timestamp))
+		buffer[self._RECORD_HEADER.size : ] = plaintext
+		return bytes(buffer)
+
+class BinaryPacketReader():
+	PacketRecord = collections.namedtuple("PacketRecord", [ "timestamp", "plaintext" ])
+
+	def __init__(self, f):
+		self._f = f
+
+	@classmethod
+	def is_binary_record_stream(cls, magic: bytes):
+		return (len(magic) >= 4) and BinaryPacketWriter._MAGIC.startswith(magic)
+
+	def __iter__(self):
+		record_header = BinaryPacketWriter._RECORD_HEADER
+		magic = self._f.read(len(BinaryPacketWriter._MAGIC))
+		if magic != BinaryPacketWriter._MAGIC:
+			raise CaptureFormatException("Not a binary packet record stream.")
+		while True:
+			header_data = self._f.read(record_header.size)
+			if len(header_data) == 0:
+				break
+			if len(header_data) != record_header.size:
+				raise CaptureFormatException("Binary packet record stream truncated within record header.")
+			header = record_header.unpack(header_data)
+			plaintext = self._f.read(header.length)
+			if len(plaintext) != header.length:
+				raise CaptureFormatException("Binary packet record stream truncated within record.")
+			yield self.PacketRecord(timestamp = header.timestamp, plaintext = plaintext)
+
+_WRITER_CLASSES = {
+	"text":		TextPacketWriter,
+	"jsonl":	JSONLPacketWriter,
+	"csv":		CSVPacketWriter,
+	"binary":	BinaryPacketWriter,
+	"none":		NullPacketWriter,
+}
@@ -19,7 +19,14 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
 class RC4():
+	_BLOCK_SIZE = 64 * 1024
+
 	def __init__(self, key):
 		self._sbox = self._key_schedule(key)
 		self._i = 0
@@ -41,11 +48,57 @@ class RC4():
 		k = self._sbox[(self._sbox[self._i] + self._sbox[self._j]) % 256]
 		return k
 
+	def keystream_into(self, buffer, offset = 0, count = None):
+		if count is None:
+			count = len(buffer) - offset
+		sbox = self._sbox
+		(i, j) = (self._i, self._j)
+		for pos in range(offset, offset + count):
+			i = (i + 1) & 0xff
+			si = sbox[i]
+			j = (j + si) & 0xff
+			sj = sbox[j]
+			sbox[i] = sj
+			sbox[j] = si
+			buffer[pos] = sbox[(si + sj) & 0xff]
+		(self._i, self._j) = (i, j)
+
 	def next_bytes(self, count):
-		return bytes(self.next_byte() for i in range(count))
+		keystream = bytearray(count)
+		self.keystream_into(keystream)
+		return bytes(keystream)
+
+	@staticmethod
+	def xor(data, keystream):
+		length = len(data)
+		if numpy is not None:
+			return (numpy.frombuffer(data, dtype = numpy.uint8, count = length) ^ numpy.frombuffer(keystream, dtype = numpy.uint8, count = length)).tobytes()
+		value = int.from_bytes(data, byteorder = "little") ^ int.from_bytes(keystream[ : length], byteorder = "little")
+		return value.to_bytes(length = length, byteorder = "little")
+
+	@staticmethod
+	def xor_into(buffer, keystream, offset = 0, count = None):
+		if count is None:
+			count = len(buffer) - offset
+		view = memoryview(buffer).cast("B")[offset : offset + count]
+		if numpy is not None:
+			target = numpy.frombuffer(view, dtype = numpy.uint8)
+			target ^= numpy.frombuffer(keystream, dtype = numpy.uint8, count = count)
+		else:
+			view[:] = RC4.xor(view, keystream)
 
 	def crypt(self, data):
-		return bytes(srcbyte ^ keybyte for (srcbyte, keybyte) in zip(data, self.next_bytes(len(data))))
+		result = bytearray(data)
+		self.crypt_into(result)
+		return bytes(result)
+
+	def crypt_into(self, buffer):
+		length = len(memoryview(buffer).cast("B"))
+		keystream = bytearray(min(length, self._BLOCK_SIZE))
+		for offset in range(0, length, self._BLOCK_SIZE):
+			count = min(length - offset, self._BLOCK_SIZE)
+			self.keystream_into(keystream, count = count)
+			self.xor_into(buffer, keystream, offset = offset, count = count)
 
 if __name__ == "__main__":
 	rc4 = RC4(bytes.fromhex("0102030405"))
@@ -58,3 +111,11 @@ if __name__ == "__main__":
 	rc4 = RC4(bytes.fromhex("1ada31d5cf688221c109163908ebe51debb46227c6cc8b37641910833222772a"))
 	rc4.next_bytes(4096)
 	assert(rc4.next_bytes(16) == bytes.fromhex("37 0b 1c 1f  e6 55 91 6d   97 fd 0d 47  ca 1d 72 b8"))
+
+	rc4 = RC4(bytes.fromhex("0102030405"))
+	plaintext = bytes(range(256)) * 600
+	ciphertext = rc4.crypt(plaintext)
+	buffer = bytearray(ciphertext)
+	RC4(bytes.fromhex("0102030405")).crypt_into(buffer)
+	assert(buffer == plaintext)
+	assert(ciphertext[ : 16] == RC4.xor(plaintext[ : 16], bytes.fromhex("b2 39 63 05  f0 3d c0 27   cc c3 52 4a  0a 11 18 a8")))
@@ -23,12 +23,14 @@ import enum
 import dataclasses
 from .Enums import Opcode
 from .PacketField import PacketFields
+from .RC4PacketBatch import RC4PacketBatch
+from .FragmentReassembler import FragmentReassembler
 from .TPLinkObfuscation import TPLinkObfuscation
 from .NamedStruct import NamedStruct
 from .Exceptions import DeserializationException
 from .MACAddress import MACAddress
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots = True)
 class RC4Packet():
 	_HEADER_DEFINITION = NamedStruct((
 		("B", "version"),
@@ -43,6 +45,8 @@ class RC4Packet():
 		("H", "token_id"),
 		("I", "checksum"),
 	), struct_extra = ">")
+	_PROTOCOL_VERSION = 1
+	_OPCODES = frozenset(int(opcode) for opcode in Opcode)
 	version: int
 	opcode: Opcode
 	switch_mac: MACAddress
@@ -63,41 +67,89 @@ class RC4Packet():
 		return cls.deserialize_plaintext(plaintext)
 
 	@classmethod
-	def deserialize_plaintext(cls, plaintext: bytes):
+	def _deserialize_header_plaintext(cls, plaintext: bytes, datagram_length: int, allow_fragment: bool = False):
 		if len(plaintext) < cls._HEADER_DEFINITION.size:
-			raise DeserializationException(f"Unable to deserialize RC4 packet too short for header (length {len(plaintext)} bytes).")
+			raise DeserializationException(f"Unable to deserialize RC4 packet too short for header (length {datagram_length} bytes).")
+
+		header = cls._HEADER_DEFINITION.unpack_from(plaintext)
+		cls._check_header(header, datagram_length, allow_fragment = allow_fragment)
+		return header._replace(opcode = Opcode(header.opcode), switch_mac = MACAddress(header.switch_mac), host_mac = MACAddress(header.host_mac))
 
-		header = cls._HEADER_DEFINITION.unpack_head(plaintext)
-		if len(plaintext) != header.length:
-			raise DeserializationException(f"Unable to deserialize RC4 packet, header indicates {header.length} bytes but message was {len(plaintext)} bytes long.")
+	@classmethod
+	def _check_header(cls, header, datagram_length: int, allow_fragment: bool = False):
+		if header.version != cls._PROTOCOL_VERSION:
+			raise DeserializationException(f"Unable to deserialize RC4 packet with unsupported protocol version {header.version}.")
+		if allow_fragment:
+			if header.fragmentation_offset + datagram_length > header.length:
+				raise DeserializationException(f"Unable to deserialize RC4 packet fragment, {datagram_length} bytes at offset {header.fragmentation_offset} exceed the message length of {header.length} bytes.")
+		elif datagram_length != header.length:
+			raise DeserializationException(f"Unable to deserialize RC4 packet, header indicates {header.length} bytes but message was {datagram_length} bytes long.")
+		if header.opcode not in cls._OPCODES:
+			raise DeserializationException(f"Unable to deserialize RC4 packet with unknown opcode {header.opcode}.")
+
+	@classmethod
+	def deserialize_header(cls, ciphertext: bytes, allow_fragment: bool = False):
+		# Only decrypt the header portion of the datagram; this is sufficient
+		# to filter packets and to reject non-TP-Link traffic early.
+		plaintext = TPLinkObfuscation.deobfuscate(ciphertext[ : cls._HEADER_DEFINITION.size])
+		return cls._deserialize_header_plaintext(plaintext, len(ciphertext), allow_fragment = allow_fragment)
 
+	@staticmethod
+	def is_fragment(header, datagram_length: int):
+		return (header.fragmentation_offset != 0) or (header.length != datagram_length)
+
+	@classmethod
+	def reassembler(cls, timeout: float = 2.0, memory_budget: int = 4 * 1024 * 1024):
+		return FragmentReassembler(cls._HEADER_DEFINITION, timeout = timeout, memory_budget = memory_budget)
+
+	@classmethod
+	def deserialize_plaintext(cls, plaintext: bytes):
+		header = cls._deserialize_header_plaintext(plaintext, len(plaintext))
 		field_dict = header._asdict()
-		field_dict["opcode"] = Opcode(field_dict["opcode"])
-		field_dict["switch_mac"] = MACAddress(field_dict["switch_mac"])
-		field_dict["host_mac"] = MACAddress(field_dict["host_mac"])
-		payload_data = plaintext[cls._HEADER_DEFINITION.size : ]
-		field_dict["payload"] = PacketFields.deserialize(payload_data)
+		payload_data = memoryview(plaintext)[cls._HEADER_DEFINITION.size : ]
+		field_dict["payload"] = PacketFields.from_raw(payload_data)
 		return cls(**field_dict)
 
-	def serialize_plaintext(self):
-		payload = bytes(self.payload)
+	@classmethod
+	def deserialize_many(cls, datagrams):
+		# Decodes into a columnar batch instead of individual RC4Packet
+		# objects; datagrams that are not valid packets are counted, but
+		# otherwise skipped.
+		batch = RC4PacketBatch(cls._HEADER_DEFINITION)
+		header_size = cls._HEADER_DEFINITION.size
+		for datagram in datagrams:
+			if len(datagram) < header_size:
+				batch.skip()
+				continue
+			plaintext = TPLinkObfuscation.deobfuscate(datagram)
+			header = cls._HEADER_DEFINITION.unpack_from(plaintext)
+			try:
+				cls._check_header(header, len(plaintext))
+			except DeserializationException:
+				batch.skip()
+				continue
+			batch.append(header, memoryview(plaintext)[header_size : ])
+		return batch
 
-		header_dict = dataclasses.asdict(self)
-		del header_dict["auto_compute_length"]
-		del header_dict["payload"]
-		header_dict["switch_mac"] = bytes(header_dict["switch_mac"])
-		header_dict["host_mac"] = bytes(header_dict["host_mac"])
-		if self.auto_compute_length:
-			header_dict["length"] = self._HEADER_DEFINITION.size + len(payload)
-		header = self._HEADER_DEFINITION.pack(header_dict)
+	def _serialize_into_buffer(self):
+		header_size = self._HEADER_DEFINITION.size
+		encoded_fields = self.payload.encode()
+		buffer = bytearray(header_size + encoded_fields.length)
+		length = len(buffer) if self.auto_compute_length else self.length
+		self._HEADER_DEFINITION.pack_into(buffer, 0, (self.version, self.opcode, bytes(self.switch_mac), bytes(self.host_mac), self.sequence_number, self.error_code, length, self.fragmentation_offset, self.flags, self.token_id, self.checksum))
+		self.payload.pack_into(buffer, header_size, encoded_fields)
+		return buffer
 
-		return header + payload
+	def serialize_plaintext(self):
+		return bytes(self._serialize_into_buffer())
 
 	def serialize(self):
-		plaintext = self.serialize_plaintext()
-		return TPLinkObfuscation.obfuscate(plaintext)
+		buffer = self._serialize_into_buffer()
+		TPLinkObfuscation.obfuscate_into(buffer)
+		return bytes(buffer)
 
-	def dump(self):
+	def format(self):
+		lines = [ ]
 		for field in dataclasses.fields(self):
 			if not field.repr:
 				continue
@@ -105,10 +157,30 @@ class RC4Packet():
 			value = getattr(self, name)
 			if name != "payload":
 				if not isinstance(value, enum.Enum):
-					print(f"{name}: {value}")
+					lines.append(f"{name}: {value}")
 				else:
-					print(f"{name}: {value.name}")
+					lines.append(f"{name}: {value.name}")
 			else:
-				print(f"{name}: {len(self.payload)} fields")
+				lines.append(f"{name}: {len(self.payload)} fields")
 				for field_item in value:
-					field_item.dump(prefix = "    ")
+					lines.append(field_item.format(prefix = "    "))
+		return "\n".join(lines)
+
+	def dump(self, file = None):
+		print(self.format(), file = file)
+
+	def to_json(self):
+		return {
+			"version": self.version,
+			"opcode": self.opcode.name,
+			"switch_mac": str(self.switch_mac),
+			"host_mac": str(self.host_mac),
+			"sequence_number": self.sequence_number,
+			"error_code": self.error_code,
+			"length": self.length,
+			"fragmentation_offset": self.fragmentation_offset,
+			"flags": self.flags,
+			"token_id": self.token_id,
+			"checksum": self.checksum,
+			"fields": [ field_item.to_json() for field_item in self.payload ],
+		}
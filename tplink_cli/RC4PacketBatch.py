@@ -0,0 +1,156 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import array
+import collections
+from .PacketField import PacketFields
+from .MACAddress import MACAddress
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+class RC4PacketBatch():
+	# Column types are derived from the struct format of the header
+	# definition; MAC addresses are stored as 48-bit integers.
+	_COLUMN_TYPECODES = {
+		"B":	"B",
+		"H":	"H",
+		"I":	"I",
+		"6s":	"Q",
+	}
+
+	def __init__(self, header_definition):
+		self._names = tuple(fieldname for (fieldtype, fieldname) in header_definition.fields)
+		self._columns = { fieldname: array.array(self._COLUMN_TYPECODES[fieldtype]) for (fieldtype, fieldname) in header_definition.fields }
+		self._is_mac_column = tuple((fieldtype == "6s") for (fieldtype, fieldname) in header_definition.fields)
+		self._payload_data = bytearray()
+		self._payload_offsets = array.array("Q", [ 0 ])
+		self._skipped_count = 0
+
+	@property
+	def column_names(self):
+		return self._names
+
+	@property
+	def skipped_count(self):
+		return self._skipped_count
+
+	def column(self, name: str):
+		return self._columns[name]
+
+	def append(self, header, payload: bytes):
+		for (name, is_mac, value) in zip(self._names, self._is_mac_column, header):
+			if is_mac:
+				value = int.from_bytes(value, byteorder = "big")
+			self._columns[name].append(value)
+		self._payload_data += payload
+		self._payload_offsets.append(len(self._payload_data))
+
+	def skip(self):
+		self._skipped_count += 1
+
+	def payload(self, index: int):
+		(start, end) = (self._payload_offsets[index], self._payload_offsets[index + 1])
+		# A copy, a view would keep the growing payload buffer from being
+		# resized by any later append()
+		return bytes(self._payload_data[start : end])
+
+	def payload_fields(self, index: int):
+		return PacketFields.from_raw(self.payload(index))
+
+	def mac(self, name: str, index: int):
+		return MACAddress(self._columns[name][index].to_bytes(length = 6, byteorder = "big"))
+
+	def to_numpy(self):
+		if numpy is None:
+			raise ImportError("NumPy is required to convert a packet batch to arrays, but it is not installed.", name = "numpy")
+		return { name: numpy.frombuffer(column, dtype = column.typecode) for (name, column) in self._columns.items() }
+
+	@staticmethod
+	def _column_value(value):
+		if isinstance(value, MACAddress):
+			return int.from_bytes(bytes(value), byteorder = "big")
+		return int(value)
+
+	def filter(self, **criteria):
+		# Returns the indices of all packets matching all given criteria,
+		# e.g., filter(opcode = Opcode.ResponseData, switch_mac = mac). Each
+		# criterion may be a single value or a collection of values.
+		selected = None
+		for (name, values) in criteria.items():
+			if isinstance(values, (list, tuple, set, frozenset)):
+				values = set(self._column_value(value) for value in values)
+			else:
+				values = set([ self._column_value(values) ])
+			column = self._columns[name]
+			if numpy is not None:
+				mask = numpy.isin(numpy.frombuffer(column, dtype = column.typecode), list(values))
+				selected = mask if (selected is None) else (selected & mask)
+			else:
+				mask = [ value in values for value in column ]
+				selected = mask if (selected is None) else [ a and b for (a, b) in zip(selected, mask) ]
+		if selected is None:
+			return array.array("Q", range(len(self)))
+		if numpy is not None:
+			return array.array("Q", numpy.flatnonzero(selected).astype(numpy.uint64).tobytes())
+		return array.array("Q", (index for (index, match) in enumerate(selected) if match))
+
+	def group_by(self, *names: str):
+		# Maps each distinct value (or tuple of values if multiple columns are
+		# given) to the indices of the packets that carry it.
+		groups = collections.defaultdict(lambda: array.array("Q"))
+		if len(names) == 1:
+			keys = self._columns[names[0]]
+		else:
+			keys = zip(*(self._columns[name] for name in names))
+		for (index, key) in enumerate(keys):
+			groups[key].append(index)
+		return dict(groups)
+
+	def count_by(self, *names: str):
+		if (len(names) == 1) and (numpy is not None):
+			column = self._columns[names[0]]
+			(values, counts) = numpy.unique(numpy.frombuffer(column, dtype = column.typecode), return_counts = True)
+			return { int(value): int(count) for (value, count) in zip(values, counts) }
+		if len(names) == 1:
+			return dict(collections.Counter(self._columns[names[0]]))
+		return dict(collections.Counter(zip(*(self._columns[name] for name in names))))
+
+	def select(self, indices):
+		subset = RC4PacketBatch.__new__(RC4PacketBatch)
+		subset._names = self._names
+		subset._is_mac_column = self._is_mac_column
+		subset._columns = { name: array.array(column.typecode, (column[index] for index in indices)) for (name, column) in self._columns.items() }
+		subset._payload_data = bytearray()
+		subset._payload_offsets = array.array("Q", [ 0 ])
+		subset._skipped_count = 0
+		for index in indices:
+			subset._payload_data += self.payload(index)
+			subset._payload_offsets.append(len(subset._payload_data))
+		return subset
+
+	def __len__(self):
+		return len(self._payload_offsets) - 1
+
+	def __repr__(self):
+		return f"RC4PacketBatch<{len(self)} packets, {self._skipped_count} skipped>"
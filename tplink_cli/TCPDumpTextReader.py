@@ -0,0 +1,104 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import re
+import collections
+from .CapturePrefilter import CapturePrefilter
+
+class TCPDumpTextReader():
+	# Incrementally parses the output of "tcpdump -lnX" (or -XX). A packet is
+	# emitted as soon as all bytes indicated by its IPv4 header have been
+	# read, i.e., without waiting for the next packet to arrive.
+	TCPDumpPacket = collections.namedtuple("TCPDumpPacket", [ "linktype", "timestamp", "data" ])
+	_HEXDUMP_REGEX = re.compile(r"^\s+0x(?P<offset>[0-9a-fA-F]+):\s+(?P<hexdata>[0-9a-fA-F ]+?)(\s{2,}|$)")
+	_TIMESTAMP_REGEX = re.compile(r"^((?P<epoch>\d+\.\d+)|((?P<date>\d{4}-\d{2}-\d{2}) )?(?P<hour>\d{2}):(?P<minute>\d{2}):(?P<second>\d{2}(\.\d+)?))\s")
+
+	_VLAN_ETHERTYPES = (b"\x81\x00", b"\x88\xa8")
+
+	def __init__(self, f):
+		self._f = f
+		self._linktype = None
+
+	@classmethod
+	def _parse_timestamp(cls, line: str):
+		rematch = cls._TIMESTAMP_REGEX.match(line)
+		if rematch is None:
+			return None
+		rematch = rematch.groupdict()
+		if rematch["epoch"] is not None:
+			return float(rematch["epoch"])
+		else:
+			# Time of day only
+			return (int(rematch["hour"]) * 3600) + (int(rematch["minute"]) * 60) + float(rematch["second"])
+
+	@classmethod
+	def _detect_linktype(cls, data: bytearray):
+		# "-X" dumps start at the IPv4 header, "-XX" at the Ethernet header.
+		# The Ethernet layout is checked first, a destination MAC may well
+		# start with a nibble of 4 as well.
+		if ((data[12 : 14] == b"\x08\x00") and ((data[14] >> 4) == 4)) or (data[12 : 14] in cls._VLAN_ETHERTYPES):
+			return CapturePrefilter.LINKTYPE_ETHERNET
+		elif (data[0] >> 4) == 4:
+			return CapturePrefilter.LINKTYPE_RAW
+		return CapturePrefilter.LINKTYPE_ETHERNET
+
+	def _expected_length(self, data: bytearray):
+		# The dump format does not change within a stream, it is therefore
+		# only detected once from the first packet that is long enough.
+		if len(data) < 18:
+			return None
+		if self._linktype is None:
+			self._linktype = self._detect_linktype(data)
+		if self._linktype == CapturePrefilter.LINKTYPE_RAW:
+			return int.from_bytes(data[2 : 4], byteorder = "big")
+		elif data[12 : 14] == b"\x08\x00":
+			return 14 + int.from_bytes(data[16 : 18], byteorder = "big")
+		return None
+
+	def _finish(self, timestamp: float | None, data: bytearray):
+		linktype = self._linktype if (self._linktype is not None) else CapturePrefilter.LINKTYPE_ETHERNET
+		return self.TCPDumpPacket(linktype = linktype, timestamp = timestamp, data = bytes(data))
+
+	def __iter__(self):
+		(timestamp, data, emitted) = (None, None, True)
+		for line in self._f:
+			rematch = self._HEXDUMP_REGEX.match(line)
+			if rematch is None:
+				if not line[ : 1].isspace():
+					# New packet summary line
+					if (data is not None) and (not emitted):
+						yield self._finish(timestamp, data)
+					(timestamp, data, emitted) = (self._parse_timestamp(line), bytearray(), False)
+				continue
+
+			if (data is None) or emitted:
+				continue
+			if int(rematch["offset"], 16) != len(data):
+				# Lost synchronization, discard this packet
+				emitted = True
+				continue
+			data += bytes.fromhex(rematch["hexdata"])
+			expected_length = self._expected_length(data)
+			if (expected_length is not None) and (len(data) >= expected_length):
+				emitted = True
+				yield self._finish(timestamp, data)
+		if (data is not None) and (not emitted):
+			yield self._finish(timestamp, data)
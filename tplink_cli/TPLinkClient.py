@@ -0,0 +1,210 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import random
+import asyncio
+import collections
+import dataclasses
+from .Enums import Opcode
+from .RC4Packet import RC4Packet
+from .PacketField import PacketFields
+from .MACAddress import MACAddress
+from .Exceptions import TPLinkCLIException, DeserializationException, ReceiveTimeoutException
+
+@dataclasses.dataclass(slots = True)
+class InFlightRequest():
+	future: asyncio.Future
+	timer: asyncio.TimerHandle
+	switch_mac: MACAddress
+	response_opcode: Opcode
+	on_response: "callable | None" = None
+
+class TPLinkClient():
+	# Multiplexes any number of concurrent requests over the socket of a
+	# single TPLinkInterface. Every request gets its own sequence number and
+	# responses are dispatched to the waiting request by it.
+	_BROADCAST_ADDRESS = "255.255.255.255"
+	_ANY_SWITCH = MACAddress(bytes(6))
+	_RX_BATCH_SIZE = 256
+	_RESPONSE_OPCODE = {
+		Opcode.Discovery:	Opcode.ResponseData,
+		Opcode.RequestData:	Opcode.ResponseData,
+		Opcode.SetData:		Opcode.AcknowledgeSetData,
+	}
+	Statistics = collections.namedtuple("Statistics", [ "sent", "completed", "timeouts", "unsolicited", "callback_errors", "in_flight" ])
+
+	def __init__(self, conn: "TPLinkInterface", timeout: float = 1.0, congestion_controller: "CongestionController | None" = None):
+		self._conn = conn
+		self._timeout = timeout
+		self._congestion_controller = congestion_controller
+		self._inflight = { }
+		self._next_sequence_number = random.randrange(0x10000)
+		self._loop = None
+		self._dispatcher = None
+		self._sent = 0
+		self._completed = 0
+		self._timeouts = 0
+		self._unsolicited = 0
+		self._callback_errors = 0
+
+	@property
+	def conn(self):
+		return self._conn
+
+	@property
+	def congestion_controller(self):
+		return self._congestion_controller
+
+	@property
+	def statistics(self):
+		return self.Statistics(sent = self._sent, completed = self._completed, timeouts = self._timeouts, unsolicited = self._unsolicited, callback_errors = self._callback_errors, in_flight = len(self._inflight))
+
+	async def __aenter__(self):
+		self._loop = asyncio.get_running_loop()
+		self._dispatcher = self._loop.create_task(self._dispatch())
+		return self
+
+	async def __aexit__(self, *args):
+		self._dispatcher.cancel()
+		try:
+			await self._dispatcher
+		except asyncio.CancelledError:
+			pass
+		for request in list(self._inflight.values()):
+			request.future.cancel()
+
+	def _allocate_sequence_number(self):
+		if len(self._inflight) >= 0x10000:
+			raise TPLinkCLIException("All sequence numbers are in use by requests in flight.")
+		while self._next_sequence_number in self._inflight:
+			self._next_sequence_number = (self._next_sequence_number + 1) & 0xffff
+		sequence_number = self._next_sequence_number
+		self._next_sequence_number = (self._next_sequence_number + 1) & 0xffff
+		return sequence_number
+
+	def _create_packet(self, opcode: Opcode, switch_mac: MACAddress, sequence_number: int, fields: "list[PacketField]", token_id: int):
+		payload = PacketFields()
+		payload.append_all(fields)
+		return RC4Packet(version = 1, opcode = opcode, switch_mac = switch_mac, host_mac = self._conn.host_mac, sequence_number = sequence_number, error_code = 0, length = None, fragmentation_offset = 0, flags = 0, token_id = token_id, checksum = 0, payload = payload)
+
+	def submit(self, opcode: Opcode, switch_mac: MACAddress | None = None, fields: "list[PacketField]" = (), token_id: int = 0, timeout: float | None = None, host: str | None = None, on_response: "callable | None" = None):
+		# Sends the request immediately and returns a future that resolves to
+		# the response RC4Packet or fails with ReceiveTimeoutException. When
+		# on_response is given, every response is passed to it instead (e.g.,
+		# for broadcasts that multiple switches answer) and the future
+		# resolves to None after the timeout.
+		switch_mac = switch_mac if (switch_mac is not None) else self._ANY_SWITCH
+		timeout = timeout if (timeout is not None) else self._timeout
+		sequence_number = self._allocate_sequence_number()
+		rc4_pkt = self._create_packet(opcode, switch_mac, sequence_number, fields, token_id)
+
+		future = self._loop.create_future()
+		timer = self._loop.call_at(self._loop.time() + timeout, self._expire, sequence_number)
+		request = InFlightRequest(future = future, timer = timer, switch_mac = switch_mac, response_opcode = self._RESPONSE_OPCODE[opcode], on_response = on_response)
+		self._inflight[sequence_number] = request
+		future.add_done_callback(lambda future: self._release(sequence_number, request))
+
+		self._conn.send(rc4_pkt.serialize(), host = host if (host is not None) else self._BROADCAST_ADDRESS, port = self._conn.remote_port, on_error = lambda error: self._send_failed(sequence_number, request, error))
+		self._sent += 1
+		return future
+
+	async def request(self, opcode: Opcode, switch_mac: MACAddress | None = None, fields: "list[PacketField]" = (), token_id: int = 0, timeout: float | None = None, host: str | None = None):
+		if (self._congestion_controller is None) or (switch_mac is None) or (switch_mac == self._ANY_SWITCH):
+			return await self.submit(opcode, switch_mac = switch_mac, fields = fields, token_id = token_id, timeout = timeout, host = host)
+
+		# Requests to a particular switch are paced by its congestion window
+		await self._congestion_controller.acquire(switch_mac)
+		acknowledged = None
+		try:
+			response = await self.submit(opcode, switch_mac = switch_mac, fields = fields, token_id = token_id, timeout = timeout, host = host)
+			acknowledged = (response.error_code == 0)
+			return response
+		except ReceiveTimeoutException:
+			acknowledged = False
+			raise
+		finally:
+			self._congestion_controller.release(switch_mac, acknowledged)
+
+	def complete(self, future: asyncio.Future):
+		# Ends a request that passes its responses to on_response before its
+		# timeout, e.g., when no further responses are expected. Its future
+		# resolves to None, as if the timeout had passed.
+		for request in self._inflight.values():
+			if request.future is future:
+				if request.on_response is None:
+					raise TPLinkCLIException("Only requests that pass their responses to on_response can be completed early.")
+				if not future.done():
+					future.set_result(None)
+				return
+
+	def _release(self, sequence_number: int, request: InFlightRequest):
+		# Also called when the caller cancelled the future
+		request.timer.cancel()
+		if self._inflight.get(sequence_number) is request:
+			del self._inflight[sequence_number]
+
+	def _send_failed(self, sequence_number: int, request: InFlightRequest, error: OSError):
+		if (self._inflight.get(sequence_number) is request) and (not request.future.done()):
+			request.future.set_exception(error)
+
+	def _expire(self, sequence_number: int):
+		request = self._inflight.get(sequence_number)
+		if (request is None) or request.future.done():
+			return
+		if request.on_response is not None:
+			request.future.set_result(None)
+		else:
+			self._timeouts += 1
+			request.future.set_exception(ReceiveTimeoutException(f"No response to request with sequence number {sequence_number} from switch {request.switch_mac}."))
+
+	def _route(self, rxmsg: "TPLinkProtocol.RXMsg"):
+		try:
+			header = RC4Packet.deserialize_header(rxmsg.data)
+		except DeserializationException:
+			return
+		if header.host_mac != self._conn.host_mac:
+			# Traffic of other hosts on the same network
+			return
+		request = self._inflight.get(header.sequence_number)
+		if (request is None) or (request.future.done()) or (request.response_opcode != header.opcode) or ((request.switch_mac != self._ANY_SWITCH) and (request.switch_mac != header.switch_mac)):
+			self._unsolicited += 1
+			return
+		try:
+			rc4_pkt = RC4Packet.deserialize(rxmsg.data)
+		except DeserializationException as e:
+			if request.on_response is None:
+				request.future.set_exception(e)
+			return
+		self._completed += 1
+		if request.on_response is not None:
+			# A failing callback must not end the dispatcher, which would
+			# leave all other requests waiting for their timeout
+			try:
+				request.on_response(rc4_pkt)
+			except Exception:
+				self._callback_errors += 1
+		else:
+			request.future.set_result(rc4_pkt)
+
+	async def _dispatch(self):
+		while True:
+			for rxmsg in await self._conn.recv_many(self._RX_BATCH_SIZE):
+				self._route(rxmsg)
@@ -19,28 +19,39 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
+import sys
+import time
 import asyncio
 import socket
 import fcntl
 import collections
 from .Tools import NetTools
-from .Exceptions import ReceiveTimeoutException
+from .Enums import OverflowPolicy
+from .RC4Packet import RC4Packet
+from .TPLinkObfuscation import TPLinkObfuscation
+from .BatchedSocketIO import BatchedSocketIO
+from .Exceptions import ReceiveTimeoutException, DeserializationException
 
 class TPLinkProtocol(asyncio.DatagramProtocol):
-	RXMsg = collections.namedtuple ("RXMsg", [ "data", "host", "port" ])
+	RXMsg = collections.namedtuple ("RXMsg", [ "data", "host", "port", "timestamp" ])
 	def __init__(self, tplink_interface):
 		super().__init__()
 		self._tplink_interface = tplink_interface
 
 	def datagram_received(self, data, addr):
-		msg = self.RXMsg(data = data, host = addr[0], port = addr[1])
+		msg = self.RXMsg(data = data, host = addr[0], port = addr[1], timestamp = time.time())
 		self._tplink_interface._rx_packet(msg)
 
 class TPLinkInterface():
 	_HOST_PORT = 29809
 	_SWITCH_PORT = 29808
+	_MAX_RX_BATCHES_PER_WAKEUP = 8
+	_SO_SNDBUFFORCE = 32
+	_SO_RCVBUFFORCE = 33
+	RXStatistics = collections.namedtuple("RXStatistics", [ "enqueued", "dropped", "high_water", "queued" ])
+	SocketStatistics = collections.namedtuple("SocketStatistics", [ "rx_buffer_size", "tx_buffer_size", "kernel_dropped", "tx_errors" ])
 
-	def __init__(self, interface = None, act_as_host = True):
+	def __init__(self, interface = None, act_as_host = True, rx_queue_size: int = 4096, overflow_policy: OverflowPolicy = OverflowPolicy.DropOldest, batched_io: bool | None = None, batched_tx: bool = False, rx_buffer_size: int | None = None, tx_buffer_size: int | None = None):
 		self._interface = interface
 		if self._interface is None:
 			self._interface = NetTools.get_default_gateway_interface()
@@ -49,7 +60,33 @@ class TPLinkInterface():
 		self._host_ip = NetTools.get_primary_ipv4_address(self._interface)
 		self._txsocket = None
 		self._rxsocket = None
-		self._rx_queue = asyncio.Queue()
+		self._loop = None
+		self._endpoint_transport = None
+		# Receiving through recvmmsg is used by default where it is available,
+		# otherwise the portable asyncio datagram endpoint. Sending through
+		# sendmmsg is opt-in: it defers errors and is not faster per
+		# datagram unless syscalls dominate.
+		self._batched_io = BatchedSocketIO.available() if (batched_io is None) else batched_io
+		self._batched_tx = batched_tx and BatchedSocketIO.available()
+		self._tx_errors = 0
+		self._rx_batch_io = None
+		self._tx_batch_io = None
+		self._tx_pending = [ ]
+		self._rx_buffer_size = rx_buffer_size
+		self._tx_buffer_size = tx_buffer_size
+		self._rxq_overflow_enabled = False
+		# Datagrams are appended directly from the protocol callback, which
+		# runs on the event loop thread; a waiting receiver is woken through
+		# a single future instead of scheduling a coroutine per datagram.
+		self._rx_queue = collections.deque()
+		self._rx_queue_size = rx_queue_size
+		self._overflow_policy = overflow_policy
+		self._rx_waiter = None
+		self._rx_paused = False
+		self._rx_enqueued = 0
+		self._rx_dropped = 0
+		self._rx_high_water = 0
+		self._reassembler = RC4Packet.reassembler()
 
 	@property
 	def interface(self):
@@ -63,6 +100,24 @@ class TPLinkInterface():
 	def host_ip(self):
 		return self._host_ip
 
+	@property
+	def rx_statistics(self):
+		return self.RXStatistics(enqueued = self._rx_enqueued, dropped = self._rx_dropped, high_water = self._rx_high_water, queued = len(self._rx_queue))
+
+	@property
+	def socket_statistics(self):
+		# Kernel drops are None when they cannot be determined, which is the
+		# case without SO_RXQ_OVFL or on the portable receive path
+		kernel_dropped = self._rx_batch_io.rxq_overflow if (self._rxq_overflow_enabled and (self._rx_batch_io is not None)) else None
+		return self.SocketStatistics(rx_buffer_size = self._rxsocket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF), tx_buffer_size = self._txsocket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF), kernel_dropped = kernel_dropped, tx_errors = self._tx_errors)
+
+	def report_statistics(self, file = None):
+		rx_stats = self.rx_statistics
+		socket_stats = self.socket_statistics
+		kernel_dropped = "an unknown number of" if (socket_stats.kernel_dropped is None) else socket_stats.kernel_dropped
+		print(f"{self._interface}: {rx_stats.enqueued} datagrams received, {rx_stats.queued} queued (high water mark {rx_stats.high_water}), {rx_stats.dropped} dropped from the receive queue", file = file)
+		print(f"{self._interface}: {kernel_dropped} datagrams dropped by the kernel, socket receive buffer {socket_stats.rx_buffer_size} bytes, send buffer {socket_stats.tx_buffer_size} bytes, {socket_stats.tx_errors} send errors", file = file)
+
 	@property
 	def local_port(self):
 		if self._act_as_host:
@@ -70,35 +125,217 @@ class TPLinkInterface():
 		else:
 			return self._SWITCH_PORT
 
+	@property
+	def remote_port(self):
+		if self._act_as_host:
+			return self._SWITCH_PORT
+		else:
+			return self._HOST_PORT
+
+	@property
+	def batched_io(self):
+		return self._batched_io
+
+	@property
+	def batched_tx(self):
+		return self._batched_tx
+
 	async def __aenter__(self, *args):
-		loop = asyncio.get_event_loop()
-		(self._endpoint_transport, self._endpoint_protocol) = await loop.create_datagram_endpoint(lambda: TPLinkProtocol(self), sock = self._create_udp_socket("0.0.0.0", self.local_port))
-		self._txsocket = self._create_udp_socket(self._host_ip, self.local_port)
+		self._loop = asyncio.get_running_loop()
+		rxsocket = self._create_udp_socket("0.0.0.0", self.local_port, rx_buffer_size = self._rx_buffer_size, tx_buffer_size = self._tx_buffer_size)
+		self._rxsocket = rxsocket
+		if self._batched_io:
+			self._rxq_overflow_enabled = self._enable_socket_option(rxsocket, BatchedSocketIO.SO_RXQ_OVFL)
+			self._enable_socket_option(rxsocket, BatchedSocketIO.SO_TIMESTAMPNS)
+			rxsocket.setblocking(False)
+			self._rx_batch_io = BatchedSocketIO(rxsocket)
+			self._loop.add_reader(rxsocket.fileno(), self._rx_ready)
+		else:
+			(self._endpoint_transport, self._endpoint_protocol) = await self._loop.create_datagram_endpoint(lambda: TPLinkProtocol(self), sock = rxsocket)
+		self._txsocket = self._create_udp_socket(self._host_ip, self.local_port, rx_buffer_size = self._rx_buffer_size, tx_buffer_size = self._tx_buffer_size)
+		if self._batched_tx:
+			self._tx_batch_io = BatchedSocketIO(self._txsocket)
 		return self
 
 	async def __aexit__(self, *args):
-		self._endpoint_transport.close()
+		if self._tx_batch_io is not None:
+			self._flush_tx()
+		if self._batched_io:
+			if not self._rx_paused:
+				self._loop.remove_reader(self._rxsocket.fileno())
+			self._rxsocket.close()
+		else:
+			self._endpoint_transport.close()
 		self._txsocket.close()
 
+	def _rx_ready(self):
+		# Drain the socket in batches, but return to the event loop after a
+		# bounded number of them
+		for _ in range(self._MAX_RX_BATCHES_PER_WAKEUP):
+			max_count = self._rx_batch_io.batch_size
+			if self._overflow_policy == OverflowPolicy.Backpressure:
+				# Never take more datagrams off the socket than the queue can
+				# hold, the rest stays in the socket buffer
+				max_count = min(max_count, self._rx_queue_size - len(self._rx_queue))
+				if max_count <= 0:
+					break
+			datagrams = self._rx_batch_io.recv_many(max_count)
+			now = time.time()
+			for (data, (host, port), timestamp) in datagrams:
+				self._rx_packet(TPLinkProtocol.RXMsg(data = data, host = host, port = port, timestamp = timestamp if (timestamp is not None) else now))
+			if (len(datagrams) < max_count) or self._rx_paused:
+				break
+
+	def _pause_reading(self):
+		if self._batched_io:
+			self._loop.remove_reader(self._rxsocket.fileno())
+		else:
+			self._endpoint_transport.pause_reading()
+
+	def _resume_reading(self):
+		if self._batched_io:
+			self._loop.add_reader(self._rxsocket.fileno(), self._rx_ready)
+		else:
+			self._endpoint_transport.resume_reading()
+
+	def _reassemble(self, rxmsg: TPLinkProtocol.RXMsg):
+		# Complete messages are passed on as they are, invalid ones as well so
+		# that consumers can report them.
+		try:
+			header = RC4Packet.deserialize_header(rxmsg.data, allow_fragment = True)
+		except DeserializationException:
+			return rxmsg
+		if not RC4Packet.is_fragment(header, len(rxmsg.data)):
+			return rxmsg
+		plaintext = self._reassembler.add(TPLinkObfuscation.deobfuscate(rxmsg.data), time.monotonic())
+		if plaintext is None:
+			return None
+		TPLinkObfuscation.obfuscate_into(plaintext)
+		return rxmsg._replace(data = bytes(plaintext))
+
 	def _rx_packet(self, rxmsg: TPLinkProtocol.RXMsg):
-		asyncio.run_coroutine_threadsafe(self._rx_queue.put(rxmsg), asyncio.get_event_loop())
+		rxmsg = self._reassemble(rxmsg)
+		if rxmsg is None:
+			return
+		if len(self._rx_queue) >= self._rx_queue_size:
+			if self._overflow_policy == OverflowPolicy.DropNewest:
+				self._rx_dropped += 1
+				return
+			elif self._overflow_policy == OverflowPolicy.DropOldest:
+				self._rx_queue.popleft()
+				self._rx_dropped += 1
+		self._rx_queue.append(rxmsg)
+		self._rx_enqueued += 1
+		self._rx_high_water = max(self._rx_high_water, len(self._rx_queue))
+		if (self._overflow_policy == OverflowPolicy.Backpressure) and (len(self._rx_queue) >= self._rx_queue_size) and (not self._rx_paused):
+			# Leave excess datagrams in the socket buffer until the queue drained
+			self._pause_reading()
+			self._rx_paused = True
+		if self._rx_waiter is not None:
+			if not self._rx_waiter.done():
+				self._rx_waiter.set_result(None)
+			self._rx_waiter = None
+
+	def _rx_dequeue(self, max_count: int = 1):
+		rxmsgs = [ self._rx_queue.popleft() for _ in range(min(max_count, len(self._rx_queue))) ]
+		if self._rx_paused and (len(self._rx_queue) <= self._rx_queue_size // 2):
+			self._resume_reading()
+			self._rx_paused = False
+		return rxmsgs
+
+	async def _wait_rx(self, timeout: float | None):
+		if len(self._rx_queue) > 0:
+			return True
+		if self._rx_waiter is None:
+			self._rx_waiter = asyncio.get_running_loop().create_future()
+		try:
+			# Shielded so that a timeout of one receiver does not cancel the
+			# waiter shared with others
+			await asyncio.wait_for(asyncio.shield(self._rx_waiter), timeout = timeout)
+		except TimeoutError:
+			return False
+		return len(self._rx_queue) > 0
 
 	async def recvdata(self, timeout: float | None = None):
-		if timeout is not None:
-			try:
-				return await asyncio.wait_for(self._rx_queue.get(), timeout = timeout)
-			except TimeoutError:
+		while True:
+			if not await self._wait_rx(timeout):
 				return None
-		else:
-			return await self._rx_queue.get()
+			rxmsgs = self._rx_dequeue()
+			if len(rxmsgs) > 0:
+				return rxmsgs[0]
+
+	async def recv_many(self, max_count: int, timeout: float | None = None):
+		while True:
+			if not await self._wait_rx(timeout):
+				return [ ]
+			rxmsgs = self._rx_dequeue(max_count)
+			if len(rxmsgs) > 0:
+				return rxmsgs
+
+	def send(self, data: bytes, host: str, port: int, on_error: "callable | None" = None):
+		# When on_error is given, a failure to send is passed to it instead of
+		# being raised. With batched sending, errors are only known once the
+		# batch is flushed; without on_error they are then only counted.
+		if self._tx_batch_io is None:
+			try:
+				self._txsocket.sendto(data, (host, port))
+			except OSError as e:
+				self._tx_errors += 1
+				if on_error is None:
+					raise
+				on_error(e)
+			return
+		# Datagrams sent during one iteration of the event loop are passed to
+		# the kernel together, at the latest once a full batch is pending
+		if len(self._tx_pending) == 0:
+			self._loop.call_soon(self._flush_tx)
+		self._tx_pending.append((data, (host, port), on_error))
+		if len(self._tx_pending) >= self._tx_batch_io.batch_size:
+			self._flush_tx()
 
-	def send(self, data: bytes, host: str, port: int):
-		self._txsocket.sendto(data, (host, port))
+	def _flush_tx(self):
+		(pending, self._tx_pending) = (self._tx_pending, [ ])
+		if len(pending) == 0:
+			return
+		errors = self._tx_batch_io.send_many([ (data, addr) for (data, addr, on_error) in pending ])
+		self._tx_errors += len(errors)
+		for (index, error) in errors:
+			on_error = pending[index][2]
+			if on_error is not None:
+				on_error(error)
 
 	@staticmethod
-	def _create_udp_socket(ip_address, port):
+	def _enable_socket_option(sock: socket.socket, option: int):
+		# Makes the kernel report its drop counter or the receive timestamp
+		# along with received datagrams (Linux only)
+		if not sys.platform.startswith("linux"):
+			return False
+		try:
+			sock.setsockopt(socket.SOL_SOCKET, option, 1)
+		except OSError:
+			return False
+		return True
+
+	@classmethod
+	def _set_buffer_size(cls, sock: socket.socket, option: int, force_option: int, size: int):
+		# The *BUFFORCE variants may exceed net.core.[rw]mem_max but require
+		# CAP_NET_ADMIN; otherwise the kernel silently caps the size
+		if sys.platform.startswith("linux"):
+			try:
+				sock.setsockopt(socket.SOL_SOCKET, force_option, size)
+				return
+			except PermissionError:
+				pass
+		sock.setsockopt(socket.SOL_SOCKET, option, size)
+
+	@classmethod
+	def _create_udp_socket(cls, ip_address, port, rx_buffer_size: int | None = None, tx_buffer_size: int | None = None):
 		sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 		sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 		sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+		if rx_buffer_size is not None:
+			cls._set_buffer_size(sock, socket.SO_RCVBUF, cls._SO_RCVBUFFORCE, rx_buffer_size)
+		if tx_buffer_size is not None:
+			cls._set_buffer_size(sock, socket.SO_SNDBUF, cls._SO_SNDBUFFORCE, tx_buffer_size)
 		sock.bind((ip_address, port))
 		return sock
@@ -26,10 +26,33 @@ class TPLinkObfuscation(object):
 	# very long key for very very very good security. Impossible to crack.
 	_KEY = b"Ei2HNryt8ysSdRRI54XNQHBEbOIRqNjQgYxsTmuW3srSVRVFyLh8mwvhBLPFQph3ecDMLnDtjDUdrUwt7oTsJuYl72hXESNiD6jFIQCtQN1unsmn3JXjeYwGJ55pqTkVyN2OOm3vekF6G1LM4t3kiiG4lGwbxG4CG1s5Sli7gcINFBOLXQnPpsQNWDmPbOm74mE7eyR3L7tk8tUhI17FLKm11hrrd1ck74bMw3VYSK3X5RrDgXelewMU6o1tJ3iX"
 
+	# Every datagram is encrypted with a freshly keyed RC4 instance, i.e., the
+	# keystream is identical for all packets. Compute it once for the largest
+	# possible message (the length field is 16 bit wide; reassembled messages
+	# may exceed the maximum UDP payload) and XOR against a prefix of it.
+	_MAX_MESSAGE_SIZE = 65535
+	_KEYSTREAM = None
+
+	@classmethod
+	def _get_keystream(cls):
+		if cls._KEYSTREAM is None:
+			cls._KEYSTREAM = RC4(cls._KEY).next_bytes(cls._MAX_MESSAGE_SIZE)
+		return cls._KEYSTREAM
+
 	@classmethod
 	def obfuscate(cls, data):
-		rc4 = RC4(cls._KEY)
-		return rc4.crypt(data)
+		keystream = cls._get_keystream()
+		length = len(data)
+		if length > len(keystream):
+			raise ValueError(f"Cannot obfuscate {length} bytes of data, maximum message size is {len(keystream)} bytes.")
+		return RC4.xor(data, keystream)
+
+	@classmethod
+	def obfuscate_into(cls, buffer):
+		keystream = cls._get_keystream()
+		if len(buffer) > len(keystream):
+			raise ValueError(f"Cannot obfuscate {len(buffer)} bytes of data, maximum message size is {len(keystream)} bytes.")
+		RC4.xor_into(buffer, keystream)
 
 	@classmethod
 	def deobfuscate(cls, data):
@@ -20,11 +20,13 @@
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
 import ipaddress
+import collections
 import dataclasses
 from .Enums import FieldTag
 from .MACAddress import MACAddress
+from .Exceptions import DeserializationException
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots = True)
 class TPLinkRawData():
 	value: bytes = bytes()
 
@@ -32,6 +34,10 @@ class TPLinkRawData():
 	def deserialize(cls, payload):
 		return cls(value = payload)
 
+	@classmethod
+	def parse(cls, text: str):
+		return cls(value = bytes.fromhex(text))
+
 	def __bytes__(self):
 		return self.value
 
@@ -41,7 +47,10 @@ class TPLinkRawData():
 		else:
 			return f"TPLinkRawData<{len(self.value)}: {self.value.hex()}>"
 
-@dataclasses.dataclass
+	def json_value(self):
+		return self.value.hex()
+
+@dataclasses.dataclass(slots = True)
 class TPLinkString():
 	value: str = ""
 
@@ -49,28 +58,44 @@ class TPLinkString():
 	def deserialize(cls, payload):
 		return cls(value = payload.decode("ascii").rstrip("\x00"))
 
+	@classmethod
+	def parse(cls, text: str):
+		if not text.isascii():
+			raise ValueError(f"String value must only contain ASCII characters: {text}")
+		return cls(value = text)
+
 	def __bytes__(self):
 		if len(self.value) == 0:
 			return bytes()
 		else:
 			return self.value.encode("ascii") + bytes(1)
 
-@dataclasses.dataclass
+	def json_value(self):
+		return self.value
+
+@dataclasses.dataclass(slots = True)
 class TPLinkInt():
 	value: int = 0
+	width: int = dataclasses.field(default = 1, repr = False)
 
 	@classmethod
 	def deserialize(cls, payload):
-		TODO
-		print(payload)
-		return cls(value = int.from_bytes(payload, byteorder = "big"))
+		return cls(value = int.from_bytes(payload, byteorder = "big"), width = len(payload))
+
+	@classmethod
+	def parse(cls, text: str, width: int = 1):
+		value = int(text, 0)
+		if not (0 <= value < (1 << (8 * width))):
+			raise ValueError(f"Integer value {value} is out of range for a {width} byte field, must be between 0 and {(1 << (8 * width)) - 1}.")
+		return cls(value = value, width = width)
 
 	def __bytes__(self):
-		TODO
-		return self.value.encode("ascii") + "\x00"
+		return self.value.to_bytes(byteorder = "big", length = self.width)
 
+	def json_value(self):
+		return self.value
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots = True)
 class TPLinkBigint():
 	value: int = 0
 
@@ -78,6 +103,13 @@ class TPLinkBigint():
 	def deserialize(cls, payload):
 		return cls(value = int.from_bytes(payload[2 :], byteorder = "little"))
 
+	@classmethod
+	def parse(cls, text: str):
+		value = int(text, 0)
+		if value < 0:
+			raise ValueError(f"Big integer value must not be negative: {text}")
+		return cls(value = value)
+
 	def __bytes__(self):
 		# Stored as short limbs with a redundant prefix indicating the limb
 		# count
@@ -85,8 +117,11 @@ class TPLinkBigint():
 		byte_count = limb_count * 2
 		return limb_count.to_bytes(byteorder = "big", length = 2) + self.value.to_bytes(byteorder = "little", length = byte_count)
 
+	def json_value(self):
+		return self.value
+
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots = True)
 class TPLinkBool():
 	value: bool = False
 
@@ -94,21 +129,43 @@ class TPLinkBool():
 	def deserialize(cls, payload):
 		return cls(value = (len(payload) > 0) and (payload[0] != 0))
 
+	@classmethod
+	def parse(cls, text: str):
+		value = text.lower()
+		if value in ("1", "on", "true", "yes"):
+			return cls(value = True)
+		elif value in ("0", "off", "false", "no"):
+			return cls(value = False)
+		else:
+			raise ValueError(f"Not a valid boolean value: {text}")
+
 	def __bytes__(self):
 		return bytes([ int(self.value) ])
 
-@dataclasses.dataclass
+	def json_value(self):
+		return self.value
+
+@dataclasses.dataclass(slots = True)
 class TPLinkMAC():
 	value: MACAddress = MACAddress(bytes(6))
 
 	@classmethod
 	def deserialize(cls, payload):
+		if len(payload) != 6:
+			raise DeserializationException(f"MAC address must be 6 bytes long, but is {len(payload)} bytes.")
 		return cls(value = MACAddress(payload))
 
+	@classmethod
+	def parse(cls, text: str):
+		return cls(value = MACAddress.parse(text))
+
 	def __bytes__(self):
 		return bytes(self.value)
 
-@dataclasses.dataclass
+	def json_value(self):
+		return str(self.value)
+
+@dataclasses.dataclass(slots = True)
 class TPLinkPVIDSetting():
 	port: int = 0
 	pvid: int = 0
@@ -120,10 +177,22 @@ class TPLinkPVIDSetting():
 			return cls()
 		return cls(port = payload[0], pvid = int.from_bytes(payload[1 : 4], byteorder = "big"))
 
+	@classmethod
+	def parse(cls, text: str):
+		if ":" not in text:
+			raise ValueError(f"PVID setting must be given as 'port:pvid': {text}")
+		(port, pvid) = (int(value) for value in text.split(":", maxsplit = 1))
+		if not (0 <= port <= 0xff) or not (0 <= pvid <= 0xffffff):
+			raise ValueError(f"PVID setting out of range: {text}")
+		return cls(port = port, pvid = pvid)
+
 	def __bytes__(self):
 		return self.port.to_bytes(byteorder = "big", length = 1) + self.pvid.to_bytes(byteorder = "big", length = 3)
 
-@dataclasses.dataclass
+	def json_value(self):
+		return { "port": self.port, "pvid": self.pvid }
+
+@dataclasses.dataclass(slots = True)
 class TPLinkIPv4():
 	value: ipaddress.IPv4Address
 
@@ -131,47 +200,60 @@ class TPLinkIPv4():
 	def deserialize(cls, payload):
 		return cls(value = ipaddress.IPv4Address(payload))
 
+	@classmethod
+	def parse(cls, text: str):
+		return cls(value = ipaddress.IPv4Address(text))
+
 	def __bytes__(self):
 		return self.value.packed
 
+	def json_value(self):
+		return str(self.value)
+
+class TPLinkCodecRegistry():
+	Codec = collections.namedtuple("Codec", [ "handler_class", "decode" ])
+
+	def __init__(self, default_handler_class):
+		self._default_codec = self.Codec(handler_class = default_handler_class, decode = default_handler_class.deserialize)
+		self._codecs = { }
+
+	def register(self, handler_class, *tags: "FieldTag | int"):
+		codec = self.Codec(handler_class = handler_class, decode = handler_class.deserialize)
+		for tag in tags:
+			self._codecs[int(tag)] = codec
+
+	def lookup(self, tag: "FieldTag | int"):
+		return self._codecs.get(tag, self._default_codec)
+
+	def decode(self, tag: "FieldTag | int", payload: bytes):
+		codec = self._codecs.get(tag, self._default_codec)
+		try:
+			return codec.decode(payload)
+		except ValueError as e:
+			# Includes malformed addresses and undecodable strings
+			raise DeserializationException(f"Cannot decode value of field {tag} as {codec.handler_class.__name__}: {e}") from e
+
+codec_registry = TPLinkCodecRegistry(default_handler_class = TPLinkRawData)
+codec_registry.register(TPLinkString, FieldTag.LoginUsername, FieldTag.LoginPassword, FieldTag.LoginOldPassword, FieldTag.LoginNewPassword, FieldTag.SwitchName, FieldTag.DeviceDescription, FieldTag.FirmwareVersion, FieldTag.HardwareVersion)
+codec_registry.register(TPLinkInt, FieldTag.PortCount, FieldTag.PortBasedVLANPortCount, FieldTag.VLAN802_1Q_PortCount)
+codec_registry.register(TPLinkBool, FieldTag.DeviceSupportsEncryption, FieldTag.DHCP, FieldTag.PortBasedVLANStatus, FieldTag.VLAN802_1Q_Status, FieldTag.LoopPrevention, FieldTag.IGMPSnoopingStatus, FieldTag.IGMPSnooping_ReportMessageSuppression)
+codec_registry.register(TPLinkMAC, FieldTag.MAC)
+codec_registry.register(TPLinkIPv4, FieldTag.IPAddress, FieldTag.SubnetMask, FieldTag.GatewayIPAddress)
+codec_registry.register(TPLinkPVIDSetting, FieldTag.VLAN802_1Q_PVID_Setting)
+codec_registry.register(TPLinkBigint, FieldTag.SwitchToRSAEncryption)
+#codec_registry.register(TPLinkPortSetting, FieldTag.PortSetting)
+#codec_registry.register(TPLinkPortStatistics, FieldTag.MonitoringPortStatus)
+#codec_registry.register(TPLinkMirroringConfig, FieldTag.PortMirroringConfig)
+#codec_registry.register(TPLinkLagConfig, FieldTag.LAGConfiguration)
+#codec_registry.register(TPLinkPortBasedVLANConfig, FieldTag.PortBasedVLANConfig)
+#codec_registry.register(TPLink802_1Q_VLANConfig, FieldTag.VLAN802_1Q_Config)
+#codec_registry.register(TPLinkMTUVLANSetting, FieldTag.MTUVLANSetting)
+#codec_registry.register(TPLinkQoSPriorityType, FieldTag.QoSConfigurationType)
+#codec_registry.register(TPLinkQoSPriority, FieldTag.QoSConfigurationPortBased)
+#codec_registry.register(TPLinkBandwidthControlSetting, FieldTag.BandwidthControlIngress, FieldTag.BandwidthControlEgress)
+#codec_registry.register(TPLinkStormControl, FieldTag.StormControl)
+#codec_registry.register(TPLinkCableTest, FieldTag.CableTest)
+#codec_registry.register(TPLinkMulticastIPTable, FieldTag.MulticastIPTable)
+
 def get_handler_class(tag):
-	return {
-		FieldTag.LoginUsername:								TPLinkString,
-		FieldTag.LoginPassword:								TPLinkString,
-		FieldTag.LoginOldPassword:							TPLinkString,
-		FieldTag.LoginNewPassword:							TPLinkString,
-		FieldTag.SwitchName:								TPLinkString,
-		FieldTag.DeviceDescription:							TPLinkString,
-		FieldTag.FirmwareVersion:							TPLinkString,
-		FieldTag.HardwareVersion:							TPLinkString,
-		FieldTag.PortCount:									TPLinkInt,
-		FieldTag.DeviceSupportsEncryption:					TPLinkBool,
-		FieldTag.MAC:										TPLinkMAC,
-		FieldTag.DHCP:										TPLinkBool,
-		FieldTag.IPAddress:									TPLinkIPv4,
-		FieldTag.SubnetMask:								TPLinkIPv4,
-		FieldTag.GatewayIPAddress:							TPLinkIPv4,
-#		FieldTag.PortSetting:								TPLinkPortSetting,
-#		FieldTag.MonitoringPortStatus:						TPLinkPortStatistics,
-#		FieldTag.PortMirroringConfig:						TPLinkMirroringConfig,
-#		FieldTag.LAGConfiguration:							TPLinkLagConfig,
-		FieldTag.PortBasedVLANStatus:						TPLinkBool,
-#		FieldTag.PortBasedVLANConfig:						TPLinkPortBasedVLANConfig,
-		FieldTag.PortBasedVLANPortCount:					TPLinkInt,
-		FieldTag.VLAN802_1Q_Status:							TPLinkBool,
-#		FieldTag.VLAN802_1Q_Config:							TPLink802_1Q_VLANConfig,
-		FieldTag.VLAN802_1Q_PortCount:						TPLinkInt,
-		FieldTag.VLAN802_1Q_PVID_Setting:					TPLinkPVIDSetting,
-#		FieldTag.MTUVLANSetting:							TPLinkMTUVLANSetting,
-#		FieldTag.QoSConfigurationType:						TPLinkQoSPriorityType,
-#		FieldTag.QoSConfigurationPortBased:					TPLinkQoSPriority,
-#		FieldTag.BandwidthControlIngress:					TPLinkBandwidthControlSetting,
-#		FieldTag.BandwidthControlEgress:					TPLinkBandwidthControlSetting,
-#		FieldTag.StormControl:								TPLinkStormControl,
-#		FieldTag.CableTest:									TPLinkCableTest,
-		FieldTag.LoopPrevention:							TPLinkBool,
-		FieldTag.IGMPSnoopingStatus:						TPLinkBool,
-		FieldTag.IGMPSnooping_ReportMessageSuppression:		TPLinkBool,
-#		FieldTag.MulticastIPTable:							TPLinkMulticastIPTable,
-		FieldTag.SwitchToRSAEncryption:						TPLinkBigint,
-	}.get(tag, TPLinkRawData)
+	return codec_registry.lookup(tag).handler_class
@@ -24,37 +24,87 @@ def main():
 	import sys
 
 	from .MultiCommand import MultiCommand
+	from .Enums import Opcode, OverflowPolicy
+	from .MACAddress import MACAddress
+	from .PacketFilter import PacketFilter
+	from .PacketWriter import PacketWriter
 	from .actions.ActionReadPCAPNG import ActionReadPCAPNG
 	from .actions.ActionListen import ActionListen
 	from .actions.ActionSimulate import ActionSimulate
+	from .actions.ActionTCPDump import ActionTCPDump
+	from .actions.ActionIndex import ActionIndex
+	from .actions.ActionIdentify import ActionIdentify
+	from .actions.ActionApply import ActionApply
 
 	mc = MultiCommand(description = "Interact with TP-LINK switches on a command line basis.", run_method = True)
 
 	def genparser(parser):
 		parser.add_argument("-i", "--interface", metavar = "ifname", help = "Specify the network interface that switches should be looked for. If not given, default to interface that points towards the default gateway.")
+		parser.add_argument("--opcode", metavar = "name", choices = [ opcode.name for opcode in Opcode ], action = "append", help = "Only show packets with the given opcode. Can be given multiple times. Possible options are %(choices)s.")
+		parser.add_argument("--switch-mac", metavar = "mac", type = MACAddress.parse, action = "append", help = "Only show packets that are sent from or to the given switch MAC address. Can be given multiple times.")
+		parser.add_argument("--format", choices = PacketWriter.formats(), default = "text", help = "Output format of decoded packets. 'binary' writes a stream of length-prefixed plaintext packets that can be read back by the pcapng command. Can be one of %(choices)s, defaults to %(default)s.")
+		parser.add_argument("--rx-queue-size", metavar = "count", type = int, default = 4096, help = "Maximum number of received datagrams that are queued for decoding. Defaults to %(default)d.")
+		parser.add_argument("--overflow-policy", choices = [ policy.value for policy in OverflowPolicy ], default = OverflowPolicy.DropOldest.value, help = "What to do when the receive queue is full. Can be one of %(choices)s, defaults to %(default)s.")
+		parser.add_argument("--rx-buffer-size", metavar = "bytes", type = int, help = "Size of the kernel receive buffer of the UDP sockets. Sizes above net.core.rmem_max require CAP_NET_ADMIN. Defaults to the system default.")
+		parser.add_argument("--tx-buffer-size", metavar = "bytes", type = int, help = "Size of the kernel send buffer of the UDP sockets. Sizes above net.core.wmem_max require CAP_NET_ADMIN. Defaults to the system default.")
+		parser.add_argument("--correlate", action = "store_true", help = "Match requests to their responses and print per-switch latency, timeout, retransmission and error code statistics at the end. Use '--format none' to only show these statistics.")
+		parser.add_argument("--correlation-timeout", metavar = "secs", type = float, default = 1.0, help = "Time after which an unanswered request is counted as timed out when correlating. Defaults to %(default).1f sec.")
 		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
 	mc.register("listen", "Listen for TP-LINK traffic on a particular interface", genparser, action = ActionListen)
 
 	def genparser(parser):
 		parser.add_argument("--validate-serialization", action = "store_true", help = "Re-serialize all deserialized packets and ensure that the result is the same as the original.")
+		parser.add_argument("-j", "--jobs", metavar = "count", type = int, default = 1, help = "Decode the capture in parallel using this number of worker processes. Defaults to %(default)d.")
+		parser.add_argument("-f", "--follow", action = "store_true", help = "Keep reading a PCAPNG file that is still being written to and decode new packets as soon as they are appended. Only supported for serial decoding.")
+		parser.add_argument("--unordered", action = "store_true", help = "When decoding in parallel, output the packets of each chunk as soon as it is finished instead of in capture order.")
+		parser.add_argument("--opcode", metavar = "name", choices = [ opcode.name for opcode in Opcode ], action = "append", help = "Only show packets with the given opcode. Can be given multiple times. Possible options are %(choices)s.")
+		parser.add_argument("--switch-mac", metavar = "mac", type = MACAddress.parse, action = "append", help = "Only show packets that are sent from or to the given switch MAC address. Can be given multiple times.")
+		parser.add_argument("--format", choices = PacketWriter.formats(), default = "text", help = "Output format of decoded packets. 'binary' writes a stream of length-prefixed plaintext packets that can be read back by this command. Can be one of %(choices)s, defaults to %(default)s.")
+		parser.add_argument("--correlate", action = "store_true", help = "Match requests to their responses and print per-switch latency, timeout, retransmission and error code statistics at the end. Implies serial decoding. Use '--format none' to only show these statistics.")
+		parser.add_argument("--correlation-timeout", metavar = "secs", type = float, default = 1.0, help = "Time after which an unanswered request is counted as timed out when correlating. Defaults to %(default).1f sec.")
+		parser.add_argument("--time-range", metavar = "start,end", type = PacketFilter.parse_time_range, help = "Only show packets that were captured within the given time range. Start and end are given either as UNIX timestamps or in ISO 8601 format, either of them may be omitted for an open interval.")
 		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
-		parser.add_argument("filename", help = "PCAPNG file to read")
-	mc.register("pcapng", "Read a PCAPNG file and show its decoded contents", genparser, action = ActionReadPCAPNG, aliases = [ "read" ])
+		parser.add_argument("filename", help = "PCAPNG, classic PCAP or binary packet record file to read. Classic PCAP files and binary packet records can also be read from stdin by specifying '-'. When filters are given and an up-to-date index created by the 'index' command exists, it is used to only read matching packets.")
+	mc.register("pcapng", "Read a PCAPNG or PCAP file and show its decoded contents", genparser, action = ActionReadPCAPNG, aliases = [ "read" ])
+
+	def genparser(parser):
+		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
+		parser.add_argument("filename", help = "PCAPNG file to index")
+	mc.register("index", "Create a sidecar index of all TP-LINK packets in a PCAPNG file to speed up filtering with the pcapng command", genparser, action = ActionIndex)
 
 	def genparser(parser):
 		parser.add_argument("-i", "--interface", metavar = "ifname", help = "Specify the network interface that switches should be looked for. If not given, default to interface that points towards the default gateway.")
+		parser.add_argument("-n", "--count", metavar = "devices", type = int, default = 1, help = "Number of switches that are simulated. Each one responds to discovery requests with its own MAC and IP address. Defaults to %(default)d.")
 		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
 	mc.register("simulate", "Simulate a switch for the official software", genparser, action = ActionSimulate)
 
-#	def genparser(parser):
-#		parser.add_argument("--verbose", action = "store_true", help = "Increase logging verbosity.")
-#	mc.register("tcpdump", "Decode traffic that has been generated by tcpdump", genparser, action = ActionTCPDump)
+	def genparser(parser):
+		parser.add_argument("--validate-serialization", action = "store_true", help = "Re-serialize all deserialized packets and ensure that the result is the same as the original.")
+		parser.add_argument("--opcode", metavar = "name", choices = [ opcode.name for opcode in Opcode ], action = "append", help = "Only show packets with the given opcode. Can be given multiple times. Possible options are %(choices)s.")
+		parser.add_argument("--switch-mac", metavar = "mac", type = MACAddress.parse, action = "append", help = "Only show packets that are sent from or to the given switch MAC address. Can be given multiple times.")
+		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
+	mc.register("tcpdump", "Decode traffic from the hexdump output of 'tcpdump -lnX' that is read from stdin", genparser, action = ActionTCPDump)
 
-#	def genparser(parser):
-#		parser.add_argument("-i", "--interface", metavar = "ifname", required = True, help = "Specify the network interface that switches should be looked for. Mandatory argument.")
-#		parser.add_argument("-t", "--timeout", metavar = "secs", type = float, default = "1.0", help = "Default timeout that is waited for switches to respond. Defaults to %(default)s sec.")
-#		parser.add_argument("--verbose", action = "store_true", help = "Increase logging verbosity.")
-#	mc.register("identify", "Identify all switches on the network", genparser, action = ActionIdentify)
+	def genparser(parser):
+		parser.add_argument("-i", "--interface", metavar = "ifname", action = "append", help = "Specify the network interface that switches should be looked for. Can be given multiple times to scan several interfaces concurrently. If not given, default to interface that points towards the default gateway.")
+		parser.add_argument("-t", "--timeout", metavar = "secs", type = float, default = "1.0", help = "Maximum time that is waited for switches to respond. The scan ends earlier once responses stop arriving. Defaults to %(default)s sec.")
+		parser.add_argument("--rx-buffer-size", metavar = "bytes", type = int, help = "Size of the kernel receive buffer of the UDP sockets. Increase it when many switches answer at once. Sizes above net.core.rmem_max require CAP_NET_ADMIN. Defaults to the system default.")
+		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times.")
+	mc.register("identify", "Identify all switches on the network", genparser, action = ActionIdentify)
+
+	def genparser(parser):
+		parser.add_argument("-i", "--interface", metavar = "ifname", help = "Specify the network interface that switches should be looked for. If not given, default to interface that points towards the default gateway.")
+		parser.add_argument("--target", metavar = "mac", type = MACAddress.parse, action = "append", help = "MAC address of a switch the configuration is applied to. Can be given multiple times.")
+		parser.add_argument("--targets-file", metavar = "filename", help = "File that contains the MAC addresses of switches the configuration is applied to, one per line.")
+		parser.add_argument("-u", "--username", metavar = "name", help = "Username to log in to the switches with.")
+		parser.add_argument("-p", "--ask-password", action = "store_true", help = "Prompt for the password to log in to the switches with. Alternatively, it is taken from the TPLINK_PASSWORD environment variable.")
+		parser.add_argument("--max-window", metavar = "count", type = int, default = 16, help = "Maximum number of requests in flight to a single switch. There is no global limit, the window of every switch adapts to how reliably it acknowledges requests. Defaults to %(default)d.")
+		parser.add_argument("-t", "--timeout", metavar = "secs", type = float, default = 1.0, help = "Time that is waited for a switch to acknowledge the change. Defaults to %(default).1f sec.")
+		parser.add_argument("-r", "--retries", metavar = "count", type = int, default = 3, help = "Number of times a request that timed out is retried. Responses with an error code are not retried. Defaults to %(default)d.")
+		parser.add_argument("--backoff", metavar = "secs", type = float, default = 0.1, help = "Base of the randomized exponential backoff between retries. Defaults to %(default).1f sec.")
+		parser.add_argument("--verbose", action = "count", default = 0, help = "Increase verbosity. Can be given multiple times. Once also prints the congestion window, acknowledgements and losses of every switch.")
+		parser.add_argument("field", nargs = "+", help = "Field to set, given as 'Tag=value'. The tag can either be the name of the field or its number.")
+	mc.register("apply", "Apply the same configuration change to many switches", genparser, action = ActionApply)
 
 #	def genparser(parser):
 #		parser.add_argument("-i", "--interface", metavar = "ifname", required = True, help = "Specify the network interface that switches should be looked for. Mandatory argument.")
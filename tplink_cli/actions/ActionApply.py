@@ -0,0 +1,84 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import os
+import getpass
+import asyncio
+from ..MultiCommand import BaseAction
+from ..MACAddress import MACAddress
+from ..PacketField import PacketField
+from ..TPLinkInterface import TPLinkInterface
+from ..TPLinkClient import TPLinkClient
+from ..BulkApply import BulkApply
+from ..CongestionController import CongestionController
+
+class ActionApply(BaseAction):
+	def _targets(self):
+		switch_macs = list(self._args.target or [ ])
+		if self._args.targets_file is not None:
+			with open(self._args.targets_file) as f:
+				for line in f:
+					line = line.split("#", maxsplit = 1)[0].strip()
+					if line != "":
+						switch_macs.append(MACAddress.parse(line))
+		# Remove duplicates, but keep order
+		return list(dict.fromkeys(switch_macs))
+
+	def _password(self):
+		# Not taken from the command line, where it would be visible in the
+		# process list
+		if self._args.ask_password:
+			return getpass.getpass("Password: ")
+		return os.environ.get("TPLINK_PASSWORD")
+
+	async def async_run(self, switch_macs: "list[MACAddress]", fields: "list[PacketField]", password: str | None):
+		congestion_controller = CongestionController(max_window = self._args.max_window)
+		async with TPLinkInterface(self._args.interface) as conn, TPLinkClient(conn, timeout = self._args.timeout, congestion_controller = congestion_controller) as client:
+			bulk_apply = BulkApply(client, fields, username = self._args.username, password = password, retries = self._args.retries, backoff = self._args.backoff)
+			results = await bulk_apply.run(switch_macs)
+		if self._args.verbose >= 1:
+			for (switch_mac, state) in sorted(congestion_controller.states().items()):
+				print(f"{str(switch_mac):<17s} window {state.window:5.2f}, {state.acknowledged} acknowledged, {state.losses} lost")
+		return results
+
+	def run(self):
+		switch_macs = self._targets()
+		if len(switch_macs) == 0:
+			print("No target switches given.")
+			return 1
+		try:
+			fields = [ PacketField.parse(field) for field in self._args.field ]
+		except ValueError as e:
+			print(f"Invalid field: {e}")
+			return 1
+		results = asyncio.run(self.async_run(switch_macs, fields, self._password()))
+
+		for result in results:
+			if result.success:
+				status = "OK"
+			elif result.error_code is None:
+				status = "timeout"
+			else:
+				status = f"error {result.error_code:#x}"
+			print(f"{str(result.switch_mac):<17s} {status:<16s} {result.attempts:2d} attempt(s) {result.elapsed * 1000:8.1f} ms")
+		failed = sum(1 for result in results if not result.success)
+		print(f"{len(results) - failed} of {len(results)} switches succeeded, {failed} failed")
+		return 0 if (failed == 0) else 1
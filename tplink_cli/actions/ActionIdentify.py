@@ -0,0 +1,60 @@
+#	tplink-cli - Command line interface for TP-LINK smart switches
+#	Copyright (C) 2017-2024 Johannes Bauer
+#
+#	This file is part of tplink-cli.
+#
+#	tplink-cli is free software; you can redistribute it and/or modify
+#	it under the terms of the GNU General Public License as published by
+#	the Free Software Foundation; this program is ONLY licensed under
+#	version 3 of the License, later versions are explicitly excluded.
+#
+#	tplink-cli is distributed in the hope that it will be useful,
+#	but WITHOUT ANY WARRANTY; without even the implied warranty of
+#	MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#	GNU General Public License for more details.
+#
+#	You should have received a copy of the GNU General Public License
+#	along with tplink-cli; if not, write to the Free Software
+#	Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA  02111-1307  USA
+#
+#	Johannes Bauer <JohannesBauer@gmx.de>
+
+import time
+import asyncio
+import ipaddress
+from ..MultiCommand import BaseAction
+from ..TPLinkInterface import TPLinkInterface
+from ..TPLinkClient import TPLinkClient
+from ..DiscoveryScanner import DiscoveryScanner
+
+class ActionIdentify(BaseAction):
+	async def _scan_interface(self, interface: str | None):
+		async with TPLinkInterface(interface, rx_buffer_size = self._args.rx_buffer_size) as conn, TPLinkClient(conn, timeout = self._args.timeout) as client:
+			scanner = DiscoveryScanner(client, timeout = self._args.timeout)
+			identities = await scanner.scan()
+			if self._args.verbose >= 1:
+				print(f"{conn.interface}: {len(identities)} switches, {scanner.duplicates} duplicate and {scanner.invalid} invalid responses")
+				conn.report_statistics()
+			return identities
+
+	async def async_run(self):
+		interfaces = self._args.interface if (self._args.interface is not None) else [ None ]
+		t0 = time.monotonic()
+		results = await asyncio.gather(*[ self._scan_interface(interface) for interface in interfaces ])
+		t1 = time.monotonic()
+
+		# A switch that is reachable through multiple interfaces is only
+		# reported once
+		identities = { }
+		for result in results:
+			for (switch_mac, identity) in result.items():
+				identities.setdefault(switch_mac, identity)
+
+		sort_key = lambda identity: (identity.ip_address is None, identity.ip_address or ipaddress.IPv4Address(0), identity.switch_mac)
+		for identity in sorted(identities.values(), key = sort_key):
+			print(f"{str(identity.switch_mac):<17s} {str(identity.ip_address or '-'):<15s} {identity.name or '-':<24s} {identity.hardware_version or '-':<24s} {identity.firmware_version or '-':<32s} {identity.interface}")
+		if self._args.verbose >= 1:
+			print(f"Found {len(identities)} switches in {(t1 - t0) * 1000:.0f} ms")
+
+	def run(self):
+		asyncio.run(self.async_run())
@@ -22,20 +22,77 @@
 #from .TPLinkPacket import TPLinkPacket, Opcode
 #from .ActionTPLinkConnection import ActionTPLinkConnection
 #from .Exceptions import ReceiveTimeoutException
+import sys
+import time
+import signal
 import asyncio
 from ..Tools import NetTools
 from ..TPLinkInterface import TPLinkInterface
 from ..MultiCommand import BaseAction
 from ..RC4Packet import RC4Packet
+from ..PacketFilter import PacketFilter
+from ..Exceptions import DeserializationException
+from ..TPLinkObfuscation import TPLinkObfuscation
+from ..PacketWriter import PacketWriter
+from ..PacketCorrelator import PacketCorrelator
+from ..Enums import OverflowPolicy
 
 class ActionListen(BaseAction):
-	async def async_run(self):
-		async with TPLinkInterface(self._args.interface) as conn:
-			while True:
-				rx_pkt = await conn.recvdata()
-				rc4_pkt = RC4Packet.deserialize(rx_pkt.data)
+	_RX_BATCH_SIZE = 64
 
-				print(rc4_pkt)
+	def __init__(self, cmd, args):
+		super().__init__(cmd, args)
+		self._invalid = 0
+
+	def _report_statistics(self, conn: TPLinkInterface, writer: PacketWriter):
+		writer.flush()
+		report_file = writer.report_file()
+		conn.report_statistics(file = report_file)
+		print(f"{conn.interface}: {self._invalid} invalid datagrams ignored", file = report_file)
+		report_file.flush()
+
+	async def async_run(self, writer: PacketWriter, correlator: PacketCorrelator | None):
+		packet_filter = PacketFilter.from_args(self._args)
+		async with TPLinkInterface(self._args.interface, rx_queue_size = self._args.rx_queue_size, overflow_policy = OverflowPolicy(self._args.overflow_policy), rx_buffer_size = self._args.rx_buffer_size, tx_buffer_size = self._args.tx_buffer_size) as conn:
+			if hasattr(signal, "SIGUSR1"):
+				asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self._report_statistics, conn, writer)
+			try:
+				await self._receive(conn, writer, packet_filter, correlator)
+			finally:
+				self._report_statistics(conn, writer)
+
+	async def _receive(self, conn: TPLinkInterface, writer: PacketWriter, packet_filter: PacketFilter, correlator: PacketCorrelator | None):
+		while True:
+			# Drain everything that queued up since the last wakeup at once
+			rx_pkts = await conn.recv_many(self._RX_BATCH_SIZE)
+			for rx_pkt in rx_pkts:
+				# Fields are only decoded while the packet is written, so a
+				# malformed payload can also surface there
+				try:
+					header = RC4Packet.deserialize_header(rx_pkt.data)
+					if not packet_filter.matches(header):
+						continue
+					if correlator is not None:
+						correlator.observe(header, rx_pkt.timestamp)
+					plaintext = TPLinkObfuscation.deobfuscate(rx_pkt.data)
+					rc4_pkt = RC4Packet.deserialize_plaintext(plaintext)
+					writer.write(rc4_pkt, plaintext, timestamp = rx_pkt.timestamp)
+				except DeserializationException as e:
+					self._invalid += 1
+					if self._args.verbose >= 1:
+						print(f"Ignoring invalid datagram from {rx_pkt.host}:{rx_pkt.port}: {e}", file = sys.stderr)
+			writer.flush()
 
 	def run(self):
-		asyncio.run(self.async_run())
+		writer = PacketWriter.create(self._args.format, sys.stdout.buffer)
+		writer.write_preamble()
+		correlator = PacketCorrelator(timeout = self._args.correlation_timeout) if self._args.correlate else None
+		try:
+			asyncio.run(self.async_run(writer, correlator))
+		except KeyboardInterrupt:
+			pass
+		finally:
+			writer.flush()
+			if correlator is not None:
+				correlator.expire(time.time())
+				correlator.report(file = writer.report_file())
@@ -19,39 +19,157 @@
 #
 #	Johannes Bauer <JohannesBauer@gmx.de>
 
-import pcapng
+import io
+import math
+import os
+import sys
 import contextlib
+import collections
+import concurrent.futures
 from ..MultiCommand import BaseAction
-from ..RC4Packet import RC4Packet
-from ..Exceptions import DeserializationException
-from ..TPLinkObfuscation import TPLinkObfuscation
+from ..PacketFilter import PacketFilter
+from ..PCAPNGReader import PCAPNGReader
+from ..PCAPReader import PCAPReader
+from ..PacketIndex import PacketIndex
+from ..Exceptions import CaptureFormatException
+from ..CaptureDecoder import CaptureDecoder
+from ..PacketCorrelator import PacketCorrelator
+from ..PacketWriter import PacketWriter, BinaryPacketReader
+
+_worker_state = { }
+
+def _worker_initialize(filename: str, decoder: CaptureDecoder, output_format: str):
+	_worker_state["reader"] = PCAPNGReader(filename)
+	_worker_state["decoder"] = decoder
+	_worker_state["output_format"] = output_format
+
+def _worker_decode_chunk(chunk: PCAPNGReader.Chunk):
+	(reader, decoder) = (_worker_state["reader"], _worker_state["decoder"])
+	output = io.BytesIO()
+	writer = PacketWriter.create(_worker_state["output_format"], output)
+	ip_fragments = decoder.ip_fragments
+	for packet in reader.chunk_packets(chunk):
+		decoder.process(packet, writer)
+	return (output.getvalue(), decoder.ip_fragments - ip_fragments)
 
 class ActionReadPCAPNG(BaseAction):
-	def run(self):
+	_CHUNK_SIZE = 4 * 1024 * 1024
+
+	def __init__(self, cmd, args):
+		super().__init__(cmd, args)
+		self._worker_ip_fragments = 0
+
+	def _run_serial(self, decoder: CaptureDecoder, writer: PacketWriter):
+		with PCAPNGReader(self._args.filename) as reader:
+			for packet in reader:
+				decoder.process(packet, writer)
+
+	def _run_indexed(self, decoder: CaptureDecoder, writer: PacketWriter, packet_filter: PacketFilter, index: PacketIndex):
+		with PCAPNGReader(self._args.filename) as reader:
+			for record in index.query(packet_filter):
+				decoder.decode(reader.read_at(record.payload_offset, record.payload_length), writer, timestamp = record.timestamp)
+
+	def _run_follow(self, decoder: CaptureDecoder, writer: PacketWriter):
+		with PCAPNGReader(self._args.filename) as reader:
+			for packet in reader.follow():
+				if decoder.process(packet, writer):
+					writer.flush()
+
+	def _run_pcap(self, decoder: CaptureDecoder, writer: PacketWriter):
+		streaming = (self._args.filename == "-")
+		with PCAPReader(self._args.filename) as reader:
+			for packet in reader:
+				if decoder.process(packet, writer) and streaming:
+					writer.flush()
+
+	def _run_records(self, decoder: CaptureDecoder, writer: PacketWriter):
+		streaming = (self._args.filename == "-")
+		with contextlib.ExitStack() as stack:
+			f = sys.stdin.buffer if streaming else stack.enter_context(open(self._args.filename, "rb"))
+			for record in BinaryPacketReader(f):
+				if decoder.decode_record(record, writer) and streaming:
+					writer.flush()
+
+	def _run_parallel(self, decoder: CaptureDecoder, writer: PacketWriter):
+		# Bound the number of chunks that are in flight so that memory usage
+		# does not depend on the capture size.
+		max_inflight = 2 * self._args.jobs
+		inflight = collections.deque()
+		with PCAPNGReader(self._args.filename) as reader, concurrent.futures.ProcessPoolExecutor(max_workers = self._args.jobs, initializer = _worker_initialize, initargs = (self._args.filename, decoder, self._args.format)) as executor:
+			for chunk in reader.chunks(self._CHUNK_SIZE):
+				if len(inflight) >= max_inflight:
+					self._write_completed(writer, inflight)
+				inflight.append(executor.submit(_worker_decode_chunk, chunk))
+			while len(inflight) > 0:
+				self._write_completed(writer, inflight)
+
+	def _write_completed(self, writer: PacketWriter, inflight: collections.deque):
+		if not self._args.unordered:
+			done = [ inflight.popleft() ]
+		else:
+			(done, pending) = concurrent.futures.wait(inflight, return_when = concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				inflight.remove(future)
+		for future in done:
+			(output, ip_fragments) = future.result()
+			writer.write_raw(output)
+			self._worker_ip_fragments += ip_fragments
+
+	def _capture_magic(self):
+		if self._args.filename == "-":
+			return sys.stdin.buffer.peek(4)[ : 4]
 		with open(self._args.filename, "rb") as f:
-			for block in pcapng.scanner.FileScanner(f):
-				if not isinstance(block, pcapng.blocks.EnhancedPacket):
-					continue
-
-				ethertype = block.packet_data[12 : 12 + 2]
-				if ethertype != bytes.fromhex("08 00"):
-					# Not IPv4.
-					continue
-
-				if block.packet_data[0x17] != 17:
-					# Not UDP
-					continue
-
-				udp_length = int.from_bytes(block.packet_data[38 : 38 + 2], byteorder = "big") - 8
-				payload = block.packet_data[42 : 42 + udp_length]
-
-				with contextlib.suppress(DeserializationException):
-					rc4_pkt = RC4Packet.deserialize(payload)
-					rc4_pkt.dump()
-					if self._args.validate_serialization:
-						reserialized = rc4_pkt.serialize()
-						if reserialized != payload:
-							print("WARNING: Packet reserialization mismatch.")
-							print(f"Original packet: {TPLinkObfuscation.deobfuscate(payload)}")
-							print(f"Reserialized   : {TPLinkObfuscation.deobfuscate(reserialized)}")
-					print()
+			return f.read(4)
+
+	def _load_index(self):
+		index = PacketIndex.load(self._args.filename)
+		if (index is None) and os.path.exists(PacketIndex.index_filename(self._args.filename)):
+			print(f"Warning: index {PacketIndex.index_filename(self._args.filename)} is outdated, ignoring it. Recreate it using the 'index' command.", file = sys.stderr)
+		return index
+
+	def _run(self, decoder: CaptureDecoder, writer: PacketWriter, packet_filter: PacketFilter):
+		magic = self._capture_magic()
+		if PCAPReader.is_pcap(magic):
+			self._run_pcap(decoder, writer)
+			return
+		elif BinaryPacketReader.is_binary_record_stream(magic):
+			self._run_records(decoder, writer)
+			return
+		elif self._args.filename == "-":
+			raise CaptureFormatException("Only classic pcap files or binary packet records can be read from stdin, pcapng input needs to be a regular file.")
+
+		if self._args.follow:
+			self._run_follow(decoder, writer)
+			return
+
+		index = self._load_index() if packet_filter.active else None
+		if index is not None:
+			with index:
+				self._run_indexed(decoder, writer, packet_filter, index)
+		elif (self._args.jobs <= 1) or (decoder.correlator is not None):
+			self._run_serial(decoder, writer)
+		else:
+			self._run_parallel(decoder, writer)
+
+	def _report_ip_fragments(self, decoder: CaptureDecoder, writer: PacketWriter):
+		# Skipped fragments are only known when the capture itself was read,
+		# the index does not contain them.
+		ip_fragments = decoder.ip_fragments + self._worker_ip_fragments
+		if ip_fragments > 0:
+			print(f"{ip_fragments} IP fragmented TP-Link datagrams skipped, IP reassembly is not supported", file = writer.report_file())
+
+	def run(self):
+		packet_filter = PacketFilter.from_args(self._args)
+		correlator = PacketCorrelator(timeout = self._args.correlation_timeout) if self._args.correlate else None
+		decoder = CaptureDecoder(packet_filter, validate_serialization = self._args.validate_serialization, correlator = correlator)
+		writer = PacketWriter.create(self._args.format, sys.stdout.buffer)
+		writer.write_preamble()
+		try:
+			self._run(decoder, writer, packet_filter)
+		finally:
+			writer.flush()
+		self._report_ip_fragments(decoder, writer)
+		if correlator is not None:
+			# Requests still unanswered at the end of the capture timed out
+			correlator.expire(math.inf)
+			correlator.report(file = writer.report_file())
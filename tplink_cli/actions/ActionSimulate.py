@@ -27,11 +27,44 @@ from ..MultiCommand import BaseAction
 from ..RC4Packet import RC4Packet
 from ..Enums import Opcode, FieldTag
 from ..PacketField import PacketField
+from ..MACAddress import MACAddress
 from ..TPLinkTypes import TPLinkRawData, TPLinkString, TPLinkBool, TPLinkIPv4, TPLinkMAC
 
 class ActionSimulate(BaseAction):
+	_BROADCAST_ADDRESS = "255.255.255.255"
+	_BASE_IP_ADDRESS = ipaddress.ip_address("192.168.123.32")
+
+	def _switch_mac(self, conn: TPLinkInterface, switch_index: int):
+		mac_value = (int.from_bytes(bytes(conn.host_mac), byteorder = "big") + switch_index) & 0xffffffffffff
+		return MACAddress(mac_value.to_bytes(length = 6, byteorder = "big"))
+
+	def _discovery_response(self, request: RC4Packet, switch_mac: MACAddress, ip_address: ipaddress.IPv4Address):
+		# Respond with same packet, but append fields
+		response = RC4Packet.deserialize_plaintext(request.serialize_plaintext())
+		response.opcode = Opcode.ResponseData
+		response.switch_mac = switch_mac
+		response.payload.clear()
+		response.payload.append_all([
+			PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")),
+			PacketField(FieldTag.DeviceDescription, TPLinkString("Simulated Switch")),
+			PacketField(FieldTag.MAC, TPLinkMAC(switch_mac)),
+			PacketField(FieldTag.FirmwareVersion, TPLinkString("1.0.1 Build 20230712 Rel.73926")),
+			PacketField(FieldTag.HardwareVersion, TPLinkString("TL-SG1016PE 5.20")),
+			PacketField(FieldTag.DHCP, TPLinkBool(False)),
+			PacketField(FieldTag.IPAddress, TPLinkIPv4(ip_address)),
+			PacketField(FieldTag.SubnetMask, TPLinkIPv4(ipaddress.ip_address("255.255.255.0"))),
+			PacketField(FieldTag.GatewayIPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.254"))),
+			PacketField(13, TPLinkRawData(bytes.fromhex("01"))),
+			PacketField(14, TPLinkRawData(bytes.fromhex("00"))),
+			PacketField(15, TPLinkRawData(bytes.fromhex("001c0000"))),
+			PacketField(FieldTag.DeviceSupportsEncryption, TPLinkBool(True)),
+		])
+		return response
+
 	async def async_run(self):
 		async with TPLinkInterface(self._args.interface, act_as_host = False) as conn:
+			switch_macs = [ self._switch_mac(conn, switch_index) for switch_index in range(self._args.count) ]
+			simulated_switches = set(switch_macs)
 			while True:
 				rx_pkt = await conn.recvdata()
 
@@ -39,29 +72,16 @@ class ActionSimulate(BaseAction):
 				print(rc4_pkt)
 
 				if rc4_pkt.opcode == Opcode.Discovery:
-					# Respond with same packet, but append fields
-					rc4_pkt.opcode = Opcode.ResponseData
-					rc4_pkt.switch_mac = conn.host_mac
-					rc4_pkt.payload.clear()
-					rc4_pkt.payload.append_all([
-						PacketField(FieldTag.SwitchName, TPLinkString("TL-SG1016PE")),
-						PacketField(FieldTag.DeviceDescription, TPLinkString("Simulated Switch")),
-						PacketField(FieldTag.MAC, TPLinkMAC(rc4_pkt.switch_mac)),
-						PacketField(FieldTag.FirmwareVersion, TPLinkString("1.0.1 Build 20230712 Rel.73926")),
-						PacketField(FieldTag.HardwareVersion, TPLinkString("TL-SG1016PE 5.20")),
-						PacketField(FieldTag.DHCP, TPLinkBool(False)),
-						PacketField(FieldTag.IPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.32"))),
-						PacketField(FieldTag.SubnetMask, TPLinkIPv4(ipaddress.ip_address("255.255.255.0"))),
-						PacketField(FieldTag.GatewayIPAddress, TPLinkIPv4(ipaddress.ip_address("192.168.123.254"))),
-						PacketField(13, TPLinkRawData(bytes.fromhex("01"))),
-						PacketField(14, TPLinkRawData(bytes.fromhex("00"))),
-						PacketField(15, TPLinkRawData(bytes.fromhex("001c0000"))),
-						PacketField(FieldTag.DeviceSupportsEncryption, TPLinkBool(True)),
-					])
-					conn.send(rc4_pkt.serialize(), host = rx_pkt.host, port = rx_pkt.port)
-					print(f"Responding to discovery packet towards {rx_pkt.host}:{rx_pkt.port}")
+					# Switches broadcast their responses
+					for (switch_index, switch_mac) in enumerate(switch_macs):
+						response = self._discovery_response(rc4_pkt, switch_mac, self._BASE_IP_ADDRESS + switch_index)
+						conn.send(response.serialize(), host = self._BROADCAST_ADDRESS, port = rx_pkt.port)
+					print(f"Responding to discovery packet from {rx_pkt.host}:{rx_pkt.port} as {len(switch_macs)} switch(es)")
 				elif rc4_pkt.opcode == Opcode.SetData:
-					pass
+					if rc4_pkt.switch_mac in simulated_switches:
+						rc4_pkt.opcode = Opcode.AcknowledgeSetData
+						rc4_pkt.payload.clear()
+						conn.send(rc4_pkt.serialize(), host = self._BROADCAST_ADDRESS, port = rx_pkt.port)
 				else:
 					print("Not understood request:")
 					rc4_pkt.dump()